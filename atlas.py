@@ -0,0 +1,294 @@
+import os
+import sys
+import json
+import numpy as np
+from PIL import Image
+from PyQt5.QtWidgets import (
+    QApplication, QWidget, QLabel, QPushButton, QFileDialog, QVBoxLayout,
+    QHBoxLayout, QSpinBox, QComboBox, QMessageBox
+)
+
+from project_index import shared_index
+from worker import BatchWorker, ProgressPanel, report_outcome
+
+
+# Stimuli are packed per experiment phase, so each phase's sheets can be uploaded on their own
+GROUPS = [("1_greyscale", "greyscale"), ("2_mooney", "mooney"), ("3_super", "super")]
+
+
+def pack_grid(size, count, max_size, padding):
+    """Pack count rectangles of one size into a regular grid. Returns (placements, sheet_sizes)."""
+    w, h = size
+    if w > max_size or h > max_size:
+        raise ValueError(f"A {w}x{h} image does not fit on a {max_size}x{max_size} sheet.")
+    cell_w, cell_h = w + padding, h + padding
+    cols = (max_size + padding) // cell_w
+    rows = (max_size + padding) // cell_h
+    per_sheet = cols * rows
+
+    placements = []
+    sheet_sizes = []
+    for start in range(0, count, per_sheet):
+        n = min(per_sheet, count - start)
+        sheet = len(sheet_sizes)
+        used_cols = min(cols, n)
+        used_rows = -(-n // cols)
+        sheet_sizes.append((used_cols * cell_w - padding, used_rows * cell_h - padding))
+        for i in range(n):
+            row, col = divmod(i, cols)
+            placements.append((sheet, col * cell_w, row * cell_h))
+    return placements, sheet_sizes
+
+
+def pack_shelves(sizes, max_size, padding):
+    """Shelf packer for mixed sizes: tallest first, left to right, new shelf/sheet on overflow."""
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    placements = [None] * len(sizes)
+    sheet_sizes = []
+    sheet = -1
+    x = y = shelf_h = used_w = 0
+    for i in order:
+        w, h = sizes[i]
+        if w > max_size or h > max_size:
+            raise ValueError(f"A {w}x{h} image does not fit on a {max_size}x{max_size} sheet.")
+        if sheet >= 0 and x + w > max_size:
+            y += shelf_h + padding
+            x = shelf_h = 0
+        if sheet < 0 or y + h > max_size:
+            if sheet >= 0:
+                sheet_sizes[sheet] = (used_w, y - padding if x == 0 else y + shelf_h)
+            sheet += 1
+            sheet_sizes.append(None)
+            x = y = shelf_h = used_w = 0
+        placements[i] = (sheet, x, y)
+        x += w + padding
+        shelf_h = max(shelf_h, h)
+        used_w = max(used_w, x - padding)
+    if sheet >= 0:
+        sheet_sizes[sheet] = (used_w, y + shelf_h)
+    return placements, sheet_sizes
+
+
+def pack(sizes, max_size=4096, padding=2):
+    if len(set(sizes)) == 1:
+        return pack_grid(sizes[0], len(sizes), max_size, padding)
+    return pack_shelves(sizes, max_size, padding)
+
+
+class AtlasWorker(BatchWorker):
+    bytes_per_pixel = 8  # decoded image plus its RGBA conversion
+
+    def __init__(self, input_dir, output_dir, max_size=4096, padding=2):
+        super().__init__()
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.max_size = max_size
+        self.padding = padding
+        self.sheet_files = []
+
+    def setup(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        # Packing is planned from image headers alone, before anything is decoded
+        entries = shared_index.scan(self.input_dir)
+        self.jobs = []
+        self.sheets = []
+        self.coordinates = {}
+        for prefix, group in GROUPS:
+            infos = [entries[name] for name in sorted(entries) if name.startswith(prefix) and entries[name].mode]
+            if not infos:
+                continue
+            mode = 'L' if all(info.mode == 'L' for info in infos) else 'RGBA'
+            channels = 1 if mode == 'L' else 4
+            placements, sheet_sizes = pack([(info.width, info.height) for info in infos], self.max_size, self.padding)
+
+            first_sheet = len(self.sheets)
+            for k, (width, height) in enumerate(sheet_sizes):
+                self.sheets.append({
+                    "file": f"atlas_{group}_{k + 1:02d}.png",
+                    "group": group,
+                    "mode": mode,
+                    "width": width,
+                    "height": height,
+                    "remaining": 0,
+                    "canvas": None,
+                    "channels": channels
+                })
+            for info, (sheet, x, y) in zip(infos, placements):
+                sheet += first_sheet
+                self.sheets[sheet]["remaining"] += 1
+                self.jobs.append((info.name, sheet, x, y, mode))
+
+    def items(self):
+        # Sheet by sheet, so each canvas can be written and released as soon as it is full
+        return sorted(self.jobs, key=lambda job: job[1])
+
+    def item_name(self, job):
+        return job[0]
+
+    def item_path(self, job):
+        return os.path.join(self.input_dir, job[0])
+
+    def load(self, job):
+        name, _, _, _, mode = job
+        with Image.open(os.path.join(self.input_dir, name)) as img:
+            return np.asarray(img.convert(mode))
+
+    def process(self, job, pixels):
+        name, sheet_number, x, y, mode = job
+        sheet = self.sheets[sheet_number]
+        if sheet["canvas"] is None:
+            shape = (sheet["height"], sheet["width"]) if sheet["channels"] == 1 else \
+                (sheet["height"], sheet["width"], sheet["channels"])
+            sheet["canvas"] = np.zeros(shape, dtype=np.uint8)
+
+        h, w = pixels.shape[:2]
+        sheet["canvas"][y:y + h, x:x + w] = pixels
+        sheet["remaining"] -= 1
+
+        W, H = sheet["width"], sheet["height"]
+        self.coordinates[name] = {
+            "sheet": sheet["file"],
+            "x": x, "y": y, "width": w, "height": h,
+            "u0": x / W, "v0": y / H, "u1": (x + w) / W, "v1": (y + h) / H
+        }
+        if sheet["remaining"] == 0:
+            self.save_sheet(job, sheet)
+
+    def save_sheet(self, job, sheet):
+        canvas, sheet["canvas"] = sheet["canvas"], None
+        path = os.path.join(self.output_dir, sheet["file"])
+        self.sheet_files.append(path)
+        self.write(job, Image.fromarray(canvas, mode=sheet["mode"]).save, path)
+
+    def teardown(self):
+        if self.cancelled:
+            return
+        # Sheets with unreadable images are still written, with those slots left empty
+        for sheet in self.sheets:
+            if sheet["canvas"] is not None:
+                self.save_sheet(("", -1, 0, 0, ""), sheet)
+
+        atlas = {
+            "sheets": [{key: sheet[key] for key in ("file", "group", "mode", "width", "height")}
+                       for sheet in self.sheets],
+            "stimuli": dict(sorted(self.coordinates.items()))
+        }
+        with open(os.path.join(self.output_dir, "atlas.json"), "w") as f:
+            json.dump(atlas, f, indent=1)
+
+
+class AtlasBuilder(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Texture Atlas Packer")
+
+        default_folder = os.path.join(os.getcwd(), "8_experiment")
+        self.input_dir = default_folder if os.path.isdir(default_folder) else None
+        self.output_dir = os.path.join(default_folder, "atlas") if self.input_dir else None
+
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+
+        self.info_label = QLabel(
+            "Pack the built experiment stimuli (1_greyscale_*, 2_mooney_*, 3_super_CB*) into a few "
+            "large sheets per phase, with atlas.json giving each stimulus's sheet and pixel/UV rectangle."
+        )
+        self.info_label.setWordWrap(True)
+
+        self.input_btn = QPushButton("Select Experiment Folder")
+        self.input_btn.clicked.connect(self.select_input_folder)
+        self.input_path_label = QLabel(self.input_dir or "No folder selected")
+        self.input_path_label.setStyleSheet("color: gray;")
+
+        self.output_btn = QPushButton("Select Output Folder")
+        self.output_btn.clicked.connect(self.select_output_folder)
+        self.output_path_label = QLabel(self.output_dir or "No folder selected")
+        self.output_path_label.setStyleSheet("color: gray;")
+
+        self.size_combo = QComboBox()
+        self.size_combo.addItems(["2048", "4096", "8192"])
+        self.size_combo.setCurrentText("4096")
+
+        self.padding_spin = QSpinBox()
+        self.padding_spin.setRange(0, 32)
+        self.padding_spin.setValue(2)
+
+        self.run_btn = QPushButton("Pack Atlases")
+        self.run_btn.clicked.connect(self.pack_atlases)
+
+        self.progress_panel = ProgressPanel()
+
+        self.done_btn = QPushButton("Done")
+        self.done_btn.clicked.connect(self.close)
+
+        layout.addWidget(self.info_label)
+
+        input_layout = QHBoxLayout()
+        input_layout.addWidget(self.input_btn)
+        input_layout.addWidget(self.input_path_label)
+        layout.addLayout(input_layout)
+
+        output_layout = QHBoxLayout()
+        output_layout.addWidget(self.output_btn)
+        output_layout.addWidget(self.output_path_label)
+        layout.addLayout(output_layout)
+
+        options_layout = QHBoxLayout()
+        options_layout.addWidget(QLabel("Max sheet size (px):"))
+        options_layout.addWidget(self.size_combo)
+        options_layout.addWidget(QLabel("Padding (px):"))
+        options_layout.addWidget(self.padding_spin)
+        layout.addLayout(options_layout)
+
+        layout.addWidget(self.run_btn)
+        layout.addWidget(self.progress_panel)
+        layout.addWidget(self.done_btn)
+
+        self.setLayout(layout)
+        self.resize(600, 280)
+
+    def select_input_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Experiment Folder")
+        if folder:
+            self.input_dir = folder
+            self.input_path_label.setText(folder)
+            if not self.output_dir:
+                self.output_dir = os.path.join(folder, "atlas")
+                self.output_path_label.setText(self.output_dir)
+
+    def select_output_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Output Folder")
+        if folder:
+            self.output_dir = folder
+            self.output_path_label.setText(folder)
+
+    def pack_atlases(self):
+        if not self.input_dir or not self.output_dir:
+            QMessageBox.warning(self, "Warning", "Please select the experiment and output folders.")
+            return
+
+        self.run_btn.setEnabled(False)
+        self.worker = AtlasWorker(self.input_dir, self.output_dir,
+                                  int(self.size_combo.currentText()), self.padding_spin.value())
+        self.progress_panel.attach(self.worker)
+        self.worker.finished.connect(self.packing_finished)
+        self.worker.start()
+
+    def packing_finished(self):
+        self.run_btn.setEnabled(True)
+        report_outcome(self, self.worker,
+                       f"Packed {len(self.worker.coordinates)} stimuli into {len(self.worker.sheets)} sheet(s).")
+
+    def closeEvent(self, event):
+        self.progress_panel.stop()
+        super().closeEvent(event)
+
+
+if __name__ == "__main__":
+    app = QApplication(sys.argv)
+    window = AtlasBuilder()
+    window.show()
+    sys.exit(app.exec_())
@@ -0,0 +1,223 @@
+"""Run the batch stages without the GUI, optionally as one shard of a larger run.
+
+    python batch.py greyscale --project PROJECT --shard 0/4
+    python batch.py mooney --project PROJECT --params PROJECT/threshold_blur.csv --shard 1/4
+    python batch.py mooney --project PROJECT --blur fast
+    python batch.py superimpose --project PROJECT --alpha 0.5 --shard 2/4
+    python batch.py superimpose --project PROJECT --composite-encoding png-indexed --no-layers
+    python batch.py merge greyscale --project PROJECT
+    python batch.py watch --project PROJECT --manufactured MAN_DIR --natural NAT_DIR
+    python batch.py stats --project PROJECT
+    python batch.py sequences --project PROJECT --participants 200 --min-gap 3 --max-run 3
+
+Each shard writes a partial manifest to PROJECT/manifests. Once every shard
+has finished (on any machine sharing the project folder), 'merge' combines
+them into manifest_<stage>.csv and checks that every item was processed and
+that its output files exist. 'watch' keeps running and pushes new or changed
+source images through crop, greyscale and (with --params) Mooney replay.
+'stats' writes the stimulus statistics table for 3_mooney and 7_superimposed.
+'sequences' writes a randomised trial sequence per participant to
+PROJECT/8_experiment/sequences.
+"""
+import os
+import sys
+import argparse
+
+from greyscale_widget import GreyscaleWorker
+from mooney import MooneyBatchWorker, replay_jobs, BLUR_ENGINES
+from superimpose import SuperimposeWorker
+from encoding import PROFILES, DEFAULT_PROFILE
+from compositor import PRESETS, DEFAULT_PRESET
+from project_index import check_pairings, format_problems
+from shard import parse_shard, manifest_path, write_manifest, merge_manifests
+from worker import format_duration
+from scheduler import parse_size
+from watch import WatchWorker
+from stimulus_stats import StimulusStatsWorker
+from trials import TrialSequenceWorker, PHASES
+
+
+STAGES = ["greyscale", "mooney", "superimpose"]
+
+
+def make_worker(stage, args):
+    project = args.project
+    if stage == "greyscale":
+        return GreyscaleWorker(os.path.join(project, "1_source_images"), os.path.join(project, "2_grey"))
+
+    if stage == "mooney":
+        params = args.params or os.path.join(project, "threshold_blur.csv")
+        jobs = replay_jobs(params)
+        if args.blur:
+            jobs = [job[:-1] + (args.blur,) for job in jobs]
+        return MooneyBatchWorker(jobs, os.path.join(project, "2_grey"), os.path.join(project, "3_mooney"))
+
+    input_folder = os.path.join(project, "3_mooney")
+    pairings, problems = check_pairings(input_folder, os.path.join(project, "4_super_pairings", "pairs.csv"))
+    if problems:
+        raise ValueError("Pre-flight check failed:\n" + format_problems(problems))
+    return SuperimposeWorker(
+        pairings, args.alpha, input_folder,
+        os.path.join(project, "5_cyan"),
+        os.path.join(project, "6_magenta"),
+        os.path.join(project, "7_superimposed"),
+        layer_profile=args.layer_encoding,
+        composite_profile=args.composite_encoding,
+        write_layers=not args.no_layers,
+        preset=args.preset
+    )
+
+
+def run_stage(args):
+    worker = make_worker(args.stage, args)
+    index, count = parse_shard(args.shard)
+    worker.shard = (index, count)
+    if args.memory_budget:
+        worker.memory_budget = parse_size(args.memory_budget)
+
+    worker.stats.connect(
+        lambda rate, eta: print(f"\r{worker.processed}/{worker.total}  {rate:.1f} images/s  ETA {format_duration(eta)}  ",
+                                end="", flush=True)
+    )
+    worker.run()  # runs in this thread, no event loop needed
+    print()
+
+    if worker.failure:
+        print(f"Error: {worker.failure}", file=sys.stderr)
+        return 1
+
+    path = manifest_path(args.manifests or os.path.join(args.project, "manifests"), args.stage, index, count)
+    write_manifest(path, worker)
+    print(f"Shard {index}/{count}: {worker.processed} items, {len(worker.errors)} errors. Manifest: {path}")
+    print(f"Memory: {worker.memory_report()}")
+    for error in worker.errors:
+        print(f"  {error}", file=sys.stderr)
+    return 1 if worker.errors else 0
+
+
+def run_merge(args):
+    worker = make_worker(args.stage, args)
+    manifest_dir = args.manifests or os.path.join(args.project, "manifests")
+    rows, problems = merge_manifests(manifest_dir, args.stage, worker)
+    print(f"Merged {len(rows)} items into {os.path.join(manifest_dir, f'manifest_{args.stage}.csv')}")
+    if problems:
+        print(f"{len(problems)} problem(s):", file=sys.stderr)
+        for problem in problems:
+            print(f"  {problem}", file=sys.stderr)
+        return 1
+    print("Complete: every item was processed and all outputs are present.")
+    return 0
+
+
+def run_watch(args):
+    worker = WatchWorker(args.manufactured, args.natural, args.project, args.size, args.params)
+    worker.log.connect(print)
+    try:
+        worker.run()  # until interrupted with Ctrl+C
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+    return 0
+
+
+def run_stats(args):
+    output = args.output or os.path.join(args.project, "stimulus_stats.csv")
+    worker = StimulusStatsWorker(args.project, output)
+    worker.run()
+    if worker.failure:
+        print(f"Error: {worker.failure}", file=sys.stderr)
+        return 1
+    print(f"Measured {len(worker.rows)} images. Table: {output}")
+    for error in worker.errors:
+        print(f"  {error}", file=sys.stderr)
+    return 1 if worker.errors else 0
+
+
+def run_sequences(args):
+    experiment_dir = os.path.join(args.project, "8_experiment")
+    worker = TrialSequenceWorker(
+        experiment_dir, args.output or os.path.join(experiment_dir, "sequences"), args.participants,
+        pairings_file=os.path.join(args.project, "4_super_pairings", "pairs.csv"),
+        phases=args.phases.split(","), min_gap=args.min_gap, max_run=args.max_run,
+        counterbalance=args.counterbalance, pre_exposure=args.pre_exposure, seed=args.seed
+    )
+    worker.run()
+    if worker.failure:
+        print(f"Error: {worker.failure}", file=sys.stderr)
+        return 1
+    print(f"Wrote {worker.processed} sequences (seed {worker.settings['seed']}) to {worker.output_dir}")
+    for error in worker.errors:
+        print(f"  {error}", file=sys.stderr)
+    return 1 if worker.errors else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run MoonPy batch stages from the command line.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(p):
+        p.add_argument("--project", required=True, help="Project folder containing the numbered stage folders.")
+        p.add_argument("--params", help="Parameter file for the mooney stage (default PROJECT/threshold_blur.csv).")
+        p.add_argument("--blur", choices=BLUR_ENGINES,
+                       help="Blur engine for the mooney stage, instead of the one recorded for each image.")
+        p.add_argument("--alpha", type=float, default=0.5, help="Alpha for the superimpose stage.")
+        p.add_argument("--preset", choices=[name for name, preset in PRESETS.items() if len(preset.layers) == 2],
+                       default=DEFAULT_PRESET, help="Colour preset for the superimpose stage.")
+        p.add_argument("--layer-encoding", choices=list(PROFILES), default=DEFAULT_PROFILE,
+                       help="Encoding for the cyan/magenta layers of the superimpose stage.")
+        p.add_argument("--composite-encoding", choices=list(PROFILES), default=DEFAULT_PROFILE,
+                       help="Encoding for the superimposed images.")
+        p.add_argument("--no-layers", action="store_true",
+                       help="Only write the superimposed images, not the cyan/magenta layers.")
+        p.add_argument("--manifests", help="Folder for shard manifests (default PROJECT/manifests).")
+
+    for stage in STAGES:
+        p = subparsers.add_parser(stage, help=f"Run the {stage} stage.")
+        add_common(p)
+        p.add_argument("--shard", default="0/1", help="This machine's shard as index/count, e.g. 0/4.")
+        p.add_argument("--memory-budget",
+                       help="Memory the stage may use, e.g. 16G (default: MOONPY_MEMORY_BUDGET or half of free memory).")
+        p.set_defaults(stage=stage, handler=run_stage)
+
+    p = subparsers.add_parser("merge", help="Merge shard manifests and verify completeness.")
+    p.add_argument("stage", choices=STAGES)
+    add_common(p)
+    p.set_defaults(handler=run_merge)
+
+    p = subparsers.add_parser("watch", help="Process new or changed source images as they arrive.")
+    add_common(p)
+    p.add_argument("--manufactured", required=True, help="Folder of manufactured source images.")
+    p.add_argument("--natural", required=True, help="Folder of natural source images.")
+    p.add_argument("--size", type=int, default=500, help="Square crop size in pixels.")
+    p.set_defaults(handler=run_watch)
+
+    p = subparsers.add_parser("stats", help="Measure Mooney and superMooney images into one table.")
+    p.add_argument("--project", required=True, help="Project folder containing 3_mooney and 7_superimposed.")
+    p.add_argument("--output", help="CSV file to write (default PROJECT/stimulus_stats.csv).")
+    p.set_defaults(handler=run_stats)
+
+    p = subparsers.add_parser("sequences", help="Generate a randomised trial sequence for each participant.")
+    p.add_argument("--project", required=True, help="Project folder containing 8_experiment.")
+    p.add_argument("--participants", type=int, required=True, help="Number of participants.")
+    p.add_argument("--phases", default=",".join(PHASES),
+                   help="Phase order, e.g. greyscale,mooney,super (greyscale must come before mooney).")
+    p.add_argument("--min-gap", type=int, default=0, help="Do not show a source image again within this many trials.")
+    p.add_argument("--max-run", type=int, default=0,
+                   help="At most this many images of one category in a row within a phase (0 for no limit).")
+    p.add_argument("--counterbalance", choices=["alternate", "CB1", "CB2"], default="alternate",
+                   help="Counterbalance condition, alternating between participants by default.")
+    p.add_argument("--pre-exposure", choices=["alternate", "all"], default="alternate",
+                   help="Pre-expose set A and set B to alternate participants, or every image to everyone.")
+    p.add_argument("--seed", type=int, help="Random seed (default: a fresh seed, recorded in sequences.json).")
+    p.add_argument("--output", help="Output folder (default PROJECT/8_experiment/sequences).")
+    p.set_defaults(handler=run_sequences)
+
+    args = parser.parse_args(argv)
+    try:
+        return args.handler(args)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
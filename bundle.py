@@ -0,0 +1,116 @@
+import os
+import io
+import json
+import mmap
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+BUNDLE_VERSION = 1
+
+# Each stimulus starts on a 4 KiB boundary, so reading one never straddles more pages than it needs
+ALIGNMENT = 4096
+
+
+def index_path(bundle_path):
+    return os.path.splitext(bundle_path)[0] + ".json"
+
+
+class BundleWriter:
+    """Streams encoded stimulus files into one binary file plus a JSON index.
+
+    The files are stored exactly as encoded (PNG/JPEG bytes), so a stimulus
+    read back from the bundle is byte-identical to the file in 8_experiment.
+    The index records name, offset, size, width, height and format for each.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path + ".partial", "wb")
+        self.entries = []
+        self.offset = 0
+
+    def add(self, name, data):
+        with Image.open(io.BytesIO(data)) as img:  # header only
+            width, height = img.size
+            mode, fmt = img.mode, img.format
+
+        padding = -self.offset % ALIGNMENT
+        if padding:
+            self.file.write(b"\0" * padding)
+            self.offset += padding
+
+        self.file.write(data)
+        self.entries.append({
+            "name": name,
+            "offset": self.offset,
+            "size": len(data),
+            "width": width,
+            "height": height,
+            "mode": mode,
+            "format": fmt
+        })
+        self.offset += len(data)
+
+    def close(self):
+        self.file.close()
+        os.replace(self.path + ".partial", self.path)
+        index = {
+            "version": BUNDLE_VERSION,
+            "bundle": os.path.basename(self.path),
+            "alignment": ALIGNMENT,
+            "stimuli": self.entries
+        }
+        with open(index_path(self.path), "w") as f:
+            json.dump(index, f, indent=1)
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.path + ".partial"):
+            os.remove(self.path + ".partial")
+
+
+class Bundle:
+    """Read-only access to a stimulus bundle, memory-mapped so each stimulus is one slice.
+
+        bundle = Bundle("8_experiment/stimuli.bundle")
+        img = bundle.load("2_mooney_a_man_cup.jpg")         # numpy array via cv2
+        data = bundle.read_bytes("3_super_CB1_1.png")      # the original file bytes
+    """
+
+    def __init__(self, path):
+        with open(index_path(path)) as f:
+            index = json.load(f)
+        self.entries = {entry["name"]: entry for entry in index["stimuli"]}
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.entries else None
+
+    def names(self):
+        return list(self.entries)
+
+    def view(self, name):
+        entry = self.entries[name]
+        return memoryview(self.map)[entry["offset"]:entry["offset"] + entry["size"]]
+
+    def read_bytes(self, name):
+        return bytes(self.view(name))
+
+    def load(self, name, flags=cv2.IMREAD_UNCHANGED):
+        return cv2.imdecode(np.frombuffer(self.view(name), dtype=np.uint8), flags)
+
+    def open_image(self, name):
+        return Image.open(io.BytesIO(self.read_bytes(name)))
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
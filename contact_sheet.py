@@ -0,0 +1,232 @@
+import os
+import sys
+import cv2
+import numpy as np
+from PIL import Image
+from PyQt5.QtWidgets import (
+    QApplication, QWidget, QLabel, QPushButton, QFileDialog,
+    QVBoxLayout, QHBoxLayout, QSpinBox, QMessageBox
+)
+
+from project_index import list_images
+from worker import BatchWorker, ProgressPanel, report_outcome
+
+
+LABEL_HEIGHT = 18
+
+
+def load_thumbnail(path, tile):
+    """Decode path at reduced resolution and return an RGB array no larger than tile x tile."""
+    with Image.open(path) as img:
+        # JPEGs are decoded straight at 1/2, 1/4 or 1/8 scale; other formats use reduce()
+        img.draft('RGB', (tile, tile))
+        img.thumbnail((tile, tile), Image.BILINEAR, reducing_gap=2.0)
+        if img.mode in ('RGBA', 'LA', 'P'):
+            # Transparent cyan/magenta layers are shown over white, as they are in the composites
+            rgba = img.convert('RGBA')
+            img = Image.new('RGBA', rgba.size, (255, 255, 255, 255))
+            img.alpha_composite(rgba)
+        return np.asarray(img.convert('RGB'))
+
+
+def sheet_name(folder):
+    parent, name = os.path.split(os.path.normpath(folder))
+    if name in ("CB1", "CB2"):
+        name = f"{os.path.basename(parent)}_{name}"
+    return name
+
+
+class ContactSheetWorker(BatchWorker):
+    def __init__(self, input_dir, output_dir, tile=160, columns=10, rows=8):
+        super().__init__()
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.tile = tile
+        self.columns = columns
+        self.rows = rows
+        self.sheets = []
+
+    def setup(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.files = list_images(self.input_dir)
+        self.per_sheet = self.columns * self.rows
+        self.canvas = None
+        self.sheet_index = -1
+        self.sheets = []
+
+    def items(self):
+        return list(enumerate(self.files))
+
+    def item_name(self, item):
+        return item[1]
+
+    def item_path(self, item):
+        return os.path.join(self.input_dir, item[1])
+
+    def load(self, item):
+        return load_thumbnail(os.path.join(self.input_dir, item[1]), self.tile)
+
+    def new_canvas(self, count):
+        rows = -(-count // self.columns)
+        cell_h = self.tile + LABEL_HEIGHT
+        self.canvas = np.full((rows * cell_h, self.columns * self.tile, 3), 255, dtype=np.uint8)
+        # (row, y, column, x, channel) view of the same buffer, so each cell is addressed without copying
+        self.cells = self.canvas.reshape(rows, cell_h, self.columns, self.tile, 3)
+
+    def process(self, item, thumb):
+        position, name = item
+        sheet, slot = divmod(position, self.per_sheet)
+        if sheet != self.sheet_index:
+            # Unreadable files just leave a blank cell, so sheets are finished by position not by count
+            if self.canvas is not None:
+                self.save_sheet(item)
+            self.sheet_index = sheet
+            self.new_canvas(min(self.per_sheet, len(self.files) - sheet * self.per_sheet))
+
+        row, col = divmod(slot, self.columns)
+        h, w = thumb.shape[:2]
+        top = (self.tile - h) // 2
+        left = (self.tile - w) // 2
+        self.cells[row, top:top + h, col, left:left + w] = thumb
+
+        # cv2 drawing needs a contiguous buffer, so the label is drawn on its own strip and copied in
+        label = np.full((LABEL_HEIGHT, self.tile, 3), 255, dtype=np.uint8)
+        text = os.path.splitext(name)[0]
+        max_chars = max(4, self.tile // 7)
+        if len(text) > max_chars:
+            text = text[:max_chars - 1] + "~"
+        cv2.putText(label, text, (3, LABEL_HEIGHT - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.35, (0, 0, 0), 1, cv2.LINE_AA)
+        self.cells[row, self.tile:, col] = label
+
+    def save_sheet(self, item):
+        number = self.sheet_index + 1
+        path = os.path.join(self.output_dir, f"{sheet_name(self.input_dir)}_sheet{number:02d}.png")
+        self.sheets.append(path)
+        # The canvas is handed over to the writer, the next sheet gets a fresh one
+        self.write(item, Image.fromarray(self.canvas).save, path)
+        self.canvas = None
+
+    def teardown(self):
+        if self.canvas is not None:
+            self.save_sheet((-1, f"sheet {self.sheet_index + 1}"))
+
+
+class ContactSheet(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Contact Sheets (QA)")
+
+        default_folder = os.path.join(os.getcwd(), "3_mooney")
+        self.input_dir = default_folder if os.path.isdir(default_folder) else None
+        self.output_dir = os.path.join(os.getcwd(), "contact_sheets")
+
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+
+        self.info_label = QLabel(
+            "Tile every image in a stage folder (e.g. 3_mooney, 5_cyan, 6_magenta, "
+            "7_superimposed/CB1) into labelled contact sheets for quick visual checks."
+        )
+        self.info_label.setWordWrap(True)
+
+        self.input_btn = QPushButton("Select Stage Folder")
+        self.input_btn.clicked.connect(self.select_input_folder)
+        self.input_path_label = QLabel(self.input_dir or "No folder selected")
+        self.input_path_label.setStyleSheet("color: gray;")
+
+        self.output_btn = QPushButton("Select Output Folder")
+        self.output_btn.clicked.connect(self.select_output_folder)
+        self.output_path_label = QLabel(self.output_dir)
+        self.output_path_label.setStyleSheet("color: gray;")
+
+        self.tile_spin = QSpinBox()
+        self.tile_spin.setRange(40, 600)
+        self.tile_spin.setSingleStep(20)
+        self.tile_spin.setValue(160)
+
+        self.columns_spin = QSpinBox()
+        self.columns_spin.setRange(1, 50)
+        self.columns_spin.setValue(10)
+
+        self.rows_spin = QSpinBox()
+        self.rows_spin.setRange(1, 50)
+        self.rows_spin.setValue(8)
+
+        self.run_btn = QPushButton("Make Contact Sheets")
+        self.run_btn.clicked.connect(self.make_sheets)
+
+        self.progress_panel = ProgressPanel()
+
+        self.done_btn = QPushButton("Done")
+        self.done_btn.clicked.connect(self.close)
+
+        layout.addWidget(self.info_label)
+
+        input_layout = QHBoxLayout()
+        input_layout.addWidget(self.input_btn)
+        input_layout.addWidget(self.input_path_label)
+        layout.addLayout(input_layout)
+
+        output_layout = QHBoxLayout()
+        output_layout.addWidget(self.output_btn)
+        output_layout.addWidget(self.output_path_label)
+        layout.addLayout(output_layout)
+
+        grid_layout = QHBoxLayout()
+        grid_layout.addWidget(QLabel("Tile (px):"))
+        grid_layout.addWidget(self.tile_spin)
+        grid_layout.addWidget(QLabel("Columns:"))
+        grid_layout.addWidget(self.columns_spin)
+        grid_layout.addWidget(QLabel("Rows:"))
+        grid_layout.addWidget(self.rows_spin)
+        layout.addLayout(grid_layout)
+
+        layout.addWidget(self.run_btn)
+        layout.addWidget(self.progress_panel)
+        layout.addWidget(self.done_btn)
+
+        self.setLayout(layout)
+        self.resize(600, 300)
+
+    def select_input_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Stage Folder")
+        if folder:
+            self.input_dir = folder
+            self.input_path_label.setText(folder)
+
+    def select_output_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Output Folder")
+        if folder:
+            self.output_dir = folder
+            self.output_path_label.setText(folder)
+
+    def make_sheets(self):
+        if not self.input_dir or not os.path.isdir(self.input_dir):
+            QMessageBox.warning(self, "Warning", "Please select a stage folder.")
+            return
+
+        self.run_btn.setEnabled(False)
+        self.worker = ContactSheetWorker(
+            self.input_dir, self.output_dir,
+            self.tile_spin.value(), self.columns_spin.value(), self.rows_spin.value()
+        )
+        self.progress_panel.attach(self.worker)
+        self.worker.finished.connect(self.sheets_finished)
+        self.worker.start()
+
+    def sheets_finished(self):
+        self.run_btn.setEnabled(True)
+        report_outcome(self, self.worker, f"Wrote {len(self.worker.sheets)} contact sheet(s) to:\n{self.output_dir}")
+
+    def closeEvent(self, event):
+        self.progress_panel.stop()
+        super().closeEvent(event)
+
+
+if __name__ == "__main__":
+    app = QApplication(sys.argv)
+    window = ContactSheet()
+    window.show()
+    sys.exit(app.exec_())
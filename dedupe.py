@@ -0,0 +1,183 @@
+import os
+import csv
+import threading
+import numpy as np
+from PIL import Image
+
+from project_index import shared_index
+from worker import BatchWorker
+
+
+HASH_SIZE = 8           # 8 x 8 = 64-bit difference hash
+MAX_DISTANCE = 6        # hashes at most this many bits apart are near-duplicates
+BLOCK = 256             # rows per block of the pairwise comparison
+EXCLUDED_FILE = "excluded_duplicates.csv"  # in the project folder: the copies Init left out
+
+
+def dhash(path):
+    """64-bit difference hash of the centred square crop that Init would keep, as a Python int."""
+    with Image.open(path) as img:
+        # JPEGs are decoded straight to greyscale at 1/8 scale or less
+        img.draft('L', (HASH_SIZE * 8, HASH_SIZE * 8))
+        width, height = img.size
+        side = min(width, height)
+        left, top = (width - side) // 2, (height - side) // 2
+        small = img.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.BOX,
+                                        box=(left, top, left + side, top + side))
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def popcount(values):
+    """Set bits in each element of a uint64 array."""
+    if hasattr(np, "bitwise_count"):  # NumPy 2.0+
+        return np.bitwise_count(values)
+    # Older NumPy: the classic SWAR bit count, still whole-array operations
+    v = values - ((values >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    v = (v & np.uint64(0x3333333333333333)) + ((v >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    v = (v + (v >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return ((v * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(np.uint8)
+
+
+def near_pairs(hashes, max_distance=MAX_DISTANCE):
+    """(i, j) index pairs, i < j, whose hashes differ in at most max_distance bits.
+
+    The comparison is all-against-all, done a block of rows at a time as one XOR
+    and popcount over packed uint64 hashes, so memory stays at BLOCK x n.
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    found = []
+    for start in range(0, len(hashes), BLOCK):
+        rows = hashes[start:start + BLOCK]
+        # Compare against this block and everything after it, so each pair is seen once
+        distances = popcount(rows[:, None] ^ hashes[None, start:])
+        i, j = np.nonzero(distances <= max_distance)
+        keep = j > i
+        found.append(np.stack([i[keep] + start, j[keep] + start], axis=1))
+    if not found:
+        return np.empty((0, 2), dtype=np.intp)
+    return np.concatenate(found)
+
+
+def clusters(count, pairs):
+    """Group indices connected by pairs (union-find). Returns only groups of two or more."""
+    parent = list(range(count))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in pairs:
+        root_i, root_j = find(int(i)), find(int(j))
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    groups = {}
+    for i in range(count):
+        groups.setdefault(find(i), []).append(i)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+# Hashes are kept for the session, keyed by file state, so re-running Init does not re-decode
+hash_cache = {}
+hash_cache_lock = threading.Lock()
+
+
+class DedupeWorker(BatchWorker):
+    """Hashes every image in the source folders and groups near-duplicates.
+
+    After the run, duplicates is a list of clusters, each a list of
+    (kind, folder, filename) with the copy to keep (the largest) first.
+    """
+
+    bytes_per_pixel = 4
+
+    def __init__(self, sources, max_distance=MAX_DISTANCE):
+        super().__init__()
+        self.sources = sources  # [(kind, folder)]
+        self.max_distance = max_distance
+        self.hashes = {}
+        self.duplicates = []
+
+    def setup(self):
+        self.entries = {folder: shared_index.scan(folder) for _, folder in self.sources}
+
+    def items(self):
+        return [(kind, folder, name) for kind, folder in self.sources for name in sorted(self.entries[folder])]
+
+    def item_name(self, item):
+        return f"{item[0]}/{item[2]}"
+
+    def item_path(self, item):
+        return os.path.join(item[1], item[2])
+
+    def load(self, item):
+        _, folder, name = item
+        info = self.entries[folder][name]
+        key = (info.path, info.mtime, info.bytes)
+        with hash_cache_lock:
+            value = hash_cache.get(key)
+        if value is None:
+            value = dhash(info.path)
+            with hash_cache_lock:
+                hash_cache[key] = value
+        return value
+
+    def process(self, item, value):
+        self.hashes[item] = value
+
+    def teardown(self):
+        items = list(self.hashes)
+        pairs = near_pairs([self.hashes[item] for item in items], self.max_distance)
+
+        def size(item):
+            info = self.entries[item[1]][item[2]]
+            return (info.width or 0) * (info.height or 0)
+
+        self.duplicates = []
+        for group in clusters(len(items), pairs):
+            members = sorted((items[i] for i in group), key=lambda item: (-size(item), item))
+            self.duplicates.append(members)
+        self.duplicates.sort()
+
+    def excluded(self):
+        """Every duplicate except the one kept from each cluster, as (folder, filename)."""
+        return {(folder, name) for group in self.duplicates for _, folder, name in group[1:]}
+
+
+def write_report(path, duplicates):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["cluster", "kind", "folder", "file", "kept"])
+        for number, group in enumerate(duplicates, 1):
+            for position, (kind, folder, name) in enumerate(group):
+                writer.writerow([number, kind, folder, name, "yes" if position == 0 else "no"])
+
+
+def write_excluded(path, excluded):
+    """Record the (folder, filename) copies Init left out, so that Watch leaves them out too."""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["folder", "file"])
+        for folder, name in sorted(excluded):
+            writer.writerow([os.path.abspath(folder), name])
+
+
+def read_excluded(path):
+    """{(absolute folder, filename)} as written by write_excluded; empty if there is no file."""
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline="") as f:
+        return {(row["folder"], row["file"]) for row in csv.DictReader(f)}
+
+
+def format_duplicates(duplicates, limit=15):
+    lines = []
+    for group in duplicates[:limit]:
+        lines.append("  ≈  ".join(f"{kind}/{name}" for kind, _, name in group))
+    if len(duplicates) > limit:
+        lines.append(f"... and {len(duplicates) - limit} more")
+    return "\n".join(lines)
@@ -0,0 +1,39 @@
+import numpy as np
+from collections import namedtuple
+from PIL import Image
+
+
+EncodingProfile = namedtuple("EncodingProfile", ["label", "extension", "format", "options", "indexed"])
+
+# Every profile is lossless: decoding the file gives back exactly the rendered pixels
+PROFILES = {
+    "png": EncodingProfile("PNG", ".png", "PNG", {}, False),
+    "png-fast": EncodingProfile("PNG, fast (level 1)", ".png", "PNG", {"compress_level": 1}, False),
+    "png-small": EncodingProfile("PNG, smallest (level 9)", ".png", "PNG", {"compress_level": 9}, False),
+    "png-indexed": EncodingProfile("PNG, indexed colour", ".png", "PNG", {}, True),
+    # exact keeps the colour of fully transparent pixels, which libwebp otherwise rewrites
+    "webp": EncodingProfile("WebP, lossless", ".webp", "WEBP", {"lossless": True, "exact": True}, False),
+}
+DEFAULT_PROFILE = "png"
+
+
+def to_indexed(img):
+    """img as a 'P' image whose RGBA palette holds exactly its colours, or None if it has more than 256.
+
+    Cyan/magenta layers have two colours and superMooneys four, so they
+    index without any quantisation and compress much faster.
+    """
+    rgba = np.ascontiguousarray(np.asarray(img.convert("RGBA")))
+    packed = rgba.view(np.uint32)[..., 0]
+    colours, index = np.unique(packed, return_inverse=True)
+    if len(colours) > 256:
+        return None
+    indexed = Image.fromarray(index.reshape(packed.shape).astype(np.uint8), mode="P")
+    indexed.putpalette(colours.view(np.uint8).tobytes(), rawmode="RGBA")
+    return indexed
+
+
+def save_image(img, path, profile):
+    if profile.indexed:
+        img = to_indexed(img) or img
+    img.save(path, format=profile.format, **profile.options)
@@ -0,0 +1,582 @@
+"""Golden-output equivalence checks for the rendering engines.
+
+A faster implementation of the Mooney blur/threshold, the cyan/magenta
+superimposition or Init's square crop must reproduce the published stimuli
+exactly. This harness renders a deterministic corpus over a grid of
+parameters with a frozen copy of the reference code and with every
+registered engine, and compares the results pixel for pixel.
+
+    python golden.py check
+    python golden.py check --corpus PROJECT/2_grey --report golden_report.csv --diff-dir diffs
+    python golden.py freeze golden
+    python golden.py check --golden golden
+
+'freeze' writes the synthetic corpus as PNGs (grey/ and colour/) plus
+golden.json, the SHA-256 of every reference output. 'check --golden' then
+also verifies the reference itself against those hashes, which catches an
+OpenCV or Pillow upgrade that changes the published output. The exit status is 1 if anything differs.
+
+Approximate engines (the fast blur) are not expected to be identical: they
+pass while their largest difference stays within the bound their entry in
+TOLERANCES gives for each case, and the report gives the deviation actually
+measured. The blur cases include, for every sigma, an image built to
+maximise the fast blur's error.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import hashlib
+import argparse
+import cv2
+import numpy as np
+from PIL import Image
+
+from project_index import list_images
+from worker import format_duration
+
+
+SEED = 20240917
+
+SIGMAS = [s / 2 for s in range(31)]           # every position of the Mooney sigma slider
+THRESHOLDS = [0, 1, 64, 126, 127, 128, 200, 254, 255]
+ALPHAS = [0.0, 0.1, 0.25, 0.3, 0.5, 0.7, 0.75, 1.0]
+SIZES = [1, 31, 64, 250, 500]
+ADAPTIVE_SIGMAS = [0.0, 1.0, 2.5, 8.0]
+BLOCK_SIZES = [3, 11, 51, 255]
+OFFSETS = [-10, 0, 7]
+BLUR_SIGMAS = [0.0, 1.0, 2.0, 2.5, 3.5, 5.0, 7.5, 10.0, 12.5, 15.0]
+
+
+# Reference implementations: copies of the code the published stimuli were made with.
+# Do not optimise these; they are what every engine is measured against.
+
+def reference_mooney(img, sigma, threshold):
+    if sigma > 0:
+        ksize = int(2 * round(3 * sigma) + 1)
+        img_blur = cv2.GaussianBlur(img, (ksize, ksize), sigma)
+    else:
+        img_blur = img.copy()
+    _, img_thresh = cv2.threshold(img_blur, threshold, 255, cv2.THRESH_BINARY)
+    return img_thresh
+
+
+def reference_blur(img, sigma):
+    if sigma > 0:
+        ksize = int(2 * round(3 * sigma) + 1)
+        return cv2.GaussianBlur(img, (ksize, ksize), sigma)
+    return img.copy()
+
+
+def reference_adaptive(img, sigma, block_size, offset):
+    # Adaptive mode was added after the first studies; OpenCV's own adaptive threshold is its reference
+    if sigma > 0:
+        ksize = int(2 * round(3 * sigma) + 1)
+        img = cv2.GaussianBlur(img, (ksize, ksize), sigma)
+    return cv2.adaptiveThreshold(img, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, block_size, offset)
+
+
+def reference_layer(intensity_arr, alpha, rgb):
+    h, w = intensity_arr.shape
+    rgba = np.ones((h, w, 4), dtype=np.uint8) * 255
+    black_mask = intensity_arr < 0.5
+    for channel, value in enumerate(rgb):
+        rgba[..., channel][black_mask] = value
+    rgba[..., 3][black_mask] = int(255 * alpha)
+    rgba[..., 3][~black_mask] = 0
+    return Image.fromarray(rgba, mode='RGBA')
+
+
+def reference_superimpose(img_a, img_b, alpha):
+    """The four layers and two composites Superimpose saves for one pair, as arrays."""
+    arr_a, arr_b = img_a / 255.0, img_b / 255.0
+    a_cyan, b_cyan = reference_layer(arr_a, alpha, (0, 255, 255)), reference_layer(arr_b, alpha, (0, 255, 255))
+    a_magenta, b_magenta = reference_layer(arr_a, alpha, (255, 0, 255)), reference_layer(arr_b, alpha, (255, 0, 255))
+
+    def composite(img1, img2):
+        white_bg = Image.new("RGBA", img1.size, (255, 255, 255, 255))
+        return Image.alpha_composite(Image.alpha_composite(white_bg, img1), img2)
+
+    layers = [a_cyan, b_cyan, a_magenta, b_magenta, composite(a_cyan, b_magenta), composite(b_cyan, a_magenta)]
+    return [np.asarray(layer) for layer in layers]
+
+
+def reference_crop(img, size):
+    width, height = img.size
+    min_dim = min(width, height)
+    left = (width - min_dim) // 2
+    top = (height - min_dim) // 2
+    img_cropped = img.crop((left, top, left + min_dim, top + min_dim))
+    return img_cropped.resize((size, size), Image.LANCZOS)
+
+
+# Engines under test. Each takes the same arguments as its reference and must return
+# identical pixels; register a new fast path here before switching the app over to it.
+
+def mooney_render(img, sigma, threshold):
+    from mooney import render_mooney
+    return render_mooney(img, sigma, threshold)
+
+
+def mooney_threshold_stack(img, sigma, threshold):
+    from mooney import blur_image, threshold_stack
+    return threshold_stack(blur_image(img, sigma), [threshold])[0]
+
+
+def mooney_sweep(img, sigma, threshold):
+    from sweep import render_sweep
+    return render_sweep(img, [sigma], [threshold])[0, 0]
+
+
+def through_qimage(thresh):
+    """The pixels of thresh after the Zoom window's conversion to QImage, read back."""
+    from zoom_view import tile_image
+    qimage = tile_image(thresh)
+    height, width = thresh.shape
+    data = np.frombuffer(qimage.constBits().asstring(qimage.sizeInBytes()), dtype=np.uint8)
+    return data.reshape(height, qimage.bytesPerLine())[:, :width]
+
+
+def mooney_tiled(img, sigma, threshold, tile=100):
+    # Small tiles, so that most corpus images are stitched from several
+    from zoom_view import blur_tile
+    h, w = img.shape
+    out = np.empty_like(img)
+    for row in range(-(-h // tile)):
+        for col in range(-(-w // tile)):
+            _, thresh = cv2.threshold(blur_tile(img, sigma, row, col, tile), threshold, 255, cv2.THRESH_BINARY)
+            out[row * tile:(row + 1) * tile, col * tile:(col + 1) * tile] = through_qimage(thresh)
+    return out
+
+
+def blur_exact(img, sigma):
+    from mooney import blur_image
+    return blur_image(img, sigma)
+
+
+def blur_fast(img, sigma):
+    from mooney import blur_image
+    return blur_image(img, sigma, "fast")
+
+
+def blur_fast_tiled(img, sigma, tile=100):
+    from zoom_view import blur_tile
+    h, w = img.shape
+    blurred = np.empty_like(img)
+    for row in range(-(-h // tile)):
+        for col in range(-(-w // tile)):
+            blurred[row * tile:(row + 1) * tile, col * tile:(col + 1) * tile] = blur_tile(img, sigma, row, col, tile, "fast")
+    return blurred
+
+
+def adaptive_render(img, sigma, block_size, offset):
+    from mooney import render_mooney
+    return render_mooney(img, sigma, 0, "adaptive", block_size, offset)
+
+
+def adaptive_tiled(img, sigma, block_size, offset, tile=100):
+    from zoom_view import adaptive_tile
+    h, w = img.shape
+    out = np.empty_like(img)
+    for row in range(-(-h // tile)):
+        for col in range(-(-w // tile)):
+            out[row * tile:(row + 1) * tile, col * tile:(col + 1) * tile] = through_qimage(adaptive_tile(
+                img, sigma, block_size, offset, row, col, tile))
+    return out
+
+
+def superimpose_layers(img_a, img_b, alpha):
+    from superimpose import make_cyan, make_magenta, alpha_composite_white_bg
+    arr_a, arr_b = img_a / 255.0, img_b / 255.0
+    a_cyan, b_cyan = make_cyan(arr_a, alpha), make_cyan(arr_b, alpha)
+    a_magenta, b_magenta = make_magenta(arr_a, alpha), make_magenta(arr_b, alpha)
+    layers = [a_cyan, b_cyan, a_magenta, b_magenta,
+              alpha_composite_white_bg(a_cyan, b_magenta), alpha_composite_white_bg(b_cyan, a_magenta)]
+    return [np.asarray(layer) for layer in layers]
+
+
+def superimpose_compositor(img_a, img_b, alpha):
+    from compositor import layer_luts, apply_lut, composite
+    cyan, magenta = layer_luts("cyan-magenta", alpha)
+    layers = [apply_lut(img_a, cyan), apply_lut(img_b, cyan), apply_lut(img_a, magenta), apply_lut(img_b, magenta)]
+    return layers + [composite([img_a, img_b], [cyan, magenta]), composite([img_b, img_a], [cyan, magenta])]
+
+
+def init_crop(img, size):
+    from init import crop_image
+    return crop_image(img, size)
+
+
+REFERENCES = {
+    "mooney": reference_mooney,
+    "blur": reference_blur,
+    "adaptive": reference_adaptive,
+    "superimpose": reference_superimpose,
+    "crop": reference_crop
+}
+
+ENGINES = {
+    "mooney": {
+        "render_mooney": mooney_render,
+        "threshold_stack": mooney_threshold_stack,
+        "render_sweep": mooney_sweep,
+        "blur_tile": mooney_tiled
+    },
+    "blur": {
+        "blur_image": blur_exact,
+        "fast_blur": blur_fast,
+        "fast_blur_tile": blur_fast_tiled
+    },
+    "adaptive": {
+        "render_mooney": adaptive_render,
+        "adaptive_tile": adaptive_tiled
+    },
+    "superimpose": {
+        "superimpose": superimpose_layers,
+        "compositor": superimpose_compositor
+    },
+    "crop": {
+        "crop_image": init_crop
+    }
+}
+
+
+def fast_blur_tolerance(img, sigma):
+    from mooney import fast_blur_bound
+    return fast_blur_bound(sigma)
+
+
+# Largest difference in grey levels allowed for approximate engines, given the case's arguments;
+# every other engine must be identical
+TOLERANCES = {
+    ("blur", "fast_blur"): fast_blur_tolerance,
+    ("blur", "fast_blur_tile"): fast_blur_tolerance
+}
+
+
+def worst_case_blur(sigma):
+    """White where the fast blur's kernel outweighs the exact one, black elsewhere, with a black border.
+
+    At the centre pixel this is as far apart as the two blurs can be.
+    """
+    from mooney import kernel_difference
+    difference = kernel_difference(sigma)
+    size = len(difference)
+    img = np.zeros((3 * size, 3 * size), dtype=np.uint8)
+    img[size:2 * size, size:2 * size] = np.where(difference > 0, 255, 0)
+    return img
+
+
+def smooth_noise(rng, shape, cell):
+    """Value noise: random values on a coarse grid, bilinearly upsampled (NumPy only, so it is bit-stable)."""
+    h, w = shape
+    grid = rng.random((h // cell + 2, w // cell + 2))
+    y, x = np.arange(h) / cell, np.arange(w) / cell
+    y0, x0 = y.astype(int), x.astype(int)
+    fy, fx = (y - y0)[:, None], (x - x0)[None, :]
+    top = grid[y0][:, x0] * (1 - fx) + grid[y0][:, x0 + 1] * fx
+    bottom = grid[y0 + 1][:, x0] * (1 - fx) + grid[y0 + 1][:, x0 + 1] * fx
+    return top * (1 - fy) + bottom * fy
+
+
+def to_uint8(values):
+    values = (values - values.min()) / max(values.max() - values.min(), 1e-12)
+    return np.round(values * 255).astype(np.uint8)
+
+
+def synthetic_corpus(seed=SEED):
+    """Deterministic greyscale test images covering flat areas, every intensity, edges and odd sizes."""
+    rng = np.random.default_rng(seed)
+    corpus = {}
+    corpus["flat_black"] = np.zeros((33, 47), dtype=np.uint8)
+    corpus["flat_white"] = np.full((47, 33), 255, dtype=np.uint8)
+    corpus["ramp"] = np.tile(np.arange(256, dtype=np.uint8), (40, 1))
+    corpus["noise"] = rng.integers(0, 256, (97, 131), dtype=np.uint8)
+    corpus["boundary_stripes"] = np.where(np.arange(90)[None, :] // 3 % 2, 128, 127).repeat(70, axis=0).astype(np.uint8)
+    yy, xx = np.mgrid[:120, :90]
+    corpus["checker"] = ((yy // 7 + xx // 7) % 2 * 255).astype(np.uint8)
+    corpus["pixel"] = np.array([[200]], dtype=np.uint8)
+    corpus["line"] = rng.integers(0, 256, (1, 50), dtype=np.uint8)
+    corpus["column"] = rng.integers(0, 256, (61, 2), dtype=np.uint8)
+    corpus["clouds"] = to_uint8(smooth_noise(rng, (256, 256), 16))
+
+    blobs = np.full((200, 300), 230.0)
+    yy, xx = np.mgrid[:200, :300]
+    for _ in range(25):
+        cy, cx, r = rng.integers(0, 200), rng.integers(0, 300), rng.integers(5, 40)
+        blobs[(yy - cy) ** 2 + (xx - cx) ** 2 < r * r] = rng.integers(0, 256)
+    corpus["blobs"] = blobs.astype(np.uint8)
+
+    # Roughly photograph-like: several octaves of noise at the default Init size
+    photo = sum(smooth_noise(rng, (500, 375), cell) / cell ** 0.5 for cell in (4, 16, 64, 128))
+    corpus["photo"] = to_uint8(photo)
+    return corpus
+
+
+def colour_corpus(seed=SEED):
+    """Deterministic source photographs for the crop, in the modes Init meets (RGB, RGBA, L)."""
+    rng = np.random.default_rng(seed + 1)
+    images = {}
+    for name, (h, w) in [("landscape", (375, 500)), ("portrait", (517, 389)), ("square", (64, 64)), ("thin", (3, 40))]:
+        rgb = np.stack([to_uint8(smooth_noise(rng, (h, w), 8) + rng.random((h, w)) * 0.3) for _ in range(3)], axis=2)
+        images[f"{name}_rgb"] = Image.fromarray(rgb, mode="RGB")
+    images["landscape_rgba"] = Image.fromarray(
+        np.dstack([np.asarray(images["landscape_rgb"]), rng.integers(0, 256, (375, 500), dtype=np.uint8)]), mode="RGBA")
+    images["portrait_l"] = images["portrait_rgb"].convert("L")
+    return images
+
+
+def load_corpus(folder):
+    """Greyscale and source images from a folder of real images, e.g. a project's 2_grey or 1_source_images."""
+    grey, colour = {}, {}
+    for name in list_images(folder):
+        with Image.open(os.path.join(folder, name)) as img:
+            img.load()
+            grey[name] = np.array(img.convert("L"))
+            colour[name] = img.copy()
+    return grey, colour
+
+
+def pair_up(grey):
+    """Superimpose pairs: neighbouring images of the same size, or an image with a shifted copy of itself."""
+    names = sorted(grey)
+    pairs = []
+    for i, name in enumerate(names):
+        partner = next((other for other in names[i + 1:] if grey[other].shape == grey[name].shape), None)
+        if partner is not None:
+            pairs.append((f"{name}+{partner}", grey[name], grey[partner]))
+        else:
+            h, w = grey[name].shape
+            pairs.append((f"{name}+shifted", grey[name], np.roll(grey[name], (h // 3, w // 2), axis=(0, 1))))
+    return pairs
+
+
+def cases(grey, colour, grid):
+    """(operation, image, params, args) for every combination to check."""
+    for name in sorted(grey):
+        for sigma in grid["sigmas"]:
+            for threshold in grid["thresholds"]:
+                yield "mooney", name, f"sigma={sigma:g} threshold={threshold}", (grey[name], sigma, threshold)
+        for sigma in grid.get("blur_sigmas", []):
+            yield "blur", name, f"sigma={sigma:g}", (grey[name], sigma)
+        for sigma in grid.get("adaptive_sigmas", []):
+            for block_size in grid["block_sizes"]:
+                for offset in grid["offsets"]:
+                    yield ("adaptive", name, f"sigma={sigma:g} block_size={block_size} offset={offset}",
+                           (grey[name], sigma, block_size, offset))
+    from mooney import uses_boxes
+    for sigma in grid.get("blur_sigmas", []):
+        if uses_boxes(sigma, "fast"):
+            yield "blur", "worst_case", f"sigma={sigma:g}", (worst_case_blur(sigma), sigma)
+    for name, img_a, img_b in pair_up(grey):
+        for alpha in grid["alphas"]:
+            yield "superimpose", name, f"alpha={alpha:g}", (img_a, img_b, alpha)
+    for name in sorted(colour):
+        for size in grid["sizes"]:
+            yield "crop", name, f"size={size}", (colour[name], size)
+
+
+def as_arrays(output):
+    if isinstance(output, Image.Image):
+        return [np.asarray(output)], [output.mode]
+    if isinstance(output, np.ndarray):
+        return [output], [None]
+    return [np.asarray(o) for o in output], [o.mode if isinstance(o, Image.Image) else None for o in output]
+
+
+def digest(output):
+    arrays, modes = as_arrays(output)
+    h = hashlib.sha256()
+    for array, mode in zip(arrays, modes):
+        h.update(f"{array.shape}{array.dtype}{mode}".encode())
+        h.update(np.ascontiguousarray(array).tobytes())
+    return h.hexdigest()
+
+
+def compare(expected, actual):
+    """(status, differing pixels, max abs difference, first differing (x, y), per-pixel diff mask)."""
+    expected_arrays, expected_modes = as_arrays(expected)
+    actual_arrays, actual_modes = as_arrays(actual)
+    if len(expected_arrays) != len(actual_arrays):
+        return "shape", None, None, None, None
+    differing, max_diff, first, masks = 0, 0, None, []
+    for e, a, e_mode, a_mode in zip(expected_arrays, actual_arrays, expected_modes, actual_modes):
+        if e.shape != a.shape or e.dtype != a.dtype:
+            return "shape", None, None, None, None
+        if e_mode != a_mode:
+            return "mode", None, None, None, None
+        diff = np.abs(e.astype(np.int32) - a.astype(np.int32))
+        if diff.ndim == 3:
+            diff = diff.max(axis=2)
+        mask = diff > 0
+        count = int(mask.sum())
+        if count:
+            if first is None:
+                y, x = np.argwhere(mask)[0]
+                first = (int(x), int(y))
+            differing += count
+            max_diff = max(max_diff, int(diff.max()))
+        masks.append(mask)
+    status = "match" if differing == 0 else "mismatch"
+    return status, differing, max_diff, first, masks
+
+
+def write_diff(diff_dir, operation, engine, image, params, masks):
+    """Differing pixels in white, one panel per output, side by side."""
+    height = max(mask.shape[0] for mask in masks)
+    panels = [np.pad(mask.astype(np.uint8) * 255, ((0, height - mask.shape[0]), (0, 2)), constant_values=64)
+              for mask in masks]
+    safe = "".join(c if c.isalnum() or c in "._-" else "_" for c in f"{operation}_{engine}_{image}_{params}")
+    Image.fromarray(np.hstack(panels)).save(os.path.join(diff_dir, safe + ".png"))
+
+
+def make_grid(args):
+    return {"sigmas": args.sigmas, "thresholds": args.thresholds, "alphas": args.alphas, "sizes": args.sizes,
+            "adaptive_sigmas": args.adaptive_sigmas, "block_sizes": args.block_sizes, "offsets": args.offsets,
+            "blur_sigmas": args.blur_sigmas}
+
+
+def run_check(args):
+    grid = make_grid(args)
+    golden = None
+    if args.golden:
+        grey, _ = load_corpus(os.path.join(args.golden, "grey"))
+        _, colour = load_corpus(os.path.join(args.golden, "colour"))
+        with open(os.path.join(args.golden, "golden.json")) as f:
+            golden = json.load(f)
+        grid = golden["grid"]
+    elif args.corpus:
+        grey, colour = load_corpus(args.corpus)
+    else:
+        grey, colour = synthetic_corpus(), colour_corpus()
+
+    engines = {op: {name: fn for name, fn in found.items() if not args.engine or name in args.engine}
+               for op, found in ENGINES.items() if not args.operation or op in args.operation}
+    if args.diff_dir:
+        os.makedirs(args.diff_dir, exist_ok=True)
+
+    rows = []
+    totals = {}
+    drift = 0
+    start = time.perf_counter()
+    for operation, image, params, call_args in cases(grey, colour, grid):
+        if operation not in engines:
+            continue
+        expected = REFERENCES[operation](*call_args)
+        if golden is not None:
+            key = f"{operation}/{image}/{params}"
+            if golden["outputs"].get(key) != digest(expected):
+                drift += 1
+                rows.append([operation, "reference", image, params, "drift", "", "", ""])
+        for engine, render in engines[operation].items():
+            try:
+                status, differing, max_diff, first, masks = compare(expected, render(*call_args))
+            except Exception as e:
+                status, differing, max_diff, first, masks = "error", None, None, None, None
+                print(f"{operation}/{engine} {image} {params}: {e}", file=sys.stderr)
+            tolerance = TOLERANCES.get((operation, engine))
+            if status == "mismatch" and tolerance is not None and max_diff <= tolerance(*call_args):
+                status = "within"
+            total = totals.setdefault((operation, engine), [0, 0, 0])
+            total[0] += 1
+            if max_diff is not None:
+                total[2] = max(total[2], max_diff)
+            if status not in ("match", "within"):
+                total[1] += 1
+                if args.diff_dir and masks:
+                    write_diff(args.diff_dir, operation, engine, image, params, masks)
+            if status != "match" or args.report_all:
+                rows.append([operation, engine, image, params, status,
+                             "" if differing is None else differing,
+                             "" if max_diff is None else max_diff,
+                             "" if first is None else f"{first[0]},{first[1]}"])
+
+    if args.report:
+        with open(args.report, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["operation", "engine", "image", "params", "status",
+                             "pixels_differing", "max_abs_diff", "first_diff_xy"])
+            writer.writerows(rows)
+
+    for (operation, engine), (count, failed, deviation) in totals.items():
+        if (operation, engine) in TOLERANCES:
+            print(f"{operation:12} {engine:16} {count - failed}/{count} within bound (max difference {deviation})")
+        else:
+            print(f"{operation:12} {engine:16} {count - failed}/{count} identical")
+    if golden is not None:
+        print(f"Reference drift from {args.golden}: {drift} outputs")
+    for row in rows[:20]:
+        if row[4] not in ("match", "within"):
+            print("  " + "  ".join(str(v) for v in row if v != ""))
+    failures = drift + sum(failed for _, failed, _ in totals.values())
+    print(f"{'FAILED' if failures else 'OK'} in {format_duration(time.perf_counter() - start)}")
+    return 1 if failures else 0
+
+
+def run_freeze(args):
+    grid = make_grid(args)
+    grey_dir, colour_dir = os.path.join(args.folder, "grey"), os.path.join(args.folder, "colour")
+    os.makedirs(grey_dir, exist_ok=True)
+    os.makedirs(colour_dir, exist_ok=True)
+    for name, img in synthetic_corpus().items():
+        Image.fromarray(img).save(os.path.join(grey_dir, f"{name}.png"))
+    for name, img in colour_corpus().items():
+        img.save(os.path.join(colour_dir, f"{name}.png"))
+
+    # Hash the references as read back from disk, exactly as 'check --golden' will see them
+    grey, _ = load_corpus(grey_dir)
+    _, colour = load_corpus(colour_dir)
+    outputs = {f"{operation}/{image}/{params}": digest(REFERENCES[operation](*call_args))
+               for operation, image, params, call_args in cases(grey, colour, grid)}
+    golden = {
+        "versions": {"opencv": cv2.__version__, "pillow": Image.__version__, "numpy": np.__version__},
+        "grid": grid,
+        "outputs": outputs
+    }
+    with open(os.path.join(args.folder, "golden.json"), "w") as f:
+        json.dump(golden, f, indent=1)
+    print(f"Froze {len(outputs)} reference outputs for {len(grey)} images to {args.folder}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check rendering engines against the reference output, pixel for pixel.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_grid(p):
+        p.add_argument("--sigmas", type=float, nargs="+", default=SIGMAS)
+        p.add_argument("--thresholds", type=int, nargs="+", default=THRESHOLDS)
+        p.add_argument("--alphas", type=float, nargs="+", default=ALPHAS)
+        p.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="Crop sizes in pixels.")
+        p.add_argument("--adaptive-sigmas", type=float, nargs="+", default=ADAPTIVE_SIGMAS)
+        p.add_argument("--block-sizes", type=int, nargs="+", default=BLOCK_SIZES)
+        p.add_argument("--offsets", type=int, nargs="+", default=OFFSETS)
+        p.add_argument("--blur-sigmas", type=float, nargs="+", default=BLUR_SIGMAS)
+
+    p = subparsers.add_parser("check", help="Compare every engine with the reference.")
+    add_grid(p)
+    p.add_argument("--corpus", help="Folder of real images to use instead of the synthetic corpus.")
+    p.add_argument("--golden", help="Folder written by 'freeze'; its corpus and grid are used and the reference is checked too.")
+    p.add_argument("--operation", nargs="+", choices=sorted(ENGINES), help="Only check these operations.")
+    p.add_argument("--engine", nargs="+", help="Only check these engines.")
+    p.add_argument("--report", help="CSV file for the per-image results.")
+    p.add_argument("--report-all", action="store_true", help="Include identical results in the report.")
+    p.add_argument("--diff-dir", help="Folder for difference masks of mismatching outputs.")
+    p.set_defaults(handler=run_check)
+
+    p = subparsers.add_parser("freeze", help="Write the synthetic corpus and the reference output hashes.")
+    add_grid(p)
+    p.add_argument("folder")
+    p.set_defaults(handler=run_freeze)
+
+    args = parser.parse_args(argv)
+    try:
+        return args.handler(args)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
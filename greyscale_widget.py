@@ -2,42 +2,47 @@ import os
 import cv2
 from PyQt5.QtWidgets import (
     QWidget, QLabel, QPushButton, QVBoxLayout, QFileDialog,
-    QMessageBox, QProgressBar, QHBoxLayout
+    QMessageBox, QHBoxLayout
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtCore import Qt
 
+from project_index import list_images
+from worker import BatchWorker, ProgressPanel, report_outcome
 
-class GreyscaleWorker(QThread):
-    progress = pyqtSignal(int)
-    finished = pyqtSignal()
+
+class GreyscaleWorker(BatchWorker):
+    valid_extensions = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif')
 
     def __init__(self, input_dir, output_dir):
         super().__init__()
         self.input_dir = input_dir
         self.output_dir = output_dir
 
-    def run(self):
-        valid_extensions = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif')
-        files = [f for f in os.listdir(self.input_dir) if f.lower().endswith(valid_extensions)]
-        total = len(files)
-
+    def setup(self):
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
 
-        for i, file in enumerate(files, 1):
-            img_path = os.path.join(self.input_dir, file)
-            img = cv2.imread(img_path)
-            if img is None:
-                continue
-            grey = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    def items(self):
+        return list_images(self.input_dir, self.valid_extensions)
+
+    def item_path(self, file):
+        return os.path.join(self.input_dir, file)
 
-            base_name = os.path.splitext(file)[0]  # remove original extension
-            save_path = os.path.join(self.output_dir, base_name + '.jpg')
+    def load(self, file):
+        return cv2.imread(os.path.join(self.input_dir, file))
 
-            cv2.imwrite(save_path, grey)
-            self.progress.emit(int(i / total * 100))
+    def outputs(self, file):
+        return [os.path.join(self.output_dir, os.path.splitext(file)[0] + '.jpg')]
 
-        self.finished.emit()
+    def process(self, file, img):
+        if img is None:
+            raise ValueError("could not be read")
+        grey = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+        base_name = os.path.splitext(file)[0]  # remove original extension
+        save_path = os.path.join(self.output_dir, base_name + '.jpg')
+
+        self.write(file, cv2.imwrite, save_path, grey)
 
 
 class GreyscaleWidget(QWidget):
@@ -70,8 +75,7 @@ class GreyscaleWidget(QWidget):
         self.convert_btn.setEnabled(True)
         self.convert_btn.clicked.connect(self.start_conversion)
 
-        self.progress_bar = QProgressBar()
-        self.progress_bar.setValue(0)
+        self.progress_panel = ProgressPanel()
 
         layout.addWidget(self.info_label)
 
@@ -86,7 +90,7 @@ class GreyscaleWidget(QWidget):
         layout.addLayout(output_layout)
 
         layout.addWidget(self.convert_btn)
-        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.progress_panel)
 
         self.setLayout(layout)
         self.resize(500, 200)
@@ -117,18 +121,20 @@ class GreyscaleWidget(QWidget):
             return
 
         self.convert_btn.setEnabled(False)
-        self.progress_bar.setValue(0)
 
         self.worker = GreyscaleWorker(self.input_dir, self.output_dir)
-        self.worker.progress.connect(self.progress_bar.setValue)
+        self.progress_panel.attach(self.worker)
         self.worker.finished.connect(self.conversion_finished)
         self.worker.start()
 
     def conversion_finished(self):
-        QMessageBox.information(self, "Done", "All images have been converted to greyscale JPGs.")
         self.convert_btn.setEnabled(True)
-        self.progress_bar.setValue(100)
-        self.close()  # Close this widget only, not the whole app
+        if report_outcome(self, self.worker, "All images have been converted to greyscale JPGs."):
+            self.close()  # Close this widget only, not the whole app
+
+    def closeEvent(self, event):
+        self.progress_panel.stop()
+        super().closeEvent(event)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,123 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def default_workers():
+    # Decoding and encoding release the GIL in cv2 and PIL, so a few more threads than cores pays off
+    return min(16, (os.cpu_count() or 1) + 4)
+
+
+class ImageIO:
+    """Shared read-ahead / write-behind layer for the batch stages.
+
+    A bounded thread pool decodes upcoming items while the current one is being
+    processed, and encodes/writes finished results in the background. Both sides
+    are bounded so that a slow disk cannot make memory use grow without limit.
+    The write-behind bound counts items, not writes: all the writes queued with
+    write_item for the same item share one slot.
+
+        with ImageIO() as io:
+            for item, future in io.read(paths, cv2.imread):
+                img = future.result()
+                io.write(cv2.imwrite, out_path, process(img))
+    """
+
+    def __init__(self, workers=None, read_ahead=None, write_behind=None):
+        self.workers = workers or default_workers()
+        self.read_ahead = read_ahead or self.workers
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        self.write_slots = threading.BoundedSemaphore(write_behind or self.workers * 2)
+        self.item_writes = {}  # item key -> writes still queued or running
+        self.pending = []
+        self.errors = []
+        self.lock = threading.Lock()
+
+    def read(self, items, loader):
+        """Yield (item, future) in input order, keeping up to read_ahead loads in flight.
+
+        Calling future.result() returns loader(item) or raises its exception, so a
+        failing item can be handled without ending the iteration.
+        """
+        items = iter(items)
+        in_flight = deque()
+
+        def submit_next():
+            for item in items:
+                in_flight.append((item, self.pool.submit(loader, item)))
+                return
+
+        for _ in range(self.read_ahead):
+            submit_next()
+
+        while in_flight:
+            item, future = in_flight.popleft()
+            submit_next()
+            yield item, future
+
+    def write(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) in the background; blocks while too many writes are queued."""
+        return self.write_item(object(), fn, *args, **kwargs)
+
+    def write_item(self, key, fn, *args, **kwargs):
+        """Like write, but writes with the same key (one per item) take up a single write-behind slot."""
+        with self.lock:
+            queued = self.item_writes.get(key, 0)
+            self.item_writes[key] = queued + 1
+        if queued == 0:
+            self.write_slots.acquire()
+        try:
+            future = self.pool.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._write_done(key)
+            raise
+        future.add_done_callback(lambda f: self._write_done(key, f))
+        with self.lock:
+            self.pending.append(future)
+        return future
+
+    def _write_done(self, key, future=None):
+        with self.lock:
+            self.item_writes[key] -= 1
+            last = self.item_writes[key] == 0
+            if last:
+                del self.item_writes[key]
+        if last:
+            self.write_slots.release()
+        if future is None or future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            with self.lock:
+                self.errors.append(error)
+
+    def flush(self):
+        """Wait for every queued write and re-raise the first write error, if any."""
+        with self.lock:
+            pending, self.pending = self.pending, []
+        for future in pending:
+            if not future.cancelled():
+                future.exception()
+        with self.lock:
+            errors, self.errors = self.errors, []
+        if errors:
+            raise errors[0]
+
+    def close(self, cancel=False):
+        if cancel:
+            with self.lock:
+                for future in self.pending:
+                    future.cancel()
+        self.pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            self.close(cancel=exc_type is not None)
+        return False
@@ -1,14 +1,122 @@
 import os
-import shutil
 import random
 from PyQt5.QtWidgets import (
     QWidget, QLabel, QPushButton, QVBoxLayout, QFileDialog,
-    QMessageBox, QHBoxLayout, QInputDialog, QApplication, QProgressBar
+    QMessageBox, QHBoxLayout, QInputDialog, QApplication, QComboBox
 )
 from PyQt5.QtCore import Qt
 from PIL import Image
 import sys
 
+from project_index import shared_index, check_init, unequal_counts, format_problems
+from worker import BatchWorker, ProgressPanel, report_outcome
+from dedupe import DedupeWorker, EXCLUDED_FILE, write_report, write_excluded, format_duplicates
+
+
+# What Init writes. The greyscale modes make 2_grey in the same pass, so the Greyscale Converter can be skipped
+INGEST_MODES = {
+    "colour": "Colour crops (convert to greyscale later)",
+    "both": "Colour and greyscale crops, one decode",
+    "grey": "Greyscale crops only, straight to 2_grey"
+}
+DEFAULT_INGEST = "colour"
+
+GREY_QUALITY = 95  # cv2.imwrite's default, as used by GreyscaleWorker
+
+
+def crop_image(img, size):
+    """Return a centered square crop of img resized to size x size."""
+    width, height = img.size
+    min_dim = min(width, height)
+    left = (width - min_dim) // 2
+    top = (height - min_dim) // 2
+    right = left + min_dim
+    bottom = top + min_dim
+    img_cropped = img.crop((left, top, right, bottom))
+    return img_cropped.resize((size, size), Image.LANCZOS)
+
+
+def load_cropped(src, size):
+    with Image.open(src) as img:
+        return crop_image(img, size)
+
+
+def load_grey_cropped(src, size):
+    """Greyscale square crop of src. JPEGs are decoded straight to luminance, skipping the colour planes."""
+    with Image.open(src) as img:
+        img.draft('L', img.size)
+        return crop_image(img.convert('L'), size)
+
+
+def grey_path(base, dest):
+    """Where the greyscale version of the source crop dest goes, named as GreyscaleWorker names it."""
+    return os.path.join(base, "2_grey", os.path.splitext(os.path.basename(dest))[0] + '.jpg')
+
+
+def save_grey(img, path):
+    img.save(path, format="JPEG", quality=GREY_QUALITY)
+
+
+class InitWorker(BatchWorker):
+    bytes_per_pixel = 8  # PIL keeps RGB as 4 bytes per pixel: the decoded source plus its crop
+    required_folders = [
+        "2_grey",
+        "3_mooney",
+        "4_super_pairings",
+        "5_cyan",
+        "6_magenta",
+        "7_superimposed",
+        "8_experiment"
+    ]
+
+    def __init__(self, jobs, size, base, ingest=DEFAULT_INGEST):
+        super().__init__()
+        self.jobs = jobs
+        self.size = size
+        self.base = base
+        self.ingest = ingest
+
+    def setup(self):
+        if self.ingest != "colour":
+            os.makedirs(os.path.join(self.base, "2_grey"), exist_ok=True)
+
+    def items(self):
+        return self.jobs
+
+    def item_name(self, job):
+        return os.path.basename(job[0])
+
+    def item_path(self, job):
+        return job[0]
+
+    def load(self, job):
+        # Sources are decoded and cropped ahead, and the crops are encoded and written behind
+        if self.ingest == "grey":
+            return load_grey_cropped(job[0], self.size)
+        return load_cropped(job[0], self.size)
+
+    def outputs(self, job):
+        paths = [] if self.ingest == "grey" else [job[1]]
+        if self.ingest != "colour":
+            paths.append(grey_path(self.base, job[1]))
+        return paths
+
+    def process(self, job, img):
+        if self.ingest != "grey":
+            self.write(job, img.save, job[1])
+        if self.ingest != "colour":
+            # From the crop in memory, not from the re-read colour file, so 2_grey is only encoded once
+            self.write(job, save_grey, img.convert('L'), grey_path(self.base, job[1]))
+
+    def teardown(self):
+        # Create required folders after processing images, but not for a run that was stopped
+        if self.cancelled or self.failure:
+            return
+        for folder in self.required_folders:
+            full_path = os.path.join(self.base, folder)
+            if not os.path.exists(full_path):
+                os.makedirs(full_path)
+
 
 class Init(QWidget):
     def __init__(self):
@@ -29,7 +137,10 @@ class Init(QWidget):
             "and one containing Natural images.\n"
             "The app will split each folder's images randomly into two groups (A and B), "
             "copying them into '1_source_images' with appropriate prefixes.\n"
-            "Images will be cropped to a square size (default 500x500).\n\n"
+            "Images will be cropped to a square size (default 500x500).\n"
+            "Near-duplicate images are detected first, so they can be left out before the split.\n"
+            "The greyscale ingest options also write '2_grey' in the same pass, "
+            "so the Greyscale Converter does not need to be run.\n\n"
             "Finally, you will select where to create the output folders."
         )
         self.info_label.setWordWrap(True)
@@ -52,16 +163,25 @@ class Init(QWidget):
         self.output_path_label = QLabel("No output folder selected")
         self.output_path_label.setStyleSheet("color: gray;")
 
+        # What to write: colour crops, or greyscale crops in the same pass as well or instead
+        self.ingest_combo = QComboBox()
+        for name, label in INGEST_MODES.items():
+            self.ingest_combo.addItem(label, name)
+        self.ingest_combo.setToolTip(
+            "Greyscale crops are converted from the crop in memory, so 2_grey is encoded once instead of twice. "
+            "'Greyscale only' also decodes JPEGs straight to luminance and leaves 1_source_images empty, "
+            "so there are no colour crops to convert again later. Watch Source Folders keeps such a project "
+            "greyscale-only, cropping new images straight to 2_grey."
+        )
+
         # Initialise button
         self.init_btn = QPushButton("Initialise Image Directories")
         self.init_btn.setEnabled(False)
         self.init_btn.clicked.connect(self.initialise_directories)
 
-        # Progress bar (hidden initially)
-        self.progress_bar = QProgressBar()
-        self.progress_bar.setVisible(False)
-        self.progress_bar.setMinimum(0)
-        self.progress_bar.setValue(0)
+        # Progress panel (hidden initially)
+        self.progress_panel = ProgressPanel()
+        self.progress_panel.setVisible(False)
 
         # Layout setup
         layout.addWidget(self.info_label)
@@ -81,8 +201,13 @@ class Init(QWidget):
         output_layout.addWidget(self.output_path_label)
         layout.addLayout(output_layout)
 
+        ingest_layout = QHBoxLayout()
+        ingest_layout.addWidget(QLabel("Ingest:"))
+        ingest_layout.addWidget(self.ingest_combo, 1)
+        layout.addLayout(ingest_layout)
+
         layout.addWidget(self.init_btn)
-        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.progress_panel)
 
         self.setLayout(layout)
         self.resize(600, 350)
@@ -114,17 +239,70 @@ class Init(QWidget):
     def crop_to_square(self, image_path, size):
         """Crop the image at image_path to a centered square of given size."""
         with Image.open(image_path) as img:
-            width, height = img.size
-            min_dim = min(width, height)
-            left = (width - min_dim) // 2
-            top = (height - min_dim) // 2
-            right = left + min_dim
-            bottom = top + min_dim
-            img_cropped = img.crop((left, top, right, bottom))
-            img_resized = img_cropped.resize((size, size), Image.LANCZOS)
-            img_resized.save(image_path)
+            crop_image(img, size).save(image_path)
 
     def initialise_directories(self):
+        # Validate both source folders from their headers before any copying starts
+        problems = check_init(self.manufactured_dir, self.natural_dir)
+        if problems:
+            QMessageBox.warning(self, "Pre-flight Check Failed", format_problems(problems))
+            return
+
+        # Near-duplicates have to be found before the A/B split, or copies end up in both groups
+        self.progress_panel.setVisible(True)
+        self.init_btn.setEnabled(False)
+        self.dedupe_worker = DedupeWorker([('man', self.manufactured_dir), ('nat', self.natural_dir)])
+        self.progress_panel.attach(self.dedupe_worker)
+        self.dedupe_worker.finished.connect(self.dedupe_finished)
+        self.dedupe_worker.start()
+
+    def dedupe_finished(self):
+        worker = self.dedupe_worker
+        self.progress_panel.setVisible(False)
+        self.check_ready()
+        if worker.failure or worker.cancelled or worker.errors:
+            report_outcome(self, worker, "")
+            return
+
+        excluded = set()
+        if worker.duplicates:
+            report_path = os.path.join(self.output_base_dir, "duplicates.csv")
+            write_report(report_path, worker.duplicates)
+
+            msg_box = QMessageBox(self)
+            msg_box.setWindowTitle("Near-Duplicates Found")
+            msg_box.setText(
+                f"{len(worker.duplicates)} group(s) of near-duplicate images were found "
+                f"({len(worker.excluded())} extra copies). Listed in {report_path}.\n\n"
+                + format_duplicates(worker.duplicates)
+                + "\n\nLeave out the extra copies (keeping the largest of each group)?"
+            )
+            skip_btn = msg_box.addButton("Leave Out Copies", QMessageBox.YesRole)
+            keep_btn = msg_box.addButton("Keep All", QMessageBox.NoRole)
+            msg_box.addButton(QMessageBox.Cancel)
+            msg_box.setDefaultButton(skip_btn)
+            msg_box.exec_()
+
+            if msg_box.clickedButton() == skip_btn:
+                excluded = worker.excluded()
+            elif msg_box.clickedButton() != keep_btn:
+                return
+
+            # Leaving copies out can unbalance the two folders, which the A/B split cannot handle
+            counts = {kind: sum((folder, f) not in excluded for f in shared_index.list_images(folder))
+                      for kind, folder in [('man', self.manufactured_dir), ('nat', self.natural_dir)]}
+            problem = unequal_counts(counts)
+            if problem:
+                QMessageBox.warning(
+                    self, "Pre-flight Check Failed",
+                    f"After leaving out the near-duplicate copies: {problem}\n\n"
+                    "Remove images so that both folders have the same number, or keep all copies."
+                )
+                return
+
+        self.start_initialisation(excluded)
+
+    def start_initialisation(self, excluded):
         size, ok = QInputDialog.getInt(
             self,
             "Crop Size",
@@ -138,105 +316,74 @@ class Init(QWidget):
             return
 
         base = self.output_base_dir
+        ingest = self.ingest_combo.currentData()
         source_dir = os.path.join(base, "1_source_images")
 
-        # Prepare output directory
-        if os.path.exists(source_dir):
+        # Prepare output directories; a new split makes any earlier greyscale crops stale too
+        folders = ["1_source_images"] if ingest == "colour" else ["1_source_images", "2_grey"]
+        existing = [folder for folder in folders if os.path.exists(os.path.join(base, folder))]
+        if existing:
             reply = QMessageBox.question(
                 self,
                 "Overwrite Confirmation",
-                ("The folder '1_source_images' already exists at the selected output location. "
-                 "Do you want to overwrite its contents?"),
+                (f"The folder(s) {', '.join(repr(folder) for folder in existing)} already exist at the selected "
+                 "output location. Do you want to overwrite their contents?"),
                 QMessageBox.Yes | QMessageBox.No,
                 QMessageBox.No
             )
             if reply != QMessageBox.Yes:
                 return
-            for filename in os.listdir(source_dir):
-                file_path = os.path.join(source_dir, filename)
-                if os.path.isfile(file_path):
-                    os.remove(file_path)
-        else:
-            os.makedirs(source_dir)
-
-        # Count total images to process for progress bar
-        total_files = 0
+            for folder in existing:
+                for filename in os.listdir(os.path.join(base, folder)):
+                    file_path = os.path.join(base, folder, filename)
+                    if os.path.isfile(file_path):
+                        os.remove(file_path)
+        os.makedirs(source_dir, exist_ok=True)
+
+        excluded_path = os.path.join(base, EXCLUDED_FILE)
+        if excluded:
+            write_excluded(excluded_path, excluded)
+        elif os.path.exists(excluded_path):
+            os.remove(excluded_path)
+
         folders_files = []
         for kind, folder in [('man', self.manufactured_dir), ('nat', self.natural_dir)]:
-            if not folder or not os.path.exists(folder):
-                QMessageBox.warning(
-                    self,
-                    "Error",
-                    f"The folder for {kind} images does not exist."
-                )
-                return
-
-            files = os.listdir(folder)
-            if len(files) == 0:
-                QMessageBox.warning(
-                    self,
-                    "Error",
-                    f"No files found in the {kind} folder."
-                )
-                return
-
-            total_files += len(files)
+            files = [f for f in shared_index.list_images(folder) if (folder, f) not in excluded]
             folders_files.append((kind, folder, files))
 
-        # Show and set progress bar max
-        self.progress_bar.setMaximum(total_files)
-        self.progress_bar.setValue(0)
-        self.progress_bar.setVisible(True)
-
-        processed = 0
+        jobs = []
         for kind, folder, files in folders_files:
             random.shuffle(files)
             midpoint = len(files) // 2
             group_a_files = files[:midpoint]
             group_b_files = files[midpoint:]
 
-            for file in group_a_files:
-                src = os.path.join(folder, file)
-                clean_file = file
-                if clean_file.startswith('a_') or clean_file.startswith('b_'):
-                    clean_file = clean_file[2:]
-                dest = os.path.join(source_dir, f"a_{kind}_{clean_file}")
-                shutil.copy2(src, dest)
-                self.crop_to_square(dest, size)
-                processed += 1
-                self.progress_bar.setValue(processed)
-                QApplication.processEvents()  # keep UI responsive
-
-            for file in group_b_files:
-                src = os.path.join(folder, file)
-                clean_file = file
-                if clean_file.startswith('a_') or clean_file.startswith('b_'):
-                    clean_file = clean_file[2:]
-                dest = os.path.join(source_dir, f"b_{kind}_{clean_file}")
-                shutil.copy2(src, dest)
-                self.crop_to_square(dest, size)
-                processed += 1
-                self.progress_bar.setValue(processed)
-                QApplication.processEvents()  # keep UI responsive
-
-        # Create required folders after processing images
-        required_folders = [
-            "2_grey",
-            "3_mooney",
-            "4_super_pairings",
-            "5_cyan",
-            "6_magenta",
-            "7_superimposed",
-            "8_experiment"
-        ]
-        for folder in required_folders:
-            full_path = os.path.join(base, folder)
-            if not os.path.exists(full_path):
-                os.makedirs(full_path)
+            for group, group_files in [('a', group_a_files), ('b', group_b_files)]:
+                for file in group_files:
+                    src = os.path.join(folder, file)
+                    clean_file = file
+                    if clean_file.startswith('a_') or clean_file.startswith('b_'):
+                        clean_file = clean_file[2:]
+                    dest = os.path.join(source_dir, f"{group}_{kind}_{clean_file}")
+                    jobs.append((src, dest))
+
+        self.progress_panel.setVisible(True)
+        self.init_btn.setEnabled(False)
+
+        self.worker = InitWorker(jobs, size, base, ingest)
+        self.progress_panel.attach(self.worker)
+        self.worker.finished.connect(self.initialisation_finished)
+        self.worker.start()
+
+    def initialisation_finished(self):
+        self.progress_panel.setVisible(False)
+        self.check_ready()
+        if report_outcome(self, self.worker, "Images copied, cropped, initialised, and folders created successfully."):
+            self.close()  # Only close this widget, app remains running
 
-        QMessageBox.information(self, "Done", "Images copied, cropped, initialised, and folders created successfully.")
-        self.progress_bar.setVisible(False)
-        self.close()  # Only close this widget, app remains running
+    def closeEvent(self, event):
+        self.progress_panel.stop()
+        super().closeEvent(event)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,187 @@
+import os
+import time
+import uuid
+import socket
+import getpass
+import tempfile
+
+
+# A claim not refreshed for this long belongs to a rater that has gone away
+CLAIM_STALE_AFTER = 300
+# Writes to the parameter file take milliseconds, so a lock this old was left behind by a crash
+LOCK_STALE_AFTER = 30
+
+
+def rater_id():
+    try:
+        user = getpass.getuser()
+    except (KeyError, OSError):
+        user = "rater"
+    return f"{user}@{socket.gethostname()}:{os.getpid()}"
+
+
+def create_exclusive(path, owner):
+    """Create path only if it does not exist yet (O_CREAT | O_EXCL). True if this call created it.
+
+    Exclusive creation is atomic on local disks and on NFS and SMB shares,
+    unlike flock/fcntl locks, so it works for raters on different machines.
+    """
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w") as f:
+        f.write(owner)
+    return True
+
+
+def read_owner(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def server_time(folder):
+    """The current time on the file server holding folder: the mtime of a file just created there.
+
+    Claim and lock ages are measured against this rather than the local clock,
+    so clock skew between raters' machines cannot make a live claim look stale.
+    Falls back to the local clock if the folder cannot be written to.
+    """
+    try:
+        fd, path = tempfile.mkstemp(dir=folder, prefix=".now-")
+    except OSError:
+        return time.time()
+    try:
+        os.close(fd)
+        return os.path.getmtime(path)
+    finally:
+        os.remove(path)
+
+
+def file_state(path):
+    st = os.stat(path)
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def remove_stale(path, stale_after):
+    """Remove path if it has not been touched for stale_after seconds. True if it is gone.
+
+    The stale file is first renamed to a unique name, which is atomic, so when
+    several raters see the same stale file only one of them gets to remove it.
+    If the file renamed turns out to be a fresh one that another rater created
+    in the meantime, it is put back.
+    """
+    try:
+        state = file_state(path)
+    except FileNotFoundError:
+        return True
+    if server_time(os.path.dirname(path) or ".") - state[1] / 1e9 <= stale_after:
+        return False
+
+    tombstone = f"{path}.{uuid.uuid4().hex}.stale"
+    try:
+        os.rename(path, tombstone)
+    except FileNotFoundError:
+        return False  # another rater took it over first
+    try:
+        if file_state(tombstone) != state:
+            create_exclusive(path, read_owner(tombstone) or "")
+            return False
+        return True
+    finally:
+        try:
+            os.remove(tombstone)
+        except OSError:
+            pass
+
+
+class FileLock:
+    """Short-lived exclusive lock around a read-modify-write of a shared file."""
+
+    def __init__(self, path, timeout=10, owner=None):
+        self.path = path
+        self.timeout = timeout
+        self.owner = owner or rater_id()
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        delay = 0.005
+        while not create_exclusive(self.path, self.owner):
+            if remove_stale(self.path, LOCK_STALE_AFTER):
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{self.path} is held by {read_owner(self.path) or 'another rater'}")
+            time.sleep(delay)
+            delay = min(delay * 2, 0.2)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class ClaimSet:
+    """Per-image claims in a folder shared by every rater of a project.
+
+    Claiming an image creates claims/<filename>.claim exclusively, so only one
+    rater can work on an image at a time. Claims are refreshed while held and
+    can be taken over once stale, so images held by a crashed rater go back
+    into the queue.
+    """
+
+    def __init__(self, folder, owner=None):
+        self.folder = folder
+        self.owner = owner or rater_id()
+        self.held = set()
+        os.makedirs(folder, exist_ok=True)
+
+    def path(self, filename):
+        return os.path.join(self.folder, filename + ".claim")
+
+    def claim(self, filename):
+        """True if this rater now holds filename (or already did)."""
+        if filename in self.held:
+            return True
+        path = self.path(filename)
+        if not create_exclusive(path, self.owner):
+            # Take over a stale claim; only one rater can remove it, and the exclusive create settles the rest
+            if not remove_stale(path, CLAIM_STALE_AFTER) or not create_exclusive(path, self.owner):
+                return False
+        self.held.add(filename)
+        return True
+
+    def release(self, filenames):
+        for filename in filenames:
+            if filename not in self.held:
+                continue
+            self.held.discard(filename)
+            path = self.path(filename)
+            # Only remove the claim if it is still ours (it may have been taken over while stale)
+            if read_owner(path) == self.owner:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def release_all(self):
+        self.release(list(self.held))
+
+    def refresh(self):
+        """Touch every held claim so that other raters do not treat it as stale."""
+        for filename in list(self.held):
+            try:
+                os.utime(self.path(filename))
+            except FileNotFoundError:
+                self.held.discard(filename)
+
+    def claimed_by_others(self):
+        try:
+            names = os.listdir(self.folder)
+        except OSError:
+            return set()
+        return {name[:-len(".claim")] for name in names if name.endswith(".claim")} - self.held
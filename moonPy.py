@@ -10,6 +10,12 @@ from pairs import Pairs
 from superimpose import Superimpose
 from readme_widget import README
 from rename import Rename  # ⬅️ New import
+from contact_sheet import ContactSheet
+from watch import WatchFolders
+from render_service import RenderServiceWidget
+from atlas import AtlasBuilder
+from stimulus_stats import StimulusStats
+from trials import TrialSequences
 
 
 class MainApp(QMainWindow):
@@ -79,6 +85,12 @@ class MainApp(QMainWindow):
         self.pairs_button = make_button("Create Man/Nat-A/B Pairings", self.open_pairs)
         self.supermooney_button = make_button("superMooney Processor", self.open_supermooney)
         self.rename_button = make_button("Build Experiment", self.open_rename)  # ⬅️ New button
+        self.contact_sheet_button = make_button("Contact Sheets (QA)", self.open_contact_sheet)
+        self.watch_button = make_button("Watch Source Folders", self.open_watch)
+        self.render_service_button = make_button("Render Service", self.open_render_service)
+        self.atlas_button = make_button("Pack Texture Atlases", self.open_atlas)
+        self.stats_button = make_button("Stimulus Statistics", self.open_stats)
+        self.trials_button = make_button("Trial Sequences", self.open_trials)
 
         for btn in [
             self.readme_button,
@@ -87,7 +99,13 @@ class MainApp(QMainWindow):
             self.mooney_button,
             self.pairs_button,
             self.supermooney_button,
-            self.rename_button  # ⬅️ Add to layout
+            self.rename_button,  # ⬅️ Add to layout
+            self.contact_sheet_button,
+            self.watch_button,
+            self.render_service_button,
+            self.atlas_button,
+            self.stats_button,
+            self.trials_button
         ]:
             main_layout.addWidget(btn)
 
@@ -157,6 +175,30 @@ class MainApp(QMainWindow):
         self.rename_window = Rename()
         self.rename_window.show()
 
+    def open_contact_sheet(self):
+        self.contact_sheet_window = ContactSheet()
+        self.contact_sheet_window.show()
+
+    def open_watch(self):
+        self.watch_window = WatchFolders()
+        self.watch_window.show()
+
+    def open_render_service(self):
+        self.render_service_window = RenderServiceWidget()
+        self.render_service_window.show()
+
+    def open_atlas(self):
+        self.atlas_window = AtlasBuilder()
+        self.atlas_window.show()
+
+    def open_stats(self):
+        self.stats_window = StimulusStats()
+        self.stats_window.show()
+
+    def open_trials(self):
+        self.trials_window = TrialSequences()
+        self.trials_window.show()
+
 
 if __name__ == "__main__":
     import sys
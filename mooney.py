@@ -1,17 +1,229 @@
 import os
 import cv2
 import sys
-import pandas as pd
+import numpy as np
 from PIL import Image
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton, QSlider, QVBoxLayout,
-    QHBoxLayout, QFileDialog, QMessageBox, QSizePolicy, QSpacerItem
+    QHBoxLayout, QGridLayout, QCheckBox, QSpinBox, QToolButton, QFileDialog, QMessageBox,
+    QSizePolicy, QSpacerItem
 )
-from PyQt5.QtCore import Qt, QSize
-from PyQt5.QtGui import QPixmap, QImage
+from PyQt5.QtCore import Qt, QSize, QTimer
+from PyQt5.QtGui import QPixmap, QImage, QIcon
+
+from project_index import list_images
+from param_store import ParamStore, read_params
+from locks import ClaimSet
+from worker import BatchWorker, ProgressPanel, report_outcome
+from save_queue import SaveQueue
+
+
+BLUR_ENGINES = ["exact", "fast"]
+# Box filters stacked by the fast blur; four come close to a Gaussian at every sigma
+BOX_PASSES = 4
+# Below this the exact kernel is small and cheap, and boxes approximate it poorly
+FAST_BLUR_MIN_SIGMA = 2.0
+# Grey levels of rounding allowed for in fast_blur_bound: half a level for the fast blur's final
+# rounding, the rest for OpenCV's fixed-point Gaussian weights, which add up to 2.15 levels
+# on the images that maximise the kernel difference (golden.py checks those for every sigma)
+BLUR_ROUNDING = 3
+
+
+def gaussian_ksize(sigma):
+    return int(2 * round(3 * sigma) + 1)
+
+
+def box_sizes(sigma, passes=BOX_PASSES):
+    """Odd box widths whose stacked variance comes closest to sigma ** 2 (W. Kovesi, "Fast almost-Gaussian filtering")."""
+    ideal = np.sqrt(12 * sigma * sigma / passes + 1)
+    lower = int(ideal)
+    lower -= lower % 2 == 0
+    upper = lower + 2
+    count = round((12 * sigma * sigma - passes * lower * lower - 4 * passes * lower - 3 * passes) / (-4 * lower - 4))
+    return [lower] * count + [upper] * (passes - count)
+
+
+def uses_boxes(sigma, engine):
+    return engine == "fast" and sigma >= FAST_BLUR_MIN_SIGMA
+
+
+def kernel_difference(sigma):
+    """2D kernel of the fast blur minus that of the exact blur, padded to the same size."""
+    box = np.ones(1)
+    for width in box_sizes(sigma):
+        box = np.convolve(box, np.ones(width) / width)
+    gauss = cv2.getGaussianKernel(gaussian_ksize(sigma), sigma)[:, 0]
+    size = max(len(box), len(gauss))
+    box = np.pad(box, (size - len(box)) // 2)
+    gauss = np.pad(gauss, (size - len(gauss)) // 2)
+    return np.outer(box, box) - np.outer(gauss, gauss)
+
+
+def fast_blur_bound(sigma):
+    """Largest possible difference, in grey levels, between the fast and the exact blur of any image.
+
+    Both blurs are weighted averages of the same pixels, so they differ by at
+    most 255 times half the L1 distance between their kernels. BLUR_ROUNDING
+    is added for the rounding on top of that.
+    """
+    if not uses_boxes(sigma, "fast"):
+        return 0
+    return int(255 * np.abs(kernel_difference(sigma)).sum() / 2 + BLUR_ROUNDING)
+
+
+# Over every sigma of the Mooney slider (0.5 steps up to 15)
+FAST_BLUR_MAX_DEVIATION = max(fast_blur_bound(step / 2) for step in range(31))
+
+
+def blur_radius(sigma, engine="exact"):
+    """How far blur_image reaches: the pixels around a tile needed to blur it exactly."""
+    if sigma <= 0:
+        return 0
+    if uses_boxes(sigma, engine):
+        return sum(width // 2 for width in box_sizes(sigma))
+    return gaussian_ksize(sigma) // 2
+
+
+def blur_image(img, sigma, engine="exact"):
+    """Gaussian blur. The fast engine stacks box filters, which keep running sums,
+    so it costs the same at every sigma; the exact kernel grows with sigma."""
+    if sigma > 0 and uses_boxes(sigma, engine):
+        # 16-bit fixed point with 8 fractional bits, so the passes do not each round to whole grey levels
+        blurred = img.astype(np.uint16) << 8
+        for width in box_sizes(sigma):
+            blurred = cv2.blur(blurred, (width, width))
+        return ((blurred + 128) >> 8).astype(np.uint8)
+    if sigma > 0:
+        ksize = gaussian_ksize(sigma)
+        return cv2.GaussianBlur(img, (ksize, ksize), sigma)
+    return img.copy()
+
+
+def local_mean(img_blur, block_size):
+    """Mean of every pixel's block_size x block_size neighbourhood, rounded to uint8.
+
+    A box filter keeps running sums, so the cost per pixel is the same for any block size.
+    """
+    return cv2.boxFilter(img_blur, -1, (block_size, block_size), borderType=cv2.BORDER_REPLICATE)
+
+
+def adaptive_stack(img_blur, mean, offsets):
+    """Adaptive threshold at every value in offsets at once: a (len(offsets), h, w) stack.
+
+    A pixel is white if it is brighter than its local mean minus the offset. Each
+    slice is identical to cv2.adaptiveThreshold(img_blur, 255, ADAPTIVE_THRESH_MEAN_C,
+    THRESH_BINARY, block_size, offset).
+    """
+    offsets = np.asarray(offsets, dtype=np.int16)
+    diff = img_blur.astype(np.int16) - mean
+    out = np.empty((len(offsets),) + img_blur.shape, dtype=np.uint8)
+    np.multiply(diff[None] > -offsets[:, None, None], 255, out=out, casting="unsafe")
+    return out
+
+
+def render_mooney(img, sigma, threshold, mode="global", block_size=0, offset=0, blur="exact"):
+    """Blur a greyscale image with the given sigma and threshold it to black and white.
+
+    In adaptive mode each pixel is compared with the mean of its block_size
+    neighbourhood minus offset, instead of with the global threshold. blur
+    selects the blur engine (see blur_image).
+    """
+    img_blur = blur_image(img, sigma, blur)
+
+    if mode == "adaptive":
+        return adaptive_stack(img_blur, local_mean(img_blur, block_size), [offset])[0]
+    _, img_thresh = cv2.threshold(img_blur, threshold, 255, cv2.THRESH_BINARY)
+    return img_thresh
+
+
+def describe_params(sigma, threshold, mode="global", block_size=0, offset=0, blur="exact"):
+    """Parameters as render_mooney takes them, in words for messages."""
+    if mode == "adaptive":
+        description = f"sigma {sigma:.1f} with an adaptive threshold (block size {block_size}, offset {offset})"
+    else:
+        description = f"sigma {sigma:.1f} and threshold {threshold}"
+    if uses_boxes(sigma, blur):
+        description += " (fast blur)"
+    return description
+
+
+def threshold_stack(img_blur, thresholds):
+    """Threshold one blurred image at every value in thresholds at once: a (len(thresholds), h, w) stack.
+
+    Each slice is identical to cv2.threshold(img_blur, t, 255, cv2.THRESH_BINARY).
+    """
+    thresholds = np.asarray(thresholds, dtype=np.int32)
+    out = np.empty((len(thresholds),) + img_blur.shape, dtype=np.uint8)
+    np.multiply(img_blur[None] > thresholds[:, None, None], 255, out=out, casting="unsafe")
+    return out
+
+
+def to_pixmap(img, size):
+    height, width = img.shape
+    q_img = QImage(img.data, width, height, width, QImage.Format_Grayscale8)
+    return QPixmap.fromImage(q_img).scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+
+class MooneyBatchWorker(BatchWorker):
+    """Renders greyscale images to Mooney images, one (filename, sigma, threshold, mode, block_size, offset) job each."""
+
+    bytes_per_pixel = 3  # image, blur and thresholded result
+
+    def __init__(self, jobs, grey_dir, mooney_dir):
+        super().__init__()
+        self.jobs = jobs
+        self.grey_dir = grey_dir
+        self.mooney_dir = mooney_dir
+        self.saved = []
+
+    def setup(self):
+        os.makedirs(self.mooney_dir, exist_ok=True)
+
+    def items(self):
+        return self.jobs
+
+    def item_name(self, job):
+        return job[0]
+
+    def outputs(self, job):
+        return [os.path.join(self.mooney_dir, job[0])]
+
+    def item_path(self, job):
+        return os.path.join(self.grey_dir, job[0])
+
+    def load(self, job):
+        # Decode, blur and threshold all run on the I/O pool, so images render in parallel
+        img = cv2.imread(os.path.join(self.grey_dir, job[0]), cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            raise ValueError("could not be read")
+        return render_mooney(img, *job[1:])
+
+    def process(self, job, img_thresh):
+        self.write(job, self.save, job, img_thresh)
+
+    def save(self, job, img_thresh):
+        Image.fromarray(img_thresh).save(os.path.join(self.mooney_dir, job[0]))
+        self.saved.append(job)
+
+
+# Keys of the parameters kept in MooneyApp's undo history, in job order
+HISTORY_PARAMS = ["sigma", "threshold", "mode", "block_size", "offset", "blur"]
+
+
+def replay_jobs(param_csv):
+    """(filename, sigma, threshold, mode, block_size, offset, blur) for every row of a parameter file, sorted by filename."""
+    params_df = read_params(param_csv)
+    return sorted(
+        (row.filename, float(row.sigma), int(row.threshold), row.mode, int(row.block_size), int(row.offset), row.blur)
+        for row in params_df.itertuples(index=False)
+    )
 
 
 class MooneyApp(QWidget):
+    compare_threshold_offsets = [-2, -1, 0, 1, 2]
+    compare_sigma_offsets = [-1, 0, 1]  # in slider steps of 0.5
+    compare_size = 120
+
     def __init__(self):
         super().__init__()
 
@@ -23,6 +235,16 @@ class MooneyApp(QWidget):
         self.finished = False
         self.history = []
         self.index = 0
+        self.sweep_window = None
+        self.zoom_window = None
+        self.preview_cache = {}
+        self.preview_render = None
+        self.claims = None
+
+        # Saves are written in the background, so the next image appears straight away
+        self.save_queue = SaveQueue()
+        self.save_queue.saved.connect(self.save_written)
+        self.save_queue.failed.connect(self.save_failed)
 
         self.init_ui()
         self.select_initial_folders()
@@ -60,6 +282,34 @@ class MooneyApp(QWidget):
         self.threshold_slider.valueChanged.connect(self.update_preview)
         self.threshold_label = QLabel("Threshold: 127")
 
+        # Adaptive mode compares each pixel with the mean of its neighbourhood, for unevenly lit photos
+        self.adaptive_check = QCheckBox("Adaptive threshold")
+        self.adaptive_check.toggled.connect(self.set_adaptive)
+
+        # Costs the same at every sigma, for large images at the top of the sigma range
+        self.fast_blur_check = QCheckBox("Fast blur")
+        self.fast_blur_check.setToolTip(
+            "Approximate the Gaussian blur with stacked box filters, which take the same time at every sigma. "
+            f"Used from sigma {FAST_BLUR_MIN_SIGMA:.1f}; never differs from the exact blur by more than "
+            f"{FAST_BLUR_MAX_DEVIATION} grey levels. "
+            "The choice is saved with each image and used by batch replay."
+        )
+        self.fast_blur_check.toggled.connect(self.update_preview)
+
+        self.block_slider = QSlider(Qt.Horizontal)
+        self.block_slider.setMinimum(1)
+        self.block_slider.setMaximum(127)
+        self.block_slider.setValue(25)
+        self.block_slider.valueChanged.connect(self.update_preview)
+        self.block_label = QLabel("Block size: 51")
+
+        self.offset_slider = QSlider(Qt.Horizontal)
+        self.offset_slider.setMinimum(-64)
+        self.offset_slider.setMaximum(64)
+        self.offset_slider.setValue(0)
+        self.offset_slider.valueChanged.connect(self.update_preview)
+        self.offset_label = QLabel("Offset: 0")
+
         self.save_button = QPushButton("\u2705 Save & Next")
         self.save_button.clicked.connect(self.save_and_next)
 
@@ -67,6 +317,60 @@ class MooneyApp(QWidget):
         self.undo_button.clicked.connect(self.undo)
         self.undo_button.setEnabled(False)
 
+        self.apply_all_button = QPushButton("\u23e9 Apply to Remaining")
+        self.apply_all_button.clicked.connect(self.apply_to_remaining)
+
+        self.sweep_button = QPushButton("\u25a6 Sweep Sheets")
+        self.sweep_button.clicked.connect(self.open_sweep)
+
+        self.compare_check = QCheckBox("Compare")
+        self.compare_check.toggled.connect(self.update_preview)
+        self.compare_sigma_check = QCheckBox("Vary sigma")
+        self.compare_sigma_check.toggled.connect(self.update_preview)
+        self.compare_step_spin = QSpinBox()
+        self.compare_step_spin.setRange(1, 64)
+        self.compare_step_spin.setValue(8)
+        self.compare_step_spin.valueChanged.connect(self.update_preview)
+
+        self.zoom_button = QPushButton("\U0001f50d Zoom")
+        self.zoom_button.clicked.connect(self.open_zoom)
+
+        self.rater_button = QPushButton("\U0001f465 Multi-Rater")
+        self.rater_button.setCheckable(True)
+        self.rater_button.setToolTip(
+            "Let several raters work on this parameter file at once. Each image is claimed by one rater "
+            "at a time. Once switched on, every MooneyApp that opens this parameter file joins in."
+        )
+        self.rater_button.clicked.connect(self.start_multi_rater)
+        self.rater_label = QLabel("")
+        self.rater_label.setStyleSheet("color: gray;")
+        self.rater_label.setVisible(False)
+
+        # Keeps this rater's claims fresh, so they are not taken over as stale
+        self.claim_timer = QTimer(self)
+        self.claim_timer.setInterval(60 * 1000)
+        self.claim_timer.timeout.connect(self.refresh_claims)
+
+        # Candidates around the slider values; clicking one moves the sliders to it
+        self.compare_buttons = []
+        self.compare_widget = QWidget()
+        compare_grid = QGridLayout()
+        compare_grid.setContentsMargins(0, 0, 0, 0)
+        for row in range(len(self.compare_sigma_offsets)):
+            for col in range(len(self.compare_threshold_offsets)):
+                btn = QToolButton()
+                btn.setIconSize(QSize(self.compare_size, self.compare_size))
+                btn.setToolButtonStyle(Qt.ToolButtonTextUnderIcon)
+                btn.setAutoRaise(True)
+                btn.clicked.connect(lambda _, btn=btn: self.choose_candidate(btn))
+                compare_grid.addWidget(btn, row, col)
+                self.compare_buttons.append(btn)
+        self.compare_widget.setLayout(compare_grid)
+        self.compare_widget.setVisible(False)
+
+        self.progress_panel = ProgressPanel()
+        self.progress_panel.setVisible(False)
+
         folder_layout = QHBoxLayout()
         input_layout = QVBoxLayout()
         input_layout.addWidget(self.input_btn)
@@ -82,10 +386,38 @@ class MooneyApp(QWidget):
         slider_layout.addWidget(self.sigma_slider)
         slider_layout.addWidget(self.threshold_label)
         slider_layout.addWidget(self.threshold_slider)
+        mode_layout = QHBoxLayout()
+        mode_layout.addWidget(self.adaptive_check)
+        mode_layout.addWidget(self.fast_blur_check)
+        mode_layout.addStretch()
+        slider_layout.addLayout(mode_layout)
+
+        self.adaptive_widget = QWidget()
+        adaptive_layout = QVBoxLayout()
+        adaptive_layout.setContentsMargins(0, 0, 0, 0)
+        adaptive_layout.addWidget(self.block_label)
+        adaptive_layout.addWidget(self.block_slider)
+        adaptive_layout.addWidget(self.offset_label)
+        adaptive_layout.addWidget(self.offset_slider)
+        self.adaptive_widget.setLayout(adaptive_layout)
+        self.adaptive_widget.setVisible(False)
+        slider_layout.addWidget(self.adaptive_widget)
+
+        compare_layout = QHBoxLayout()
+        compare_layout.addWidget(self.compare_check)
+        compare_layout.addWidget(self.compare_sigma_check)
+        compare_layout.addWidget(QLabel("Step:"))
+        compare_layout.addWidget(self.compare_step_spin)
+        compare_layout.addStretch()
+        compare_layout.addWidget(self.zoom_button)
+        slider_layout.addLayout(compare_layout)
 
         button_layout = QHBoxLayout()
         button_layout.addWidget(self.save_button)
         button_layout.addWidget(self.undo_button)
+        button_layout.addWidget(self.apply_all_button)
+        button_layout.addWidget(self.sweep_button)
+        button_layout.addWidget(self.rater_button)
 
         image_layout = QHBoxLayout()
         image_layout.addStretch()
@@ -96,9 +428,12 @@ class MooneyApp(QWidget):
         main_layout.addLayout(folder_layout)
         main_layout.addStretch()
         main_layout.addLayout(image_layout)
+        main_layout.addWidget(self.compare_widget)
         main_layout.addStretch()
         main_layout.addLayout(slider_layout)
         main_layout.addLayout(button_layout)
+        main_layout.addWidget(self.rater_label)
+        main_layout.addWidget(self.progress_panel)
 
         self.setLayout(main_layout)
         self.resize(850, 850)
@@ -142,10 +477,17 @@ class MooneyApp(QWidget):
         self.input_path_label.setText(self.grey_dir)
         self.output_path_label.setText(self.mooney_dir)
 
+    def claims_dir(self):
+        return os.path.splitext(self.param_csv)[0] + "_claims"
+
     def load_or_choose_start(self):
         os.makedirs(self.mooney_dir, exist_ok=True)
 
-        if os.path.exists(self.param_csv):
+        multi_rater = os.path.isdir(self.claims_dir())
+        if multi_rater:
+            # Other raters may be working on this file, so it is always resumed
+            resume = True
+        elif os.path.exists(self.param_csv):
             msg_box = QMessageBox(self)
             msg_box.setWindowTitle("Existing CSV Found")
             msg_box.setText("threshold_blur.csv already exists.\n\nWould you like to resume or start over?")
@@ -158,14 +500,12 @@ class MooneyApp(QWidget):
         else:
             resume = False
 
-        if resume:
-            self.params_df = pd.read_csv(self.param_csv)
-        else:
-            self.params_df = pd.DataFrame(columns=["filename", "sigma", "threshold"])
-            self.params_df.to_csv(self.param_csv, index=False)
+        self.store = ParamStore(self.param_csv, resume, shared=multi_rater)
+        if multi_rater:
+            self.enable_multi_rater()
 
-        all_files = sorted([f for f in os.listdir(self.grey_dir) if f.lower().endswith(".jpg")])
-        processed = set(self.params_df["filename"])
+        all_files = list_images(self.grey_dir, (".jpg",))
+        processed = self.store.processed()
         self.image_files = [f for f in all_files if f not in processed]
 
         if not self.image_files:
@@ -179,13 +519,11 @@ class MooneyApp(QWidget):
         self.load_image()
 
     def reload_images(self):
-        if os.path.exists(self.param_csv):
-            self.params_df = pd.read_csv(self.param_csv)
-        else:
-            self.params_df = pd.DataFrame(columns=["filename", "sigma", "threshold"])
+        self.save_queue.flush()
+        self.store = ParamStore(self.param_csv, shared=self.claims is not None)
 
-        all_files = sorted([f for f in os.listdir(self.grey_dir) if f.lower().endswith(".jpg")])
-        processed = set(self.params_df["filename"])
+        all_files = list_images(self.grey_dir, (".jpg",))
+        processed = self.store.processed()
         self.image_files = [f for f in all_files if f not in processed]
 
         if not self.image_files:
@@ -198,38 +536,194 @@ class MooneyApp(QWidget):
         self.history.clear()
         self.load_image()
 
+    def preview_blur(self, sigma):
+        """Blurred current image, cached per sigma so moving the threshold never re-blurs or re-reads."""
+        filename = self.image_files[self.index]
+        if self.preview_cache.get("filename") != filename:
+            img = cv2.imread(os.path.join(self.grey_dir, filename), cv2.IMREAD_GRAYSCALE)
+            if img is None:
+                return None
+            self.preview_cache = {"filename": filename, "img": img, "blurs": {}}
+
+        blurs = self.preview_cache["blurs"]
+        key = (sigma, self.blur_engine())
+        if key not in blurs:
+            if len(blurs) >= 8:
+                blurs.clear()
+            blurs[key] = blur_image(self.preview_cache["img"], *key)
+        return blurs[key]
+
+    def preview_mean(self, sigma, block_size):
+        """Local means of the blurred current image for adaptive mode, cached like the blurs."""
+        img_blur = self.preview_blur(sigma)
+        means = self.preview_cache.setdefault("means", {})
+        key = (sigma, self.blur_engine(), block_size)
+        if key not in means:
+            if len(means) >= 8:
+                means.clear()
+            means[key] = local_mean(img_blur, block_size)
+        return means[key]
+
+    def blur_engine(self):
+        return "fast" if self.fast_blur_check.isChecked() else "exact"
+
+    def render_params(self):
+        """(sigma, threshold, mode, block_size, offset, blur) from the controls, as recorded in the parameter file."""
+        sigma = self.sigma_slider.value() / 2
+        threshold = self.threshold_slider.value()
+        if self.adaptive_check.isChecked():
+            return (sigma, threshold, "adaptive", self.block_slider.value() * 2 + 1, self.offset_slider.value(),
+                    self.blur_engine())
+        return sigma, threshold, "global", 0, 0, self.blur_engine()
+
+    def set_adaptive(self, adaptive):
+        self.adaptive_widget.setVisible(adaptive)
+        self.threshold_slider.setEnabled(not adaptive)
+        self.threshold_label.setEnabled(not adaptive)
+        self.update_preview()
+
+    def set_render_params(self, entry):
+        """Move the sliders to the parameters of a history entry."""
+        self.sigma_slider.setValue(int(entry["sigma"] * 2))
+        self.threshold_slider.setValue(int(entry["threshold"]))
+        self.fast_blur_check.setChecked(entry.get("blur") == "fast")
+        adaptive = entry.get("mode") == "adaptive"
+        if adaptive:
+            self.block_slider.setValue((entry["block_size"] - 1) // 2)
+            self.offset_slider.setValue(entry["offset"])
+        self.adaptive_check.setChecked(adaptive)
+
     def update_preview(self):
         if self.finished or self.index >= len(self.image_files):
             return
 
-        sigma = self.sigma_slider.value() / 2
-        threshold = self.threshold_slider.value()
+        params = self.render_params()
+        sigma, threshold, mode, block_size, offset, blur = params
         self.sigma_label.setText(f"Sigma: {sigma:.1f}")
         self.threshold_label.setText(f"Threshold: {threshold}")
+        self.block_label.setText(f"Block size: {self.block_slider.value() * 2 + 1}")
+        self.offset_label.setText(f"Offset: {self.offset_slider.value()}")
 
-        image_path = os.path.join(self.grey_dir, self.image_files[self.index])
-        img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-        if img is None:
+        img_blur = self.preview_blur(sigma)
+        if img_blur is None:
             return
 
-        if sigma > 0:
-            ksize = int(2 * round(3 * sigma) + 1)
-            img_blur = cv2.GaussianBlur(img, (ksize, ksize), sigma)
+        if mode == "adaptive":
+            # Moving the offset only repeats the comparison; the local means are cached
+            img_thresh = adaptive_stack(img_blur, self.preview_mean(sigma, block_size), [offset])[0]
         else:
-            img_blur = img.copy()
-
-        _, img_thresh = cv2.threshold(img_blur, threshold, 255, cv2.THRESH_BINARY)
+            _, img_thresh = cv2.threshold(img_blur, threshold, 255, cv2.THRESH_BINARY)
+        self.image_label.setPixmap(to_pixmap(img_thresh, 500))
+        # Full resolution and identical to render_mooney, so Save & Next can write it as it is
+        self.preview_render = (self.image_files[self.index], params, img_thresh)
+
+        self.compare_widget.setVisible(self.compare_check.isChecked())
+        if self.compare_check.isChecked():
+            self.update_compare()
+
+        if self.zoom_window is not None and self.zoom_window.isVisible():
+            path = os.path.join(self.grey_dir, self.image_files[self.index])
+            self.zoom_window.show_render(path, self.preview_cache["img"], *params)
+
+    def update_compare(self):
+        # In adaptive mode the candidates vary the offset instead of the threshold
+        _, _, mode, block_size, _, _ = self.render_params()
+        slider = self.offset_slider if mode == "adaptive" else self.threshold_slider
+        step = self.compare_step_spin.value()
+        values = [min(slider.maximum(), max(slider.minimum(), slider.value() + k * step))
+                  for k in self.compare_threshold_offsets]
+        sigma_offsets = self.compare_sigma_offsets if self.compare_sigma_check.isChecked() else [0]
+
+        buttons = iter(self.compare_buttons)
+        for offset in sigma_offsets:
+            sigma_value = min(self.sigma_slider.maximum(), max(0, self.sigma_slider.value() + offset))
+            img_blur = self.preview_blur(sigma_value / 2)
+            # Every threshold for this sigma comes from one comparison against the shared blur
+            if mode == "adaptive":
+                candidates = adaptive_stack(img_blur, self.preview_mean(sigma_value / 2, block_size), values)
+                name = "offset"
+            else:
+                candidates = threshold_stack(img_blur, values)
+                name = "threshold"
+            for value, candidate in zip(values, candidates):
+                btn = next(buttons)
+                btn.setIcon(QIcon(to_pixmap(candidate, self.compare_size)))
+                btn.setToolTip(f"Sigma {sigma_value / 2:.1f}, {name} {value}")
+                btn.setText(f"{sigma_value / 2:.1f} / {value}")
+                btn.candidate = (sigma_value, slider, value)
+                btn.setVisible(True)
+        for btn in buttons:
+            btn.setVisible(False)
+
+    def choose_candidate(self, btn):
+        sigma_value, slider, value = btn.candidate
+        self.sigma_slider.setValue(sigma_value)
+        slider.setValue(value)
+
+    def enable_multi_rater(self):
+        self.claims = ClaimSet(self.claims_dir())
+        self.store.shared = True
+        self.rater_button.setChecked(True)
+        self.rater_button.setEnabled(False)
+        self.rater_label.setVisible(True)
+        self.claim_timer.start()
+
+    def start_multi_rater(self):
+        if self.claims is not None or not self.param_csv or self.finished:
+            self.rater_button.setChecked(self.claims is not None)
+            return
+        self.enable_multi_rater()
+        filename = self.image_files[self.index] if self.index < len(self.image_files) else None
+        self.claim_current()
+        if self.index >= len(self.image_files):
+            self.finish_processing()
+        elif self.image_files[self.index] != filename:
+            self.load_image()
 
-        height, width = img_thresh.shape
-        q_img = QImage(img_thresh.data, width, height, width, QImage.Format_Grayscale8)
+    def claim_current(self):
+        """In multi-rater mode, skip to the next image nobody else has saved or claimed, and claim it."""
+        if self.claims is None:
+            return
+        processed = self.store.processed()
+        while self.index < len(self.image_files):
+            filename = self.image_files[self.index]
+            if filename not in processed and self.claims.claim(filename):
+                # A rater who saved it a moment ago has already released it, so check the file again
+                self.store.refresh(force=True)
+                if filename not in self.store.df["filename"].values:
+                    break
+                self.claims.release([filename])
+            # Another rater has this image, so it leaves this rater's queue
+            del self.image_files[self.index]
 
-        pixmap = QPixmap.fromImage(q_img).scaled(
-            500, 500, Qt.KeepAspectRatio, Qt.SmoothTransformation
+        if self.index >= len(self.image_files):
+            # Before finishing, take back images that other raters let go of without saving
+            unavailable = self.store.processed() | self.claims.claimed_by_others() | set(self.image_files)
+            returned = [f for f in list_images(self.grey_dir, (".jpg",)) if f not in unavailable]
+            if returned:
+                self.image_files += returned
+                self.claim_current()
+                return
+        self.update_rater_label()
+
+    def release_current(self):
+        if self.claims is not None and self.index < len(self.image_files):
+            self.claims.release([self.image_files[self.index]])
+
+    def refresh_claims(self):
+        if self.claims is not None:
+            self.claims.refresh()
+            self.update_rater_label()
+
+    def update_rater_label(self):
+        others = self.claims.claimed_by_others()
+        left = len(self.image_files) - self.index
+        self.rater_label.setText(
+            f"Multi-rater: {left} images left in your queue, {len(others)} being annotated by other raters."
         )
 
-        self.image_label.setPixmap(pixmap)
-
     def load_image(self):
+        self.claim_current()
         if self.index >= len(self.image_files):
             self.finish_processing()
             return
@@ -242,31 +736,143 @@ class MooneyApp(QWidget):
         if self.finished or self.index >= len(self.image_files):
             return
 
-        sigma = self.sigma_slider.value() / 2
-        threshold = self.threshold_slider.value()
+        params = self.render_params()
         filename = self.image_files[self.index]
-        image_path = os.path.join(self.grey_dir, filename)
-        img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-        if img is None:
-            return
-
-        if sigma > 0:
-            ksize = int(2 * round(3 * sigma) + 1)
-            img_blur = cv2.GaussianBlur(img, (ksize, ksize), sigma)
+        if self.preview_render is not None and self.preview_render[:2] == (filename, params):
+            img_thresh = self.preview_render[2]
         else:
-            img_blur = img.copy()
+            img = cv2.imread(os.path.join(self.grey_dir, filename), cv2.IMREAD_GRAYSCALE)
+            if img is None:
+                return
+            img_thresh = render_mooney(img, *params)
 
-        _, img_thresh = cv2.threshold(img_blur, threshold, 255, cv2.THRESH_BINARY)
-        Image.fromarray(img_thresh).save(os.path.join(self.mooney_dir, filename))
+        self.save_queue.put(filename, os.path.join(self.mooney_dir, filename), img_thresh,
+                            (filename,) + params, self.store)
 
-        new_row = pd.DataFrame([{
+        self.history.append({
+            "index": self.index,
             "filename": filename,
-            "sigma": sigma,
-            "threshold": threshold
-        }])
-        self.params_df = pd.concat([self.params_df, new_row], ignore_index=True)
-        self.params_df.to_csv(self.param_csv, index=False)
+            **dict(zip(HISTORY_PARAMS, params))
+        })
+        self.undo_button.setEnabled(True)
 
+        self.index += 1
+        self.load_image()
+
+    def save_written(self, filename):
+        # In multi-rater mode the image stays claimed until its row is in the parameter file
+        if self.claims is not None:
+            self.claims.release([filename])
+
+    def save_failed(self, filename, message):
+        if (filename, message) not in self.save_queue.failures:
+            return  # already reported when the window closed
+        self.save_queue.failures.remove((filename, message))
+        self.history = [entry for entry in self.history if entry.get("filename") != filename]
+        self.undo_button.setEnabled(bool(self.history))
+        # Put the image back at the end of the queue, so it is not lost; if every other
+        # image is already done, that reopens the queue at this one
+        at_end = self.finished or self.index >= len(self.image_files)
+        self.image_files.append(filename)
+        QMessageBox.warning(self, "Save failed", f"{filename} could not be saved:\n{message}\n\n"
+                            "It has been put back at the end of the queue.")
+        if at_end:
+            self.finished = False
+            self.index = len(self.image_files) - 1
+            self.set_controls_enabled(True)
+            self.load_image()
+
+    def apply_to_remaining(self):
+        if self.finished or self.index >= len(self.image_files):
+            return
+
+        params = self.render_params()
+        remaining = self.image_files[self.index:]
+        description = describe_params(*params)
+
+        reply = QMessageBox.question(
+            self,
+            "Apply to Remaining",
+            f"Apply {description} to the {len(remaining)} remaining images?",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No
+        )
+        if reply != QMessageBox.Yes:
+            return
+
+        if self.claims is not None:
+            # Only images that this rater can claim are rendered; the others stay with their raters
+            processed = self.store.processed()
+            remaining = [f for f in remaining if f not in processed and self.claims.claim(f)]
+
+        self.set_controls_enabled(False)
+        self.progress_panel.setVisible(True)
+
+        jobs = [(filename,) + params for filename in remaining]
+        self.batch_worker = MooneyBatchWorker(jobs, self.grey_dir, self.mooney_dir)
+        self.progress_panel.attach(self.batch_worker)
+        self.batch_worker.finished.connect(self.apply_finished)
+        self.batch_worker.start()
+
+    def apply_finished(self):
+        worker = self.batch_worker
+        self.progress_panel.setVisible(False)
+        self.set_controls_enabled(True)
+
+        saved = set(job[0] for job in worker.saved)
+        jobs = [job for job in worker.jobs if job[0] in saved]
+        filenames = [job[0] for job in jobs]
+        if jobs:
+            # Every row of the batch is recorded with a single write of the parameter file
+            self.store.add(jobs)
+
+            self.history.append({
+                "index": self.index,
+                "filenames": filenames,
+                **dict(zip(HISTORY_PARAMS, jobs[0][1:]))
+            })
+            self.undo_button.setEnabled(True)
+
+        if self.claims is not None:
+            self.claims.release([job[0] for job in worker.jobs])
+
+        report_outcome(self, worker, f"Applied parameters to {len(filenames)} images.")
+
+        # Move the rendered images to the current position and step past them, as sweep_committed does,
+        # so navigation never lands on one again and Undo takes the batch back from here
+        remaining = self.image_files[self.index:]
+        self.image_files[self.index:] = filenames + [f for f in remaining if f not in saved]
+        self.index += len(filenames)
+        self.load_image()
+
+    def open_zoom(self):
+        from zoom_view import ZoomView  # zoom_view.py builds on blur_image from this module
+
+        if self.zoom_window is None:
+            self.zoom_window = ZoomView()
+        self.zoom_window.show()
+        self.zoom_window.raise_()
+        self.update_preview()
+
+    def open_sweep(self):
+        from sweep import SweepReview  # sweep.py builds on render_mooney from this module
+
+        if self.finished or self.index >= len(self.image_files):
+            return
+        sheet_dir = os.path.join(os.path.dirname(self.param_csv), "sweep_sheets")
+        self.sweep_window = SweepReview(self.grey_dir, self.mooney_dir, sheet_dir, self.store,
+                                        self.image_files[self.index:], self.claims)
+        self.sweep_window.committed.connect(self.sweep_committed)
+        self.sweep_window.show()
+
+    def sweep_committed(self, filename, sigma, threshold):
+        if self.finished or filename not in self.image_files[self.index:]:
+            return
+
+        # Treat it as if it had been saved here: move it to the current position and step past it,
+        # so Undo takes it back like any other save
+        self.image_files.remove(filename)
+        self.image_files.insert(self.index, filename)
         self.history.append({
             "index": self.index,
             "filename": filename,
@@ -276,7 +882,18 @@ class MooneyApp(QWidget):
         self.undo_button.setEnabled(True)
 
         self.index += 1
-        self.load_image()
+        self.claim_current()
+        if self.index >= len(self.image_files):
+            self.finish_processing()
+        else:
+            self.update_preview()
+
+    def set_controls_enabled(self, enabled):
+        for control in [self.sigma_slider, self.adaptive_check, self.fast_blur_check, self.block_slider, self.offset_slider,
+                        self.save_button, self.apply_all_button, self.sweep_button, self.input_btn, self.output_btn]:
+            control.setEnabled(enabled)
+        self.threshold_slider.setEnabled(enabled and not self.adaptive_check.isChecked())
+        self.undo_button.setEnabled(enabled and bool(self.history))
 
     def undo(self):
         if not self.history:
@@ -285,18 +902,22 @@ class MooneyApp(QWidget):
             return
 
         last_entry = self.history.pop()
+        self.release_current()
         self.index = last_entry["index"]
-        filename = last_entry["filename"]
+        # A batch from "Apply to Remaining" is undone as a whole
+        filenames = last_entry["filenames"] if "filenames" in last_entry else [last_entry["filename"]]
 
-        self.params_df = self.params_df[self.params_df["filename"] != filename]
-        self.params_df.to_csv(self.param_csv, index=False)
+        # A save still waiting in the queue is just dropped; written ones are removed from disk
+        filenames = [filename for filename in filenames if not self.save_queue.cancel(filename)]
+        if filenames:
+            self.store.remove(filenames)
 
-        mooney_path = os.path.join(self.mooney_dir, filename)
-        if os.path.exists(mooney_path):
-            os.remove(mooney_path)
+        for filename in filenames:
+            mooney_path = os.path.join(self.mooney_dir, filename)
+            if os.path.exists(mooney_path):
+                os.remove(mooney_path)
 
-        self.sigma_slider.setValue(int(last_entry["sigma"] * 2))
-        self.threshold_slider.setValue(int(last_entry["threshold"]))
+        self.set_render_params(last_entry)
 
         self.load_image()
 
@@ -306,14 +927,44 @@ class MooneyApp(QWidget):
     def finish_processing(self):
         if self.finished:
             return
+        # Wait for the last saves, so that one that fails goes back into the queue instead of being lost
+        self.save_queue.flush()
+        for failure in list(self.save_queue.failures):
+            self.save_failed(*failure)
+        if self.index < len(self.image_files):
+            return
+
         self.finished = True
         self.sigma_slider.setEnabled(False)
         self.threshold_slider.setEnabled(False)
+        self.adaptive_check.setEnabled(False)
+        self.fast_blur_check.setEnabled(False)
+        self.block_slider.setEnabled(False)
+        self.offset_slider.setEnabled(False)
         self.save_button.setEnabled(False)
         self.undo_button.setEnabled(False)
+        self.apply_all_button.setEnabled(False)
+        self.sweep_button.setEnabled(False)
 
         QMessageBox.information(self, "Done", "\u2705 All images processed.")
-        self.close()
+        if self.finished:  # a save that failed while the message was open reopens the queue
+            self.close()
+
+    def closeEvent(self, event):
+        self.progress_panel.stop()
+        self.save_queue.stop()
+        if self.save_queue.failures:
+            QMessageBox.warning(self, "Save failed", "These images could not be saved:\n" + "\n".join(
+                f"{filename}: {message}" for filename, message in self.save_queue.failures))
+            self.save_queue.failures.clear()
+        self.claim_timer.stop()
+        if self.claims is not None:
+            self.claims.release_all()
+        if self.sweep_window is not None:
+            self.sweep_window.close()
+        if self.zoom_window is not None:
+            self.zoom_window.close()
+        super().closeEvent(event)
 
 
 if __name__ == "__main__":
@@ -8,6 +8,8 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtCore import Qt
 import sys
 
+from project_index import list_images
+
 
 class Pairs(QWidget):
     def __init__(self):
@@ -108,7 +110,7 @@ class Pairs(QWidget):
             return
 
         # List jpg files in folder
-        file_list = [f for f in os.listdir(self.folder_path) if f.lower().endswith(".jpg")]
+        file_list = list_images(self.folder_path, (".jpg",))
 
         # Separate into groups by prefix
         self.a_man_files = [f for f in file_list if f.startswith("a_man_")]
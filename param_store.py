@@ -0,0 +1,131 @@
+import os
+import threading
+import pandas as pd
+
+from locks import FileLock
+
+
+COLUMNS = ["filename", "sigma", "threshold", "mode", "block_size", "offset", "blur"]
+
+# Values for the adaptive-threshold and blur-engine columns in rows saved in global mode, or before the columns existed
+DEFAULTS = {"mode": "global", "block_size": 0, "offset": 0, "blur": "exact"}
+
+
+def read_params(path):
+    """A parameter file as a table with every column, filling in defaults for older files."""
+    df = pd.read_csv(path)
+    for column, value in DEFAULTS.items():
+        df[column] = df[column].fillna(value) if column in df else value
+    return df[COLUMNS].astype({"block_size": int, "offset": int})
+
+
+def make_rows(rows):
+    """Rows of (filename, sigma, threshold), optionally followed by mode, block_size, offset and blur."""
+    df = pd.DataFrame([tuple(row) for row in rows])
+    df.columns = COLUMNS[:len(df.columns)]
+    for column, value in DEFAULTS.items():
+        if column not in df:
+            df[column] = value
+    return df[COLUMNS]
+
+
+class ParamStore:
+    """The chosen Mooney parameters for each image (threshold_blur.csv).
+
+    The table is kept in memory and the file is rewritten after every change,
+    so all windows working on the same images should share one store.
+
+    With shared=True several raters (MooneyApp instances, possibly on other
+    machines) write to the same file. Every change then re-reads the file
+    under a lock, applies only this rater's rows and writes it back, so
+    nobody overwrites anybody else's work.
+
+    Methods may be called from MooneyApp's background save queue as well as
+    from the GUI thread.
+    """
+
+    def __init__(self, path, resume=True, shared=False):
+        self.path = path
+        self.shared = shared
+        self.stamp = None
+        self.lock = threading.RLock()
+        if resume and os.path.exists(path):
+            self.df = self.read()
+        else:
+            self.df = pd.DataFrame(columns=COLUMNS)
+            if not resume:
+                self.save()
+
+    def read(self):
+        stat = os.stat(self.path)
+        df = read_params(self.path)
+        self.stamp = (stat.st_mtime_ns, stat.st_size)
+        return df
+
+    def refresh(self, force=False):
+        """Pick up rows saved by other raters since the file was last read.
+
+        Some shared drives only keep modification times to the second, so
+        force re-reads the file even when it looks unchanged.
+        """
+        if not self.shared:
+            return
+        with self.lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return
+            if force or (stat.st_mtime_ns, stat.st_size) != self.stamp:
+                self.df = self.read()
+
+    def save(self):
+        # Write to a temporary file and swap it in, so nobody ever reads a half-written table
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        self.df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, self.path)
+        stat = os.stat(self.path)
+        self.stamp = (stat.st_mtime_ns, stat.st_size)
+
+    def update(self, change):
+        with self.lock:
+            if not self.shared:
+                self.df = change(self.df)
+                self.save()
+                return
+            with FileLock(self.path + ".lock"):
+                if os.path.exists(self.path):
+                    self.df = self.read()
+                self.df = change(self.df)
+                self.save()
+
+    def processed(self):
+        with self.lock:
+            self.refresh()
+            return set(self.df["filename"])
+
+    def get(self, filename):
+        with self.lock:
+            self.refresh()
+            df = self.df
+        rows = df[df["filename"] == filename]
+        if rows.empty:
+            return None
+        row = rows.iloc[-1]
+        return (float(row["sigma"]), int(row["threshold"]), row["mode"], int(row["block_size"]), int(row["offset"]),
+                row["blur"])
+
+    def add(self, rows):
+        """Record parameter rows (see make_rows), replacing any earlier row for the same file."""
+        rows = list(rows)
+        if not rows:
+            return
+        new_rows = make_rows(rows)
+
+        def change(df):
+            kept = df[~df["filename"].isin(new_rows["filename"])]
+            return pd.concat([kept, new_rows], ignore_index=True)
+
+        self.update(change)
+
+    def remove(self, filenames):
+        self.update(lambda df: df[~df["filename"].isin(filenames)])
@@ -0,0 +1,174 @@
+import os
+import csv
+import threading
+from collections import namedtuple
+from PIL import Image
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif', '.webp')
+
+STAGE_FOLDERS = [
+    "1_source_images",
+    "2_grey",
+    "3_mooney",
+    "5_cyan",
+    "6_magenta",
+    os.path.join("7_superimposed", "CB1"),
+    os.path.join("7_superimposed", "CB2"),
+    "8_experiment"
+]
+
+# width/height/mode stay None until the header has been read (or if it could not be read)
+ImageInfo = namedtuple("ImageInfo", ["name", "path", "width", "height", "mode", "mtime", "bytes"])
+
+
+def read_header(path):
+    """Return (width, height, mode) without decoding any pixel data, or (None, None, None)."""
+    try:
+        with Image.open(path) as img:
+            return img.size[0], img.size[1], img.mode
+    except (OSError, SyntaxError, ValueError):
+        return None, None, None
+
+
+class ProjectIndex:
+    """Header-only index of the image files in a set of folders.
+
+    Each folder is listed with a single os.scandir pass. Image headers are only
+    read once per file and are reused for as long as the file's mtime and size
+    stay the same, so re-scanning a folder is cheap.
+    """
+
+    def __init__(self, base_dir=None):
+        self.base_dir = base_dir
+        self.folders = {}
+        self.lock = threading.Lock()
+
+    def scan(self, folder, headers=True):
+        """Return {filename: ImageInfo} for every image file in folder."""
+        folder = os.path.abspath(folder)
+        with self.lock:
+            previous = self.folders.get(folder, {})
+
+        entries = {}
+        if os.path.isdir(folder):
+            with os.scandir(folder) as it:
+                for entry in it:
+                    if not entry.name.lower().endswith(IMAGE_EXTENSIONS) or not entry.is_file():
+                        continue
+                    st = entry.stat()
+                    old = previous.get(entry.name)
+                    if old is not None and old.mtime == st.st_mtime and old.bytes == st.st_size:
+                        info = old
+                    else:
+                        info = ImageInfo(entry.name, entry.path, None, None, None, st.st_mtime, st.st_size)
+                    if headers and info.mode is None:
+                        width, height, mode = read_header(entry.path)
+                        info = info._replace(width=width, height=height, mode=mode)
+                    entries[entry.name] = info
+
+        with self.lock:
+            self.folders[folder] = entries
+        return entries
+
+    def list_images(self, folder, extensions=IMAGE_EXTENSIONS):
+        """Sorted filenames in folder matching extensions (no headers are read)."""
+        entries = self.scan(folder, headers=False)
+        return sorted(name for name in entries if name.lower().endswith(extensions))
+
+    def stage(self, name, headers=True):
+        if not self.base_dir:
+            raise ValueError("No project folder set for this index.")
+        return self.scan(os.path.join(self.base_dir, name), headers=headers)
+
+    def scan_project(self):
+        """Scan every stage folder that exists in the project."""
+        return {name: self.stage(name) for name in STAGE_FOLDERS
+                if os.path.isdir(os.path.join(self.base_dir, name))}
+
+
+# Shared by all stages in this process so that repeated listings reuse cached headers
+shared_index = ProjectIndex()
+
+
+def list_images(folder, extensions=IMAGE_EXTENSIONS):
+    return shared_index.list_images(folder, extensions)
+
+
+def check_init(manufactured_dir, natural_dir, index=shared_index):
+    """Pre-flight checks for Init. Returns a list of problems (empty if the run can go ahead)."""
+    problems = []
+    counts = {}
+    for kind, folder in [('man', manufactured_dir), ('nat', natural_dir)]:
+        if not folder or not os.path.isdir(folder):
+            problems.append(f"The folder for {kind} images does not exist.")
+            continue
+
+        entries = index.scan(folder)
+        if not entries:
+            problems.append(f"No image files found in the {kind} folder.")
+        counts[kind] = len(entries)
+
+        seen = {}
+        for name, info in sorted(entries.items()):
+            if info.mode is None:
+                problems.append(f"{kind}: {name} is not a readable image.")
+            # Init strips a_/b_ prefixes, so two files can end up with the same name
+            clean = name[2:] if name.startswith(('a_', 'b_')) else name
+            if clean in seen:
+                problems.append(f"{kind}: {name} and {seen[clean]} would both be saved as '{clean}'.")
+            seen[clean] = name
+
+    if len(counts) == 2 and counts['man'] != counts['nat']:
+        problems.append(unequal_counts(counts))
+    return problems
+
+
+def unequal_counts(counts):
+    """The problem to report when the {'man': n, 'nat': n} image counts differ, or None."""
+    if counts['man'] == counts['nat']:
+        return None
+    return f"Unequal number of images: {counts['man']} manufactured vs {counts['nat']} natural."
+
+
+def check_pairings(input_folder, pairings_file, index=shared_index):
+    """Pre-flight checks for Superimpose. Returns (pairings, problems)."""
+    problems = []
+    pairings = []
+
+    if not os.path.isfile(pairings_file):
+        return pairings, [f"Pairings file not found: {pairings_file}"]
+
+    with open(pairings_file, 'r', newline='') as f:
+        reader = csv.DictReader(f)
+        if not reader.fieldnames or not {"man", "nat"} <= set(reader.fieldnames):
+            return pairings, ["Pairings CSV must have 'man' and 'nat' columns."]
+        pairings = [(row["man"], row["nat"]) for row in reader]
+
+    if not pairings:
+        problems.append("Pairings CSV contains no pairs.")
+
+    entries = index.scan(input_folder)
+    for idx, (man, nat) in enumerate(pairings, start=1):
+        infos = []
+        for name in (man, nat):
+            info = entries.get(name)
+            if info is None:
+                problems.append(f"Pair {idx}: {name} is missing from {input_folder}.")
+            elif info.mode is None:
+                problems.append(f"Pair {idx}: {name} is not a readable image.")
+            else:
+                infos.append(info)
+        if len(infos) == 2 and (infos[0].width, infos[0].height) != (infos[1].width, infos[1].height):
+            problems.append(
+                f"Pair {idx}: size mismatch, {man} is {infos[0].width}x{infos[0].height} "
+                f"but {nat} is {infos[1].width}x{infos[1].height}."
+            )
+    return pairings, problems
+
+
+def format_problems(problems, limit=15):
+    text = "\n".join(problems[:limit])
+    if len(problems) > limit:
+        text += f"\n... and {len(problems) - limit} more."
+    return text
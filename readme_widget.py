@@ -26,7 +26,10 @@ class README(QWidget):
             <li>One containing square images of <strong>manufactured</strong> items</li>
         </ul>
     </li>
-    <li>Ensure both folders contain an <em>equal number</em> of images.</li>
+    <li>Ensure both folders contain an <em>equal number</em> of images.
+        The <strong>Ingest</strong> option can also write the greyscale crops to <em>2_grey</em> in the same pass
+        (or only those, decoding JPEGs straight to greyscale), so the Greyscale Converter step can be skipped.
+        A greyscale-only project has no colour crops; Watch Source Folders keeps it greyscale-only.</li>
     <li>The app will then:
         <ol type="a">
             <li>Crop the images to the same size (if needed)</li>
@@ -52,6 +55,24 @@ class README(QWidget):
     </ul>
 </p>
 
+<h3>Additional Tools</h3>
+<ul>
+    <li><strong>Build Experiment</strong> can also write every stimulus into a single <em>stimuli.bundle</em> file with a <em>stimuli.json</em> index, so experiment software can load any stimulus with a single seek or memory-map the whole set.</li>
+    <li><strong>Compare</strong> (in the Mooney Processor) shows candidates at several thresholds, and optionally sigmas, around the slider values; clicking one moves the sliders to it.</li>
+    <li><strong>Adaptive threshold</strong> (in the Mooney Processor) compares each pixel with the mean of its neighbourhood (<em>Block size</em>, shifted by <em>Offset</em>) instead of one threshold for the whole image, for unevenly lit photos. The settings are saved in <em>threshold_blur.csv</em> and used by batch replay.</li>
+    <li><strong>Fast blur</strong> (in the Mooney Processor) approximates the blur with stacked box filters, which take the same time at every sigma (sigma 2 and up). It never differs from the exact blur by more than 16 grey levels, but a few pixels near the threshold can flip, so keep the exact blur for published stimuli. The choice is saved per image and used by batch replay.</li>
+    <li><strong>Zoom</strong> (in the Mooney Processor) opens a full-resolution view of the current render that follows the sliders; scroll to zoom and drag to pan.</li>
+    <li><strong>Sweep Sheets</strong> (in the Mooney Processor) renders a sigma × threshold grid of candidates for every remaining image; clicking a tile saves that Mooney image and its parameters, just like <em>Save &amp; Next</em>.</li>
+    <li><strong>Multi-Rater</strong> (in the Mooney Processor) lets several people annotate one project at once. Each image is claimed by one rater at a time, and saves are merged into <em>threshold_blur.csv</em> under a lock, so nobody's parameters are overwritten.</li>
+    <li><strong>Colour presets</strong> (in Superimpose) choose the layer colours (cyan/magenta, red/cyan, or graded cyan/magenta). Layers are mapped through lookup tables and blended exactly like Pillow's alpha compositing, so the cyan/magenta preset reproduces the standard superMooneys pixel for pixel.</li>
+    <li><strong>Output encodings</strong> (in Superimpose) choose PNG compression, indexed-colour PNG or lossless WebP for the cyan/magenta layers and the superimposed images; all are lossless. Untick <em>Write cyan/magenta layers</em> to write only the superimposed images.</li>
+    <li><strong>Pack Texture Atlases</strong> packs the built stimuli into a few large sheets per phase, plus an <em>atlas.json</em> map giving each stimulus's sheet, pixel rectangle and UV coordinates.</li>
+    <li><strong>Stimulus Statistics</strong> measures every Mooney and superMooney image (black fraction, edge density, connected components, cyan/magenta overlap) and writes one <em>stimulus_stats.csv</em> table for matching stimuli across conditions.</li>
+    <li><strong>Trial Sequences</strong> writes a randomised trial order for every participant from the stimuli in <em>8_experiment</em>, with counterbalance and pre-exposure assignment, greyscale pre-exposure before the Mooney phase, and optional limits on repeats and same-category runs.</li>
+    <li><strong>Contact Sheets (QA)</strong> tiles every image in a stage folder (e.g. <em>3_mooney</em>, <em>5_cyan</em>, <em>7_superimposed/CB1</em>) into labelled sheets, so a whole stimulus set can be checked at a glance.</li>
+    <li><strong>Watch Source Folders</strong> keeps running while images are added to the natural/manufactured folders, and pushes only new or changed images through cropping and greyscale conversion (and Mooney rendering, for images that already have parameters).</li>
+    <li><strong>Render Service</strong> serves Mooney and superMooney renders for any image/sigma/threshold/alpha combination over local HTTP, using the same rendering as the Mooney and superMooney processors.</li>
+</ul>
 
         <h3>Purpose</h3>
         <p>
@@ -2,10 +2,95 @@ import os
 import shutil
 from PyQt5.QtWidgets import (
     QWidget, QLabel, QPushButton, QVBoxLayout, QFileDialog,
-    QMessageBox, QProgressBar, QApplication
+    QMessageBox, QApplication, QComboBox
 )
 from PyQt5.QtCore import Qt
 
+from project_index import list_images
+from worker import BatchWorker, ProgressPanel, report_outcome
+from bundle import BundleWriter
+
+
+def experiment_files(greyscale_path, mooney_path, superimposed_path):
+    """List (new_name, src_path) for every stimulus that goes into the experiment folder."""
+    all_files = []
+
+    # Greyscale
+    for f in list_images(greyscale_path, (".jpg",)):
+        all_files.append(("1_greyscale_" + f, os.path.join(greyscale_path, f)))
+
+    # Mooney
+    for f in list_images(mooney_path, (".jpg",)):
+        all_files.append(("2_mooney_" + f, os.path.join(mooney_path, f)))
+
+    # Superimposed: CB1 and CB2
+    for cb in ["CB1", "CB2"]:
+        cb_folder = os.path.join(superimposed_path, cb)
+        if os.path.isdir(cb_folder):
+            for f in list_images(cb_folder, (".png", ".webp")):
+                prefix = f.split("_")[0]
+                new_name = f"3_super_{cb}_{prefix}{os.path.splitext(f)[1]}"
+                all_files.append((new_name, os.path.join(cb_folder, f)))
+
+    return all_files
+
+
+class RenameWorker(BatchWorker):
+    bundle_name = "stimuli.bundle"
+    bytes_per_pixel = 1  # only encoded file contents are held, never decoded pixels
+
+    def __init__(self, greyscale_path, mooney_path, superimposed_path, output_path,
+                 write_files=True, write_bundle=False):
+        super().__init__()
+        self.greyscale_path = greyscale_path
+        self.mooney_path = mooney_path
+        self.superimposed_path = superimposed_path
+        self.output_path = output_path
+        self.write_files = write_files
+        self.write_bundle = write_bundle
+        self.bundle = None
+
+    def setup(self):
+        if self.write_bundle:
+            self.bundle = BundleWriter(os.path.join(self.output_path, self.bundle_name))
+
+    def teardown(self):
+        if self.cancelled:
+            self.abort()
+        elif self.bundle is not None:
+            self.bundle.close()
+            self.bundle = None
+
+    def abort(self):
+        # Never leave a half-written <bundle>.partial behind
+        if self.bundle is not None:
+            self.bundle.abort()
+            self.bundle = None
+
+    def items(self):
+        return experiment_files(self.greyscale_path, self.mooney_path, self.superimposed_path)
+
+    def item_name(self, item):
+        return item[0]
+
+    def item_path(self, item):
+        return item[1]
+
+    def load(self, item):
+        # The bundle is written sequentially, so its file contents are read ahead on the I/O pool
+        if self.write_bundle:
+            with open(item[1], "rb") as f:
+                return f.read()
+        return None
+
+    def process(self, item, data):
+        new_name, src_path = item
+        if self.write_files:
+            dest_path = os.path.join(self.output_path, new_name)
+            self.write(item, shutil.copyfile, src_path, dest_path)
+        if self.bundle is not None:
+            self.bundle.add(new_name, data)
+
 
 class Rename(QWidget):
     def __init__(self, parent=None):
@@ -52,9 +137,19 @@ class Rename(QWidget):
         layout.addWidget(self.out_button)
         layout.addWidget(self.out_label)
 
+        # Output format
+        self.format_combo = QComboBox()
+        self.format_combo.addItems([
+            "Folder of files",
+            "Single-file bundle (stimuli.bundle + stimuli.json)",
+            "Both"
+        ])
+        layout.addWidget(QLabel("Output:"))
+        layout.addWidget(self.format_combo)
+
         # Progress
-        self.progress = QProgressBar()
-        layout.addWidget(self.progress)
+        self.progress_panel = ProgressPanel()
+        layout.addWidget(self.progress_panel)
 
         # Run button
         self.run_button = QPushButton("Build Experiment")
@@ -108,37 +203,23 @@ class Rename(QWidget):
             QMessageBox.critical(self, "Error", "Please select all required folders.")
             return
 
-        all_files = []
-
-        # Greyscale
-        for f in os.listdir(self.greyscale_path):
-            if f.endswith(".jpg"):
-                all_files.append(("1_greyscale_" + f, os.path.join(self.greyscale_path, f)))
-
-        # Mooney
-        for f in os.listdir(self.mooney_path):
-            if f.endswith(".jpg"):
-                all_files.append(("2_mooney_" + f, os.path.join(self.mooney_path, f)))
-
-        # Superimposed: CB1 and CB2
-        for cb in ["CB1", "CB2"]:
-            cb_folder = os.path.join(self.superimposed_path, cb)
-            if os.path.isdir(cb_folder):
-                for f in os.listdir(cb_folder):
-                    if f.endswith(".png"):
-                        prefix = f.split("_")[0]
-                        new_name = f"3_super_{cb}_{prefix}.png"
-                        all_files.append((new_name, os.path.join(cb_folder, f)))
-
-        self.progress.setMaximum(len(all_files))
-        self.progress.setValue(0)
-
-        for i, (new_name, src_path) in enumerate(all_files):
-            dest_path = os.path.join(self.output_path, new_name)
-            shutil.copyfile(src_path, dest_path)
-            self.progress.setValue(i + 1)
-
-        QMessageBox.information(self, "Done", "Renaming complete. Experiment is ready to go!")
+        self.run_button.setEnabled(False)
+        output_format = self.format_combo.currentIndex()
+        self.worker = RenameWorker(
+            self.greyscale_path, self.mooney_path, self.superimposed_path, self.output_path,
+            write_files=output_format in (0, 2), write_bundle=output_format in (1, 2)
+        )
+        self.progress_panel.attach(self.worker)
+        self.worker.finished.connect(self.build_finished)
+        self.worker.start()
+
+    def build_finished(self):
+        self.run_button.setEnabled(True)
+        report_outcome(self, self.worker, "Renaming complete. Experiment is ready to go!")
+
+    def closeEvent(self, event):
+        self.progress_panel.stop()
+        super().closeEvent(event)
 
 
 # Only run directly for testing
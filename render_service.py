@@ -0,0 +1,333 @@
+import io
+import os
+import sys
+import json
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import cv2
+import numpy as np
+from PIL import Image
+from PyQt5.QtWidgets import (
+    QApplication, QWidget, QLabel, QPushButton, QFileDialog, QVBoxLayout,
+    QHBoxLayout, QSpinBox, QMessageBox
+)
+from PyQt5.QtCore import Qt, QTimer
+
+from project_index import list_images
+from cache import LRUCache
+from mooney import render_mooney
+from compositor import PRESETS, DEFAULT_PRESET, layer_luts, composite
+
+
+class RenderService:
+    """Renders Mooney and superMooney images on demand from a project's 2_grey folder.
+
+    Decoded greyscale images are kept in memory, and finished PNG responses are
+    kept in an LRU cache in front of the renderer, so asking for the same
+    parameters again is answered without decoding or rendering anything.
+    """
+
+    def __init__(self, project_dir, image_cache_mb=512, response_cache_mb=256):
+        self.grey_dir = os.path.join(project_dir, "2_grey")
+        self.mooney_dir = os.path.join(project_dir, "3_mooney")
+        self.images = LRUCache(image_cache_mb * 1024 * 1024)
+        self.responses = LRUCache(response_cache_mb * 1024 * 1024)
+
+    def image_path(self, folder, name):
+        # Only bare filenames inside the project folders can be requested
+        if not name or os.path.basename(name) != name:
+            raise ValueError(f"Invalid image name: {name!r}")
+        path = os.path.join(folder, name)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"No such image: {name}")
+        return path
+
+    def load_grey(self, folder, name):
+        path = self.image_path(folder, name)
+        key = (path, os.path.getmtime(path))
+        img = self.images.get(key)
+        if img is None:
+            img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if img is None:
+                raise ValueError(f"Could not read image: {name}")
+            self.images.put(key, img, img.nbytes)
+        return img, key[1]
+
+    def mooney_grey(self, name, sigma, threshold):
+        """Mooney image as the greyscale array Superimpose works on."""
+        if sigma is None:
+            # No parameters given: use the Mooney image already saved in 3_mooney
+            img, _ = self.load_grey(self.mooney_dir, name)
+            return img
+
+        grey, _ = self.load_grey(self.grey_dir, name)
+        # Superimpose reads Mooney images back from their saved JPEGs, so go through the
+        # same JPEG round trip to get exactly the composite the batch pipeline would produce
+        buffer = io.BytesIO()
+        Image.fromarray(render_mooney(grey, sigma, threshold)).save(buffer, format="JPEG")
+        buffer.seek(0)
+        return np.array(Image.open(buffer).convert('L'))
+
+    def cached(self, key, render):
+        data = self.responses.get(key)
+        if data is None:
+            data = render()
+            self.responses.put(key, data, len(data))
+            return data, False
+        return data, True
+
+    def mooney(self, name, sigma, threshold):
+        grey, mtime = self.load_grey(self.grey_dir, name)
+
+        def render():
+            ok, png = cv2.imencode(".png", render_mooney(grey, sigma, threshold))
+            return png.tobytes()
+
+        return self.cached(("mooney", name, mtime, sigma, threshold), render)
+
+    def supermooney(self, a, b, alpha, sigma=None, threshold=None, sigma_b=None, threshold_b=None,
+                    c=None, preset=DEFAULT_PRESET):
+        """Composite of a, b (and c, for three-colour presets) in the preset's colours.
+
+        b and c use sigma_b/threshold_b, which default to sigma/threshold (or 127 if only sigma_b is given).
+        """
+        if sigma_b is None:
+            sigma_b = sigma
+        if threshold_b is None:
+            threshold_b = 127 if threshold is None else threshold
+        if preset not in PRESETS:
+            raise ValueError(f"Unknown preset: {preset}. Use one of {', '.join(PRESETS)}.")
+        names = [a, b] + ([c] if c else [])
+        if len(names) != len(PRESETS[preset].layers):
+            raise ValueError(f"The {preset} preset needs {len(PRESETS[preset].layers)} images.")
+        params = [(sigma, threshold)] + [(sigma_b, threshold_b)] * (len(names) - 1)
+        # Each image comes from 3_mooney or 2_grey depending on whether it has its own sigma
+        mtimes = tuple(os.path.getmtime(self.image_path(self.mooney_dir if s is None else self.grey_dir, name))
+                       for name, (s, _) in zip(names, params))
+
+        def render():
+            greys = [self.mooney_grey(name, *p) for name, p in zip(names, params)]
+            img = Image.fromarray(composite(greys, layer_luts(preset, alpha)), mode="RGBA")
+            buffer = io.BytesIO()
+            img.save(buffer, format="PNG", compress_level=1)
+            return buffer.getvalue()
+
+        key = ("super", tuple(names), mtimes, alpha, sigma, threshold, sigma_b, threshold_b, preset)
+        return self.cached(key, render)
+
+    def image_list(self):
+        return {
+            "grey": list_images(self.grey_dir),
+            "mooney": list_images(self.mooney_dir)
+        }
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """GET /mooney?image=NAME&sigma=2&threshold=127
+    GET /super?a=NAME&b=NAME&alpha=0.5[&sigma=2&threshold=127[&sigma_b=..&threshold_b=..]][&preset=red-cyan]
+    GET /super?a=NAME&b=NAME&c=NAME&preset=cyan-magenta-yellow
+    GET /images
+    """
+
+    service = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, content_type, body, cache_state=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        if cache_state:
+            self.send_header("X-Cache", cache_state)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_text(self, status, message):
+        self.send_body(status, "text/plain; charset=utf-8", message.encode("utf-8"))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        def number(name, kind=float, default=None):
+            value = query.get(name)
+            return default if value in (None, "") else kind(value)
+
+        try:
+            if url.path == "/mooney":
+                data, hit = self.service.mooney(query.get("image"), number("sigma", default=2.0),
+                                                number("threshold", int, 127))
+            elif url.path == "/super":
+                alpha = number("alpha", default=0.5)
+                if not 0 <= alpha <= 1:
+                    raise ValueError("Alpha must be a number between 0 and 1.")
+                data, hit = self.service.supermooney(
+                    query.get("a"), query.get("b"), alpha,
+                    number("sigma"), number("threshold", int, 127 if "sigma" in query else None),
+                    number("sigma_b"), number("threshold_b", int),
+                    query.get("c"), query.get("preset") or DEFAULT_PRESET
+                )
+            elif url.path == "/images":
+                body = json.dumps(self.service.image_list()).encode("utf-8")
+                self.send_body(200, "application/json", body)
+                return
+            else:
+                self.send_error_text(404, "Unknown endpoint. Use /mooney, /super or /images.")
+                return
+        except FileNotFoundError as e:
+            self.send_error_text(404, str(e))
+            return
+        except ValueError as e:
+            self.send_error_text(400, str(e))
+            return
+        except Exception as e:
+            self.send_error_text(500, f"Render failed: {e}")
+            return
+
+        self.send_body(200, "image/png", data, "hit" if hit else "miss")
+
+
+def make_server(project_dir, port=8765, host="127.0.0.1"):
+    service = RenderService(project_dir)
+    handler = type("Handler", (RenderRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server, service
+
+
+class RenderServiceWidget(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Mooney Render Service")
+
+        cwd = os.getcwd()
+        self.project_dir = cwd if os.path.isdir(os.path.join(cwd, "2_grey")) else None
+        self.server = None
+        self.service = None
+
+        self.init_ui()
+
+        self.stats_timer = QTimer(self)
+        self.stats_timer.timeout.connect(self.update_stats)
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+
+        self.info_label = QLabel(
+            "Serve Mooney and superMooney renders over local HTTP for experiment and piloting tools:\n"
+            "/mooney?image=NAME&sigma=2&threshold=127\n"
+            "/super?a=NAME&b=NAME&alpha=0.5[&sigma=2&threshold=127][&preset=red-cyan]\n"
+            "/images"
+        )
+        self.info_label.setWordWrap(True)
+        self.info_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+
+        self.project_btn = QPushButton("Select Project Folder")
+        self.project_btn.clicked.connect(self.select_project_folder)
+        self.project_label = QLabel(self.project_dir or "No folder selected")
+        self.project_label.setStyleSheet("color: gray;")
+
+        self.port_spin = QSpinBox()
+        self.port_spin.setRange(1024, 65535)
+        self.port_spin.setValue(8765)
+
+        self.start_btn = QPushButton("Start Service")
+        self.start_btn.clicked.connect(self.toggle_service)
+
+        self.status_label = QLabel("Stopped.")
+        self.status_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+
+        layout.addWidget(self.info_label)
+
+        project_layout = QHBoxLayout()
+        project_layout.addWidget(self.project_btn)
+        project_layout.addWidget(self.project_label)
+        layout.addLayout(project_layout)
+
+        port_layout = QHBoxLayout()
+        port_layout.addWidget(QLabel("Port:"))
+        port_layout.addWidget(self.port_spin)
+        layout.addLayout(port_layout)
+
+        layout.addWidget(self.start_btn)
+        layout.addWidget(self.status_label)
+
+        self.setLayout(layout)
+        self.resize(550, 250)
+
+    def select_project_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Project Folder")
+        if folder:
+            self.project_dir = folder
+            self.project_label.setText(folder)
+
+    def toggle_service(self):
+        if self.server is not None:
+            self.stop_service()
+            return
+
+        if not self.project_dir:
+            QMessageBox.warning(self, "Warning", "Please select a project folder.")
+            return
+        try:
+            self.server, self.service = make_server(self.project_dir, self.port_spin.value())
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Could not start the service: {e}")
+            return
+
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.start_btn.setText("Stop Service")
+        self.stats_timer.start(1000)
+        self.update_stats()
+
+    def stop_service(self):
+        self.stats_timer.stop()
+        self.server.shutdown()
+        self.server.server_close()
+        self.server = None
+        self.start_btn.setText("Start Service")
+        self.status_label.setText("Stopped.")
+
+    def update_stats(self):
+        responses = self.service.responses
+        self.status_label.setText(
+            f"Serving on http://127.0.0.1:{self.port_spin.value()}/  —  "
+            f"cache: {len(responses.entries)} renders, {responses.hits} hits, {responses.misses} misses"
+        )
+
+    def closeEvent(self, event):
+        if self.server is not None:
+            self.stop_service()
+        super().closeEvent(event)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Mooney/superMooney renders over local HTTP.")
+    parser.add_argument("--project", required=True, help="Project folder containing 2_grey and 3_mooney.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--host", default="127.0.0.1")
+    args = parser.parse_args(argv)
+
+    server, _ = make_server(args.project, args.port, args.host)
+    print(f"Serving {args.project} on http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(main())
+    app = QApplication(sys.argv)
+    window = RenderServiceWidget()
+    window.show()
+    sys.exit(app.exec_())
@@ -0,0 +1,102 @@
+import os
+import threading
+from collections import deque, namedtuple
+from PIL import Image
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+SaveJob = namedtuple("SaveJob", ["filename", "path", "img", "row", "store"])
+
+
+def write_image_atomic(path, img):
+    """Save img to path via a temporary file, so path never holds a half-written image."""
+    folder, name = os.path.split(path)
+    tmp_path = os.path.join(folder, f".{name}.{os.getpid()}.tmp")
+    image_format = Image.registered_extensions().get(os.path.splitext(name)[1].lower())
+    try:
+        Image.fromarray(img).save(tmp_path, format=image_format)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class SaveQueue(QThread):
+    """Writes MooneyApp's saves in the background, one at a time and in the order they were made.
+
+    Each save moves its Mooney image into place first and then records its
+    parameter row, so a row never points at a missing or half-written image.
+    """
+
+    saved = pyqtSignal(str)
+    failed = pyqtSignal(str, str)
+
+    def __init__(self):
+        super().__init__()
+        self.jobs = deque()
+        self.current = None
+        self.failures = []
+        self.stopping = False
+        self.condition = threading.Condition()
+
+    def put(self, filename, path, img, row, store):
+        with self.condition:
+            self.jobs.append(SaveJob(filename, path, img, row, store))
+            self.condition.notify_all()
+        if not self.isRunning():
+            self.stopping = False
+            self.start()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.jobs and not self.stopping:
+                    self.condition.wait()
+                if not self.jobs:
+                    return
+                job = self.current = self.jobs.popleft()
+            try:
+                write_image_atomic(job.path, job.img)
+                job.store.add([job.row])
+            except Exception as e:
+                with self.condition:
+                    self.failures.append((job.filename, str(e)))
+                self.failed.emit(job.filename, str(e))
+            else:
+                self.saved.emit(job.filename)
+            with self.condition:
+                self.current = None
+                self.condition.notify_all()
+
+    def pending(self):
+        with self.condition:
+            return [job.filename for job in self.jobs] + ([self.current.filename] if self.current else [])
+
+    def cancel(self, filename):
+        """Drop a save that has not been started yet. Returns False if it has already been written.
+
+        A save that is being written is waited for, so that afterwards it is
+        either fully on disk or not at all.
+        """
+        with self.condition:
+            for job in self.jobs:
+                if job.filename == filename:
+                    self.jobs.remove(job)
+                    self.condition.notify_all()
+                    return True
+            while self.current is not None and self.current.filename == filename:
+                self.condition.wait()
+        return False
+
+    def flush(self):
+        with self.condition:
+            while self.jobs or self.current is not None:
+                self.condition.wait()
+
+    def stop(self):
+        """Write everything still queued, then end the thread."""
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+        self.wait()
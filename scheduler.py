@@ -0,0 +1,132 @@
+import os
+import sys
+import threading
+from collections import namedtuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Used when an item's size cannot be estimated from image headers
+DEFAULT_ITEM_BYTES = 64 * 1024 * 1024
+
+# Share of the memory available at the start of a run given to it when no budget is set
+DEFAULT_BUDGET_FRACTION = 0.5
+
+IOPlan = namedtuple("IOPlan", ["workers", "read_ahead", "write_behind", "budget", "item_bytes"])
+
+
+def parse_size(text):
+    """'8G', '512M', '2048K' or a plain number of bytes."""
+    text = str(text).strip().upper().rstrip("B")
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(float(text))
+
+
+def format_size(n):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+def available_memory():
+    """Bytes of memory available to new allocations, or None if it cannot be determined."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def default_budget():
+    """MOONPY_MEMORY_BUDGET if set (e.g. '16G'), otherwise half of the currently available memory."""
+    if os.environ.get("MOONPY_MEMORY_BUDGET"):
+        return parse_size(os.environ["MOONPY_MEMORY_BUDGET"])
+    available = available_memory()
+    if available is None:
+        return 4 * 1024 ** 3
+    return int(available * DEFAULT_BUDGET_FRACTION)
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None if it cannot be read."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def lifetime_peak_rss():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, KiB elsewhere
+
+
+def plan_io(budget, item_bytes, cpus=None):
+    """Choose worker count and queue depths so that the items held in memory fit the budget.
+
+    At most read_ahead decoded items, one item being processed and write_behind
+    queued results are alive at once, so (read_ahead + 1 + write_behind) items
+    must fit. Within that, use enough workers to keep every core busy.
+    """
+    cpus = cpus or os.cpu_count() or 1
+    item_bytes = max(1, item_bytes or DEFAULT_ITEM_BYTES)
+    slots = max(3, budget // item_bytes)
+
+    workers = max(1, min(cpus + 4, (slots - 1) // 3))
+    read_ahead = workers
+    write_behind = max(1, min(workers * 2, slots - 1 - read_ahead))
+    return IOPlan(workers, read_ahead, write_behind, budget, item_bytes)
+
+
+class MemoryMonitor:
+    """Samples this process's RSS in the background to find the peak during one stage.
+
+    getrusage only reports the peak over the whole process lifetime, which would
+    carry one stage's peak over into every later stage run in the same session.
+    """
+
+    interval = 0.05
+
+    def __init__(self):
+        self.start_rss = current_rss()
+        self.peak = self.start_rss
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.start_rss is None:
+            return self
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def sample(self):
+        while not self.stopped.wait(self.interval):
+            rss = current_rss()
+            if rss is not None and rss > self.peak:
+                self.peak = rss
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        rss = current_rss()
+        if rss is not None and self.peak is not None:
+            self.peak = max(self.peak, rss)
+        elif self.peak is None:
+            self.peak = lifetime_peak_rss()
+        return self.peak
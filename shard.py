@@ -0,0 +1,109 @@
+import os
+import csv
+import glob
+import re
+
+from project_index import shared_index
+
+
+MANIFEST_COLUMNS = ["item", "status", "message"]
+
+
+def parse_shard(text):
+    """Parse 'index/count' (index counted from 0) into a (index, count) tuple."""
+    match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", text or "")
+    if not match:
+        raise ValueError(f"Shard must look like 'index/count', e.g. 0/4, not {text!r}.")
+    index, count = int(match.group(1)), int(match.group(2))
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard index must be between 0 and {count - 1}.")
+    return index, count
+
+
+def shard_items(items, index, count):
+    """Deterministic slice of an already sorted item list.
+
+    Items are dealt out round-robin, so every shard gets a similar mix of the
+    list and the same (index, count) always selects the same items.
+    """
+    return items[index::count]
+
+
+def manifest_path(manifest_dir, stage, index, count):
+    return os.path.join(manifest_dir, f"manifest_{stage}_{index}of{count}.csv")
+
+
+def write_manifest(path, worker):
+    """Record the outcome of every item a worker attempted."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(MANIFEST_COLUMNS)
+        for item, message in sorted(worker.outcomes.items()):
+            writer.writerow([item, "error" if message else "ok", message])
+
+
+def read_manifest(path):
+    with open(path, newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def merge_manifests(manifest_dir, stage, worker):
+    """Combine the shard manifests of a stage and check them against the project listing.
+
+    worker is an (unstarted) worker for the same stage; its item list is the
+    complete set of items the shards should have covered between them.
+    Writes manifest_<stage>.csv and returns (rows, problems).
+    """
+    problems = []
+    paths = glob.glob(os.path.join(manifest_dir, f"manifest_{stage}_*of*.csv"))
+    if not paths:
+        return [], [f"No shard manifests for '{stage}' found in {manifest_dir}."]
+
+    shards = {}
+    for path in paths:
+        match = re.search(r"_(\d+)of(\d+)\.csv$", path)
+        shards[(int(match.group(1)), int(match.group(2)))] = path
+
+    counts = {count for _, count in shards}
+    if len(counts) > 1:
+        problems.append(f"Manifests from different shard counts were found: {sorted(counts)}.")
+    count = max(counts)
+    missing_shards = [i for i in range(count) if (i, count) not in shards]
+    if missing_shards:
+        problems.append(f"Missing manifests for shard(s) {missing_shards} of {count}.")
+
+    rows = {}
+    for (index, shard_count), path in sorted(shards.items()):
+        if shard_count != count:
+            continue
+        for row in read_manifest(path):
+            if row["item"] in rows:
+                problems.append(f"{row['item']} appears in more than one shard.")
+            rows[row["item"]] = row
+
+    expected = {worker.item_name(item): item for item in worker.items()}
+    outputs = {name: [os.path.split(output) for output in worker.outputs(item)] for name, item in expected.items()}
+    # One listing per output folder, however many items write to it
+    folders = {folder for paths in outputs.values() for folder, _ in paths}
+    present = {folder: set(shared_index.scan(folder, headers=False)) for folder in folders}
+    for name, item in expected.items():
+        row = rows.get(name)
+        if row is None:
+            problems.append(f"{name}: not processed by any shard.")
+        elif row["status"] != "ok":
+            problems.append(f"{name}: {row['message']}")
+        else:
+            for folder, filename in outputs[name]:
+                if filename not in present[folder]:
+                    problems.append(f"{name}: output {os.path.join(folder, filename)} is missing.")
+    for name in rows:
+        if name not in expected:
+            problems.append(f"{name}: not part of the current project listing.")
+
+    merged = [rows[name] for name in sorted(rows)]
+    with open(os.path.join(manifest_dir, f"manifest_{stage}.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=MANIFEST_COLUMNS)
+        writer.writeheader()
+        writer.writerows(merged)
+    return merged, problems
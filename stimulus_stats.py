@@ -0,0 +1,218 @@
+import os
+import sys
+import cv2
+import numpy as np
+import pandas as pd
+from PyQt5.QtWidgets import (
+    QApplication, QWidget, QLabel, QPushButton, QFileDialog, QVBoxLayout,
+    QHBoxLayout, QMessageBox
+)
+
+from project_index import list_images
+from worker import BatchWorker, ProgressPanel, report_outcome
+
+
+COLUMNS = [
+    "stage", "file", "width", "height",
+    "black_fraction", "edge_density", "components", "mean_component_size",
+    "cyan_fraction", "magenta_fraction", "overlap_fraction", "overlap_jaccard"
+]
+
+# Stage folders analysed, relative to the project folder
+STAGES = [
+    ("3_mooney", "3_mooney"),
+    ("7_superimposed_CB1", os.path.join("7_superimposed", "CB1")),
+    ("7_superimposed_CB2", os.path.join("7_superimposed", "CB2"))
+]
+
+
+def edge_density(mask):
+    """Fraction of pixels that differ from their right or lower neighbour."""
+    edges = np.zeros(mask.shape, dtype=bool)
+    edges[:, :-1] = mask[:, :-1] != mask[:, 1:]
+    edges[:-1] |= mask[:-1] != mask[1:]
+    return edges.mean()
+
+
+def mask_stats(mask):
+    """Black fraction, edge density and 8-connected component statistics of a boolean mask."""
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask.view(np.uint8), connectivity=8)
+    areas = stats[1:, cv2.CC_STAT_AREA]  # label 0 is the background
+    return {
+        "black_fraction": mask.mean(),
+        "edge_density": edge_density(mask),
+        "components": count - 1,
+        "mean_component_size": areas.mean() if len(areas) else 0.0
+    }
+
+
+def mooney_stats(path):
+    img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise ValueError("could not be read")
+    # Same split as Superimpose: intensities below 0.5 count as black
+    return img.shape, mask_stats(img < 128)
+
+
+def superimposed_stats(path):
+    img = cv2.imread(path, cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("could not be read")
+    # Over the white background, cyan ink lowers red and magenta ink lowers green
+    cyan = img[..., 2] < 255
+    magenta = img[..., 1] < 255
+    overlap = cyan & magenta
+    union = cyan | magenta
+    row = mask_stats(union)
+    union_count = union.sum()
+    row.update({
+        "cyan_fraction": cyan.mean(),
+        "magenta_fraction": magenta.mean(),
+        "overlap_fraction": overlap.mean(),
+        "overlap_jaccard": overlap.sum() / union_count if union_count else 0.0
+    })
+    return img.shape, row
+
+
+class StimulusStatsWorker(BatchWorker):
+    """Measures every Mooney and superMooney image in a project and writes one CSV table."""
+
+    bytes_per_pixel = 16  # colour image, masks and int32 component labels
+
+    def __init__(self, project_dir, output_csv):
+        super().__init__()
+        self.project_dir = project_dir
+        self.output_csv = output_csv
+        self.rows = []
+
+    def items(self):
+        items = []
+        for stage, folder in STAGES:
+            path = os.path.join(self.project_dir, folder)
+            items += [(stage, path, name) for name in list_images(path)]
+        return items
+
+    def item_name(self, item):
+        return f"{item[0]}/{item[2]}"
+
+    def outputs(self, item):
+        return [self.output_csv]
+
+    def item_path(self, item):
+        return os.path.join(item[1], item[2])
+
+    def load(self, item):
+        # All of the measuring happens on the I/O pool, so images are analysed in parallel
+        stage, folder, name = item
+        measure = mooney_stats if stage == "3_mooney" else superimposed_stats
+        return measure(os.path.join(folder, name))
+
+    def process(self, item, result):
+        shape, row = result
+        row.update({"stage": item[0], "file": item[2], "width": shape[1], "height": shape[0]})
+        self.rows.append(row)
+
+    def teardown(self):
+        if self.cancelled:
+            return
+        pd.DataFrame(self.rows, columns=COLUMNS).to_csv(self.output_csv, index=False, float_format="%.6g")
+
+
+class StimulusStats(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Stimulus Statistics")
+
+        cwd = os.getcwd()
+        self.project_dir = cwd if os.path.isdir(os.path.join(cwd, "3_mooney")) else None
+        self.output_csv = os.path.join(cwd, "stimulus_stats.csv") if self.project_dir else None
+
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+
+        self.info_label = QLabel(
+            "Measure every image in '3_mooney' and '7_superimposed' (black fraction, edge density, "
+            "connected-component count and mean size, and cyan/magenta overlap for superMooneys) "
+            "and save the results as one CSV table."
+        )
+        self.info_label.setWordWrap(True)
+
+        self.project_btn = QPushButton("Select Project Folder")
+        self.project_btn.clicked.connect(self.select_project_folder)
+        self.project_label = QLabel(self.project_dir or "No folder selected")
+        self.project_label.setStyleSheet("color: gray;")
+
+        self.output_btn = QPushButton("Select Output File")
+        self.output_btn.clicked.connect(self.select_output_file)
+        self.output_label = QLabel(self.output_csv or "No file selected")
+        self.output_label.setStyleSheet("color: gray;")
+
+        self.run_btn = QPushButton("Compute Statistics")
+        self.run_btn.clicked.connect(self.compute)
+
+        self.progress_panel = ProgressPanel()
+
+        self.done_btn = QPushButton("Done")
+        self.done_btn.clicked.connect(self.close)
+
+        layout.addWidget(self.info_label)
+
+        project_layout = QHBoxLayout()
+        project_layout.addWidget(self.project_btn)
+        project_layout.addWidget(self.project_label)
+        layout.addLayout(project_layout)
+
+        output_layout = QHBoxLayout()
+        output_layout.addWidget(self.output_btn)
+        output_layout.addWidget(self.output_label)
+        layout.addLayout(output_layout)
+
+        layout.addWidget(self.run_btn)
+        layout.addWidget(self.progress_panel)
+        layout.addWidget(self.done_btn)
+
+        self.setLayout(layout)
+        self.resize(600, 250)
+
+    def select_project_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Project Folder")
+        if folder:
+            self.project_dir = folder
+            self.project_label.setText(folder)
+            if not self.output_csv:
+                self.output_csv = os.path.join(folder, "stimulus_stats.csv")
+                self.output_label.setText(self.output_csv)
+
+    def select_output_file(self):
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save Statistics As", "stimulus_stats.csv", "CSV Files (*.csv)")
+        if file_path:
+            self.output_csv = file_path
+            self.output_label.setText(file_path)
+
+    def compute(self):
+        if not self.project_dir or not self.output_csv:
+            QMessageBox.warning(self, "Warning", "Please select the project folder and output file.")
+            return
+
+        self.run_btn.setEnabled(False)
+        self.worker = StimulusStatsWorker(self.project_dir, self.output_csv)
+        self.progress_panel.attach(self.worker)
+        self.worker.finished.connect(self.compute_finished)
+        self.worker.start()
+
+    def compute_finished(self):
+        self.run_btn.setEnabled(True)
+        report_outcome(self, self.worker, f"Measured {len(self.worker.rows)} images.\nSaved to {self.output_csv}")
+
+    def closeEvent(self, event):
+        self.progress_panel.stop()
+        super().closeEvent(event)
+
+
+if __name__ == "__main__":
+    app = QApplication(sys.argv)
+    window = StimulusStats()
+    window.show()
+    sys.exit(app.exec_())
@@ -1,14 +1,132 @@
 import os
 import sys
-import csv
 import numpy as np
 from PIL import Image
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton, QFileDialog,
-    QVBoxLayout, QHBoxLayout, QLineEdit, QMessageBox
+    QVBoxLayout, QHBoxLayout, QLineEdit, QMessageBox, QComboBox, QCheckBox
 )
 from PyQt5.QtCore import Qt
 
+from project_index import check_pairings, format_problems
+from encoding import PROFILES, DEFAULT_PROFILE, save_image
+from compositor import PRESETS, DEFAULT_PRESET, CYAN, MAGENTA, layer_luts, threshold_lut, apply_lut, composite
+from worker import BatchWorker, ProgressPanel, report_outcome
+
+
+def load_pair(input_folder, imgA_name, imgB_name):
+    a_img = Image.open(os.path.join(input_folder, imgA_name)).convert('L')
+    b_img = Image.open(os.path.join(input_folder, imgB_name)).convert('L')
+    return np.array(a_img), np.array(b_img)
+
+
+def make_layer(intensity_arr, colour, alpha):
+    # Black where the intensity (0-1) is below 0.5, like the threshold presets
+    grey = np.where(intensity_arr < 0.5, 0, 255).astype(np.uint8)
+    return Image.fromarray(apply_lut(grey, threshold_lut(colour, alpha)), mode='RGBA')
+
+
+def make_cyan(intensity_arr, alpha):
+    return make_layer(intensity_arr, CYAN, alpha)
+
+
+def make_magenta(intensity_arr, alpha):
+    return make_layer(intensity_arr, MAGENTA, alpha)
+
+
+def alpha_composite_white_bg(img1, img2):
+    white_bg = Image.new("RGBA", img1.size, (255, 255, 255, 255))
+    composite = Image.alpha_composite(white_bg, img1)
+    composite = Image.alpha_composite(composite, img2)
+    return composite
+
+
+class SuperimposeWorker(BatchWorker):
+    bytes_per_pixel = 26  # two greyscale images, four RGBA layers and two RGBA composites
+
+    def __init__(self, pairings, alpha, input_folder, output_cyan, output_magenta, output_combined,
+                 layer_profile=DEFAULT_PROFILE, composite_profile=DEFAULT_PROFILE, write_layers=True,
+                 preset=DEFAULT_PRESET):
+        super().__init__()
+        if len(PRESETS[preset].layers) != 2:
+            raise ValueError(f"Superimpose needs a two-colour preset, not {preset}.")
+        self.pairings = pairings
+        self.alpha = alpha
+        # First colour (cyan by default) is written to output_cyan, the second to output_magenta
+        self.first, self.second = (style.name for style in PRESETS[preset].layers)
+        self.luts = layer_luts(preset, alpha)
+        self.input_folder = input_folder
+        self.output_cyan = output_cyan
+        self.output_magenta = output_magenta
+        self.output_combined = output_combined
+        self.layer_profile = PROFILES[layer_profile]
+        self.composite_profile = PROFILES[composite_profile]
+        self.write_layers = write_layers
+
+    def setup(self):
+        if self.write_layers:
+            os.makedirs(self.output_cyan, exist_ok=True)
+            os.makedirs(self.output_magenta, exist_ok=True)
+        self.cb1_folder = os.path.join(self.output_combined, "CB1")
+        self.cb2_folder = os.path.join(self.output_combined, "CB2")
+        os.makedirs(self.cb1_folder, exist_ok=True)
+        os.makedirs(self.cb2_folder, exist_ok=True)
+
+    def items(self):
+        return list(enumerate(self.pairings, start=1))
+
+    def item_name(self, item):
+        idx, (imgA_name, imgB_name) = item
+        return f"Pair {idx} ({imgA_name} / {imgB_name})"
+
+    def layer_paths(self, idx):
+        ext = self.layer_profile.extension
+        return [
+            os.path.join(self.output_cyan, f"{idx}_A_{self.first}{ext}"),
+            os.path.join(self.output_cyan, f"{idx}_B_{self.first}{ext}"),
+            os.path.join(self.output_magenta, f"{idx}_A_{self.second}{ext}"),
+            os.path.join(self.output_magenta, f"{idx}_B_{self.second}{ext}")
+        ]
+
+    def composite_paths(self, idx):
+        """Paths for (A first colour + B second, B first + A second), alternating between CB1 and CB2."""
+        ext = self.composite_profile.extension
+        cb1_folder = os.path.join(self.output_combined, "CB1")
+        cb2_folder = os.path.join(self.output_combined, "CB2")
+        first, second = (cb1_folder, cb2_folder) if idx % 2 == 1 else (cb2_folder, cb1_folder)
+        return [
+            os.path.join(first, f"{idx}_A_{self.first}__B_{self.second}{ext}"),
+            os.path.join(second, f"{idx}_B_{self.first}__A_{self.second}{ext}")
+        ]
+
+    def outputs(self, item):
+        idx, _ = item
+        layers = self.layer_paths(idx) if self.write_layers else []
+        return layers + self.composite_paths(idx)
+
+    def item_path(self, item):
+        return os.path.join(self.input_folder, item[1][0])
+
+    def load(self, item):
+        _, (imgA_name, imgB_name) = item
+        return load_pair(self.input_folder, imgA_name, imgB_name)
+
+    def process(self, item, arrays):
+        idx, _ = item
+        grey_a, grey_b = arrays
+        first, second = self.luts
+
+        if self.write_layers:
+            layers = [(grey_a, first), (grey_b, first), (grey_a, second), (grey_b, second)]
+            for (grey, lut), path in zip(layers, self.layer_paths(idx)):
+                self.write(item, save_image, Image.fromarray(apply_lut(grey, lut), mode='RGBA'), path, self.layer_profile)
+
+        combo1 = composite([grey_a, grey_b], self.luts)
+        combo2 = composite([grey_b, grey_a], self.luts)
+
+        for combo, path in zip([combo1, combo2], self.composite_paths(idx)):
+            self.write(item, save_image, Image.fromarray(combo, mode='RGBA'), path, self.composite_profile)
+
 
 class Superimpose(QWidget):
     def __init__(self):
@@ -35,6 +153,18 @@ class Superimpose(QWidget):
         self.alpha_input = QLineEdit("0.5", self)
         self.alpha_label = QLabel("Alpha (0\u20131):", self)
 
+        self.preset_combo = QComboBox()
+        for name, preset in PRESETS.items():
+            if len(preset.layers) == 2:
+                self.preset_combo.addItem(preset.label, name)
+        self.preset_combo.setCurrentIndex(self.preset_combo.findData(DEFAULT_PRESET))
+
+        self.layer_encoding = self.make_encoding_combo()
+        self.composite_encoding = self.make_encoding_combo()
+        self.write_layers_check = QCheckBox("Write cyan/magenta layers (5_cyan, 6_magenta)")
+        self.write_layers_check.setChecked(True)
+        self.write_layers_check.toggled.connect(self.layer_encoding.setEnabled)
+
         self.select_input_button = QPushButton("Select Input Image Folder")
         self.select_input_button.clicked.connect(self.select_input_folder)
 
@@ -56,18 +186,39 @@ class Superimpose(QWidget):
         alpha_layout = QHBoxLayout()
         alpha_layout.addWidget(self.alpha_label)
         alpha_layout.addWidget(self.alpha_input)
+        alpha_layout.addWidget(QLabel("Colours:"))
+        alpha_layout.addWidget(self.preset_combo)
         layout.addLayout(alpha_layout)
 
+        encoding_layout = QHBoxLayout()
+        encoding_layout.addWidget(QLabel("Layers:"))
+        encoding_layout.addWidget(self.layer_encoding)
+        encoding_layout.addWidget(QLabel("Superimposed:"))
+        encoding_layout.addWidget(self.composite_encoding)
+        layout.addLayout(encoding_layout)
+        layout.addWidget(self.write_layers_check)
+
         layout.addWidget(self.select_input_button)
         layout.addWidget(self.select_pairings_button)
         layout.addWidget(self.select_output_button)
         layout.addWidget(self.run_button)
+
+        self.progress_panel = ProgressPanel()
+        layout.addWidget(self.progress_panel)
+
         layout.addWidget(self.done_button)
 
         self.setLayout(layout)
         self.resize(500, 300)
         self.update_status_label()
 
+    def make_encoding_combo(self):
+        combo = QComboBox()
+        for name, profile in PROFILES.items():
+            combo.addItem(profile.label, name)
+        combo.setCurrentIndex(combo.findData(DEFAULT_PROFILE))
+        return combo
+
     def update_status_label(self):
         def rel_path(p):
             try:
@@ -141,86 +292,45 @@ class Superimpose(QWidget):
 
             alpha = self.get_alpha()
 
-            with open(self.pairings_file, 'r') as f:
-                reader = csv.DictReader(f)
-                self.pairings = [(row["man"], row["nat"]) for row in reader]
-
-            for idx, (imgA_name, imgB_name) in enumerate(self.pairings, start=1):
-                a_path = os.path.join(self.input_folder, imgA_name)
-                b_path = os.path.join(self.input_folder, imgB_name)
-
-                a_img = Image.open(a_path).convert('L')
-                b_img = Image.open(b_path).convert('L')
-
-                arr_a = np.array(a_img) / 255.0
-                arr_b = np.array(b_img) / 255.0
-
-                a_cyan = self.make_cyan(arr_a, alpha)
-                b_magenta = self.make_magenta(arr_b, alpha)
-
-                b_cyan = self.make_cyan(arr_b, alpha)
-                a_magenta = self.make_magenta(arr_a, alpha)
-
-                a_cyan.save(os.path.join(self.output_cyan, f"{idx}_A_cyan.png"))
-                b_cyan.save(os.path.join(self.output_cyan, f"{idx}_B_cyan.png"))
-                a_magenta.save(os.path.join(self.output_magenta, f"{idx}_A_magenta.png"))
-                b_magenta.save(os.path.join(self.output_magenta, f"{idx}_B_magenta.png"))
-
-                combo1 = self.alpha_composite_white_bg(a_cyan, b_magenta)
-                combo2 = self.alpha_composite_white_bg(b_cyan, a_magenta)
-
-                cb1_folder = os.path.join(self.output_combined, "CB1")
-                cb2_folder = os.path.join(self.output_combined, "CB2")
-                os.makedirs(cb1_folder, exist_ok=True)
-                os.makedirs(cb2_folder, exist_ok=True)
-
-                if idx % 2 == 1:
-                    combo1.save(os.path.join(cb1_folder, f"{idx}_A_cyan__B_magenta.png"))
-                    combo2.save(os.path.join(cb2_folder, f"{idx}_B_cyan__A_magenta.png"))
-                else:
-                    combo2.save(os.path.join(cb1_folder, f"{idx}_B_cyan__A_magenta.png"))
-                    combo1.save(os.path.join(cb2_folder, f"{idx}_A_cyan__B_magenta.png"))
-
-            QMessageBox.information(self, "Done", f"\u2705 Processed {len(self.pairings)} image pairs.")
+            # Header-only pre-flight: missing files and size mismatches are caught before any pixel work
+            self.pairings, problems = check_pairings(self.input_folder, self.pairings_file)
+            if problems:
+                QMessageBox.critical(self, "Pre-flight Check Failed", format_problems(problems))
+                return
 
         except Exception as e:
             QMessageBox.critical(self, "Error", str(e))
+            return
+
+        self.run_button.setEnabled(False)
+        self.worker = SuperimposeWorker(
+            self.pairings, alpha, self.input_folder,
+            self.output_cyan, self.output_magenta, self.output_combined,
+            layer_profile=self.layer_encoding.currentData(),
+            composite_profile=self.composite_encoding.currentData(),
+            write_layers=self.write_layers_check.isChecked(),
+            preset=self.preset_combo.currentData()
+        )
+        self.progress_panel.attach(self.worker)
+        self.worker.finished.connect(self.run_finished)
+        self.worker.start()
+
+    def run_finished(self):
+        self.run_button.setEnabled(True)
+        report_outcome(self, self.worker, f"\u2705 Processed {len(self.pairings)} image pairs.")
 
     def make_cyan(self, intensity_arr, alpha):
-        h, w = intensity_arr.shape
-        rgba = np.ones((h, w, 4), dtype=np.uint8) * 255
-
-        black_mask = intensity_arr < 0.5
-
-        rgba[..., 0][black_mask] = 0
-        rgba[..., 1][black_mask] = 255
-        rgba[..., 2][black_mask] = 255
-        rgba[..., 3][black_mask] = int(255 * alpha)
-
-        rgba[..., 3][~black_mask] = 0
-
-        return Image.fromarray(rgba, mode='RGBA')
+        return make_cyan(intensity_arr, alpha)
 
     def make_magenta(self, intensity_arr, alpha):
-        h, w = intensity_arr.shape
-        rgba = np.ones((h, w, 4), dtype=np.uint8) * 255
-
-        black_mask = intensity_arr < 0.5
-
-        rgba[..., 0][black_mask] = 255
-        rgba[..., 1][black_mask] = 0
-        rgba[..., 2][black_mask] = 255
-        rgba[..., 3][black_mask] = int(255 * alpha)
-
-        rgba[..., 3][~black_mask] = 0
-
-        return Image.fromarray(rgba, mode='RGBA')
+        return make_magenta(intensity_arr, alpha)
 
     def alpha_composite_white_bg(self, img1, img2):
-        white_bg = Image.new("RGBA", img1.size, (255, 255, 255, 255))
-        composite = Image.alpha_composite(white_bg, img1)
-        composite = Image.alpha_composite(composite, img2)
-        return composite
+        return alpha_composite_white_bg(img1, img2)
+
+    def closeEvent(self, event):
+        self.progress_panel.stop()
+        super().closeEvent(event)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,301 @@
+import os
+import cv2
+import numpy as np
+from PIL import Image
+from PyQt5.QtWidgets import (
+    QWidget, QLabel, QPushButton, QLineEdit, QSpinBox, QVBoxLayout, QHBoxLayout,
+    QScrollArea, QMessageBox
+)
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtGui import QPixmap
+
+from mooney import blur_image, threshold_stack, render_mooney
+from worker import BatchWorker, ProgressPanel, report_outcome
+
+
+DEFAULT_SIGMAS = "1, 2, 3, 4, 6, 8"
+DEFAULT_THRESHOLDS = "64, 88, 112, 136, 160, 184, 208, 232"
+
+LABEL_WIDTH = 56
+LABEL_HEIGHT = 18
+GAP = 2
+
+
+def parse_values(text, kind):
+    values = [kind(v) for v in text.replace(",", " ").split()]
+    if not values:
+        raise ValueError("Enter at least one value.")
+    return values
+
+
+def render_sweep(img, sigmas, thresholds):
+    """Mooney candidates for every (sigma, threshold) as a (len(sigmas), len(thresholds), h, w) stack.
+
+    Each sigma is blurred once, and all thresholds are applied to that blur in
+    one comparison. Every candidate is identical to render_mooney(img, sigma, threshold).
+    """
+    out = np.empty((len(sigmas), len(thresholds)) + img.shape, dtype=np.uint8)
+    for s, sigma in enumerate(sigmas):
+        out[s] = threshold_stack(blur_image(img, sigma), thresholds)
+    return out
+
+
+def sheet_geometry(shape, n_sigmas, n_thresholds, tile):
+    """(sheet height, sheet width, thumbnail height, thumbnail width) for a sweep sheet."""
+    h, w = shape
+    scale = tile / max(h, w)
+    th, tw = max(1, round(h * scale)), max(1, round(w * scale))
+    return LABEL_HEIGHT + n_sigmas * (tile + GAP), LABEL_WIDTH + n_thresholds * (tile + GAP), th, tw
+
+
+def tile_at(x, y, n_sigmas, n_thresholds, tile):
+    """(sigma index, threshold index) of the tile under sheet pixel (x, y), or None."""
+    col, cx = divmod(x - LABEL_WIDTH, tile + GAP)
+    row, cy = divmod(y - LABEL_HEIGHT, tile + GAP)
+    if 0 <= col < n_thresholds and 0 <= row < n_sigmas and cx < tile and cy < tile:
+        return row, col
+    return None
+
+
+def render_sweep_sheet(img, sigmas, thresholds, tile):
+    """A review sheet with one thumbnail per candidate: sigmas down the side, thresholds across the top."""
+    candidates = render_sweep(img, sigmas, thresholds)
+    height, width, th, tw = sheet_geometry(img.shape, len(sigmas), len(thresholds), tile)
+
+    sheet = np.full((height, width), 255, dtype=np.uint8)
+    step = tile + GAP
+    sheet[LABEL_HEIGHT:, LABEL_WIDTH:] = 160  # grey gaps keep white tiles apart
+    grid = sheet[LABEL_HEIGHT:, LABEL_WIDTH:].reshape(len(sigmas), step, len(thresholds), step)
+    for s in range(len(sigmas)):
+        for t in range(len(thresholds)):
+            grid[s, :th, t, :tw] = cv2.resize(candidates[s, t], (tw, th), interpolation=cv2.INTER_AREA)
+
+    header = np.full((LABEL_HEIGHT, width), 255, dtype=np.uint8)
+    for t, threshold in enumerate(thresholds):
+        cv2.putText(header, f"t {threshold}", (LABEL_WIDTH + t * step + 2, LABEL_HEIGHT - 5),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, 0, 1, cv2.LINE_AA)
+    sheet[:LABEL_HEIGHT] = header
+
+    side = np.full((height - LABEL_HEIGHT, LABEL_WIDTH), 255, dtype=np.uint8)
+    for s, sigma in enumerate(sigmas):
+        cv2.putText(side, f"s {sigma:g}", (4, s * step + tile // 2 + 4),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, 0, 1, cv2.LINE_AA)
+    sheet[LABEL_HEIGHT:, :LABEL_WIDTH] = side
+    return sheet
+
+
+class SweepWorker(BatchWorker):
+    """Renders a sigma x threshold review sheet for each image, several images at a time."""
+
+    def __init__(self, files, grey_dir, sheet_dir, sigmas, thresholds, tile):
+        super().__init__()
+        self.files = files
+        self.grey_dir = grey_dir
+        self.sheet_dir = sheet_dir
+        self.sigmas = sigmas
+        self.thresholds = thresholds
+        self.tile = tile
+        self.sheets = {}
+        # One full-size candidate per grid cell, plus the image and its blur
+        self.bytes_per_pixel = len(sigmas) * len(thresholds) + 2
+
+    def setup(self):
+        os.makedirs(self.sheet_dir, exist_ok=True)
+
+    def items(self):
+        return self.files
+
+    def sheet_path(self, filename):
+        return os.path.join(self.sheet_dir, os.path.splitext(filename)[0] + ".png")
+
+    def outputs(self, filename):
+        return [self.sheet_path(filename)]
+
+    def item_path(self, filename):
+        return os.path.join(self.grey_dir, filename)
+
+    def load(self, filename):
+        img = cv2.imread(os.path.join(self.grey_dir, filename), cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            raise ValueError("could not be read")
+        return render_sweep_sheet(img, self.sigmas, self.thresholds, self.tile)
+
+    def process(self, filename, sheet):
+        self.write(filename, self.save, filename, sheet)
+
+    def save(self, filename, sheet):
+        path = self.sheet_path(filename)
+        if not cv2.imwrite(path, sheet):
+            raise ValueError(f"could not write {path}")
+        self.sheets[filename] = path
+
+
+class SheetLabel(QLabel):
+    clicked = pyqtSignal(int, int)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.clicked.emit(event.pos().x(), event.pos().y())
+        super().mousePressEvent(event)
+
+
+class SweepReview(QWidget):
+    """Sweep mode for MooneyApp: pick each image's parameters by clicking a tile on its review sheet."""
+
+    committed = pyqtSignal(str, float, int)
+
+    def __init__(self, grey_dir, mooney_dir, sheet_dir, store, files, claims=None):
+        super().__init__()
+        self.setWindowTitle("Parameter Sweep Review")
+
+        self.grey_dir = grey_dir
+        self.mooney_dir = mooney_dir
+        self.sheet_dir = sheet_dir
+        self.store = store
+        self.claims = claims  # ClaimSet in multi-rater mode
+        self.files = list(files)
+        self.review_files = []
+        self.index = 0
+        self.worker = None
+
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+
+        self.info_label = QLabel(
+            f"Render a sigma x threshold grid of candidates for the {len(self.files)} remaining images, "
+            "then click the best tile on each sheet to save that Mooney image and its parameters."
+        )
+        self.info_label.setWordWrap(True)
+        layout.addWidget(self.info_label)
+
+        grid_layout = QHBoxLayout()
+        grid_layout.addWidget(QLabel("Sigmas:"))
+        self.sigma_edit = QLineEdit(DEFAULT_SIGMAS)
+        grid_layout.addWidget(self.sigma_edit)
+        grid_layout.addWidget(QLabel("Thresholds:"))
+        self.threshold_edit = QLineEdit(DEFAULT_THRESHOLDS)
+        grid_layout.addWidget(self.threshold_edit)
+        grid_layout.addWidget(QLabel("Tile (px):"))
+        self.tile_spin = QSpinBox()
+        self.tile_spin.setRange(40, 400)
+        self.tile_spin.setSingleStep(10)
+        self.tile_spin.setValue(120)
+        grid_layout.addWidget(self.tile_spin)
+        layout.addLayout(grid_layout)
+
+        self.render_btn = QPushButton("Render Sweep Sheets")
+        self.render_btn.clicked.connect(self.render_sheets)
+        layout.addWidget(self.render_btn)
+
+        self.progress_panel = ProgressPanel()
+        layout.addWidget(self.progress_panel)
+
+        self.name_label = QLabel("")
+        layout.addWidget(self.name_label)
+
+        self.sheet_label = SheetLabel()
+        self.sheet_label.setAlignment(Qt.AlignLeft | Qt.AlignTop)
+        self.sheet_label.clicked.connect(self.sheet_clicked)
+        scroll = QScrollArea()
+        scroll.setWidget(self.sheet_label)
+        scroll.setWidgetResizable(True)
+        layout.addWidget(scroll, 1)
+
+        nav_layout = QHBoxLayout()
+        self.prev_btn = QPushButton("◀ Previous")
+        self.prev_btn.clicked.connect(lambda: self.show_sheet(self.index - 1))
+        self.skip_btn = QPushButton("Skip ▶")
+        self.skip_btn.clicked.connect(lambda: self.show_sheet(self.index + 1))
+        nav_layout.addWidget(self.prev_btn)
+        nav_layout.addWidget(self.skip_btn)
+        layout.addLayout(nav_layout)
+        self.set_nav_enabled(False)
+
+        self.setLayout(layout)
+        self.resize(1100, 900)
+
+    def set_nav_enabled(self, enabled):
+        self.prev_btn.setEnabled(enabled)
+        self.skip_btn.setEnabled(enabled)
+
+    def render_sheets(self):
+        try:
+            sigmas = parse_values(self.sigma_edit.text(), float)
+            thresholds = parse_values(self.threshold_edit.text(), int)
+        except ValueError as e:
+            QMessageBox.warning(self, "Invalid values", f"Sigmas and thresholds must be lists of numbers.\n{e}")
+            return
+        if any(s < 0 for s in sigmas) or any(not 0 <= t <= 255 for t in thresholds):
+            QMessageBox.warning(self, "Invalid values", "Sigmas must be >= 0 and thresholds between 0 and 255.")
+            return
+
+        # Only images that still have no parameters need a sheet
+        processed = self.store.processed()
+        files = [f for f in self.files if f not in processed]
+        if not files:
+            QMessageBox.information(self, "Nothing to do", "All of these images already have parameters.")
+            return
+
+        self.grid = (sigmas, thresholds, self.tile_spin.value())
+        self.render_btn.setEnabled(False)
+        self.set_nav_enabled(False)
+        self.worker = SweepWorker(files, self.grey_dir, self.sheet_dir, *self.grid)
+        self.progress_panel.attach(self.worker)
+        self.worker.finished.connect(self.render_finished)
+        self.worker.start()
+
+    def render_finished(self):
+        self.render_btn.setEnabled(True)
+        report_outcome(self, self.worker, f"Rendered {len(self.worker.sheets)} sweep sheets.")
+        self.review_files = [f for f in self.worker.files if f in self.worker.sheets]
+        if self.review_files:
+            self.set_nav_enabled(True)
+            self.show_sheet(0)
+
+    def show_sheet(self, index):
+        if not self.review_files:
+            return
+        self.index = max(0, min(index, len(self.review_files) - 1))
+        filename = self.review_files[self.index]
+
+        params = self.store.get(filename)
+        status = f"saved: sigma {params[0]:g}, threshold {params[1]}" if params else "click a tile to save"
+        self.name_label.setText(f"{filename}  ({self.index + 1}/{len(self.review_files)})  —  {status}")
+        self.sheet_label.setPixmap(QPixmap(self.worker.sheets[filename]))
+
+    def sheet_clicked(self, x, y):
+        if not self.review_files or self.worker is None or self.worker.isRunning():
+            return
+        sigmas, thresholds, tile = self.grid
+        hit = tile_at(x, y, len(sigmas), len(thresholds), tile)
+        if hit is None:
+            return
+
+        sigma, threshold = sigmas[hit[0]], thresholds[hit[1]]
+        filename = self.review_files[self.index]
+        if self.claims is not None and not self.claims.claim(filename):
+            QMessageBox.information(self, "Claimed", f"{filename} is being annotated by another rater.")
+            return
+        img = cv2.imread(os.path.join(self.grey_dir, filename), cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            QMessageBox.warning(self, "Error", f"Could not read {filename}.")
+            return
+
+        # Saved exactly as "Save & Next" would, from the full-resolution image
+        Image.fromarray(render_mooney(img, sigma, threshold)).save(os.path.join(self.mooney_dir, filename))
+        self.store.add([(filename, sigma, threshold)])
+        if self.claims is not None:
+            self.claims.release([filename])
+        self.committed.emit(filename, sigma, threshold)
+
+        if self.index + 1 < len(self.review_files):
+            self.show_sheet(self.index + 1)
+        else:
+            self.show_sheet(self.index)
+            QMessageBox.information(self, "Done", "That was the last sheet.")
+
+    def closeEvent(self, event):
+        self.progress_panel.stop()
+        super().closeEvent(event)
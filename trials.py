@@ -0,0 +1,487 @@
+import os
+import sys
+import csv
+import json
+import numpy as np
+from collections import namedtuple
+from PyQt5.QtWidgets import (
+    QApplication, QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QFormLayout,
+    QFileDialog, QMessageBox, QSpinBox, QComboBox, QLineEdit
+)
+
+from project_index import list_images
+from worker import BatchWorker, ProgressPanel, report_outcome
+
+
+PHASES = ["greyscale", "mooney", "super"]
+PHASE_PREFIXES = {"greyscale": "1_greyscale_", "mooney": "2_mooney_", "super": "3_super_"}
+COUNTERBALANCES = ["CB1", "CB2"]
+SETS = ["a", "b"]
+CATEGORIES = ["man", "nat"]
+
+# Rejection sampling gives up when fewer than this fraction of random orders meet the constraints
+MIN_ACCEPTANCE = 1e-4
+# Random orders drawn per round, to keep the candidate arrays a reasonable size
+MAX_DRAW = 20000
+
+Stimulus = namedtuple("Stimulus", ["name", "items", "set", "category"])
+Sequence = namedtuple("Sequence", ["participant", "counterbalance", "pre_exposed_set", "trials", "order"])
+
+
+def item_key(filename):
+    return os.path.splitext(filename)[0]
+
+
+def item_set(key):
+    prefix = key.split("_")[0]
+    return prefix if prefix in SETS else None
+
+
+def item_category(key):
+    parts = key.split("_")
+    return parts[1] if len(parts) > 1 and parts[1] in CATEGORIES else None
+
+
+def read_pairs(pairings_file):
+    """Pair number -> (man, nat) item keys, numbered the way Superimpose numbers its outputs."""
+    if not pairings_file or not os.path.isfile(pairings_file):
+        return {}
+    with open(pairings_file, newline="") as f:
+        rows = [(row["man"], row["nat"]) for row in csv.DictReader(f)]
+    return {idx: (item_key(man), item_key(nat)) for idx, (man, nat) in enumerate(rows, start=1)}
+
+
+def experiment_stimuli(experiment_dir, pairings_file=None):
+    """The built stimuli in experiment_dir (see rename.experiment_files) by phase.
+
+    Returns {"greyscale": [Stimulus], "mooney": [Stimulus], "super": {"CB1": [...], "CB2": [...]}}.
+    superMooneys are linked to their two source images through the pairings
+    file, so repeats can be checked across phases; without it they have no items.
+    """
+    pairs = read_pairs(pairings_file)
+    stimuli = {"greyscale": [], "mooney": [], "super": {cb: [] for cb in COUNTERBALANCES}}
+    for name in list_images(experiment_dir):
+        for phase, prefix in PHASE_PREFIXES.items():
+            if not name.startswith(prefix):
+                continue
+            rest = name[len(prefix):]
+            if phase == "super":
+                cb, _, number = rest.partition("_")
+                number = item_key(number)
+                if cb in COUNTERBALANCES and number.isdigit():
+                    stimuli["super"][cb].append(Stimulus(name, pairs.get(int(number), ()), None, None))
+            else:
+                key = item_key(rest)
+                stimuli[phase].append(Stimulus(name, (key,), item_set(key), item_category(key)))
+    return stimuli
+
+
+def random_orders(rng, count, n):
+    """count independent random permutations of range(n), as the rows of one array."""
+    return np.argsort(rng.random((count, n)), axis=1).astype(np.int32)
+
+
+def pattern_counts(first, second, max_run):
+    """Log of the number of ways to finish a sequence of 0s and 1s with at most max_run equal values in a row.
+
+    Indexed [first left, second left, last value, current run length]; run
+    length 0 stands for the start, before any value has been placed.
+    """
+    counts = np.full((first + 1, second + 1, 2, max_run + 1), -np.inf)
+    counts[0, 0] = 0.0
+    runs = np.arange(max_run + 1)
+    longer = np.minimum(runs + 1, max_run)
+    for total in range(1, first + second + 1):
+        for a in range(max(0, total - second), min(first, total) + 1):
+            b = total - a
+            # After a 0 (or at the start): another 0 extends the run, a 1 starts one
+            zero = counts[a - 1, b, 0, longer] if a else np.full(max_run + 1, -np.inf)
+            one = counts[a, b - 1, 1, 1] if b else -np.inf
+            counts[a, b, 0] = np.logaddexp(np.where(runs < max_run, zero, -np.inf), one)
+            zero = counts[a - 1, b, 0, 1] if a else -np.inf
+            one = counts[a, b - 1, 1, longer] if b else np.full(max_run + 1, -np.inf)
+            counts[a, b, 1] = np.logaddexp(zero, np.where(runs < max_run, one, -np.inf))
+    return counts
+
+
+def category_patterns(rng, count, first, second, max_run):
+    """count uniformly random sequences of first 0s and second 1s with at most max_run equal values in a row.
+
+    Random orders almost never meet a run limit by chance (about 1 in 10^5
+    for 160 trials and 3 in a row), so the patterns are drawn value by value
+    from the counts of valid completions instead, for all rows at once.
+    """
+    counts = pattern_counts(first, second, max_run)
+    if counts[first, second, 0, 0] == -np.inf:
+        raise ValueError(f"No order of {first} and {second} images has at most {max_run} of one category in a row.")
+    patterns = np.empty((count, first + second), dtype=np.int8)
+    a = np.full(count, first)
+    b = np.full(count, second)
+    last = np.zeros(count, dtype=np.intp)
+    run = np.zeros(count, dtype=np.intp)
+    for t in range(first + second):
+        # Log-weights of placing a 0 or a 1 next: the number of valid ways to finish after it
+        zero = np.where((a > 0) & ((last == 1) | (run < max_run)),
+                        counts[np.maximum(a - 1, 0), b, 0, np.where(last == 0, np.minimum(run + 1, max_run), 1)],
+                        -np.inf)
+        one = np.where((b > 0) & ((last == 0) | (run < max_run)),
+                       counts[a, np.maximum(b - 1, 0), 1, np.where(last == 1, np.minimum(run + 1, max_run), 1)],
+                       -np.inf)
+        value = (rng.random(count) >= np.exp(zero - np.logaddexp(zero, one))).astype(np.int8)
+        patterns[:, t] = value
+        run = np.where(value == last, run + 1, 1)
+        last = value.astype(np.intp)
+        a -= value == 0
+        b -= value == 1
+    return patterns
+
+
+def phase_orders(rng, count, categories, max_run):
+    """count random orders of one phase's trials, with at most max_run of one category in a row.
+
+    Phases where some trial has no category (e.g. superMooneys) are simply shuffled.
+    """
+    n = len(categories)
+    if not max_run or n <= max_run or (categories < 0).any():
+        return random_orders(rng, count, n)
+    first = np.flatnonzero(categories == 0)
+    second = np.flatnonzero(categories == 1)
+    patterns = category_patterns(rng, count, len(first), len(second), max_run)
+    # Deal each category's trials, in a random order, into that category's slots
+    slots = np.argsort(patterns, axis=1, kind="stable")
+    orders = np.empty((count, n), dtype=np.int32)
+    np.put_along_axis(orders, slots[:, :len(first)], first[random_orders(rng, count, len(first))], axis=1)
+    np.put_along_axis(orders, slots[:, len(first):], second[random_orders(rng, count, len(second))], axis=1)
+    return orders
+
+
+def repeat_violations(items, min_gap):
+    """True for each row of items (orders x trials x width, -1 for none) that shows an item again within min_gap trials."""
+    count, trials, _ = items.shape
+    violations = np.zeros(count, dtype=bool)
+    for distance in range(1, min(min_gap, trials - 1) + 1):
+        earlier = items[:, :-distance, :, None]
+        later = items[:, distance:, None, :]
+        violations |= ((earlier == later) & (earlier >= 0)).any(axis=(1, 2, 3))
+    return violations
+
+
+def rejection_sample(count, draw, violations, constraint):
+    """count rows of draw(n) for which violations(rows) is False.
+
+    Each round draws enough candidates for the rows still missing at the
+    acceptance rate seen so far, so large batches finish in a few rounds.
+    """
+    accepted = []
+    missing = count
+    drawn = kept = 0
+    while missing:
+        rate = (kept + 1) / (drawn + 1)
+        if drawn >= 1000 and rate < MIN_ACCEPTANCE:
+            raise ValueError(f"Almost no random orders meet the constraints ({constraint}). Relax them and try again.")
+        candidates = draw(int(min(MAX_DRAW, max(64, missing / rate * 1.2))))
+        valid = candidates[~violations(candidates)]
+        drawn += len(candidates)
+        kept += len(valid)
+        accepted.append(valid[:missing])
+        missing -= len(accepted[-1])
+    return np.concatenate(accepted)
+
+
+def check_phases(phases):
+    unknown = [phase for phase in phases if phase not in PHASES]
+    if unknown or not phases or len(set(phases)) != len(phases):
+        raise ValueError(f"Phases must be distinct names from {', '.join(PHASES)}.")
+    if "greyscale" in phases and "mooney" in phases and phases.index("greyscale") > phases.index("mooney"):
+        raise ValueError("The greyscale pre-exposure phase must come before the Mooney phase.")
+
+
+def phase_trials(stimuli, phase, counterbalance, pre_exposed_set):
+    if phase == "super":
+        return stimuli["super"][counterbalance]
+    if phase == "greyscale" and pre_exposed_set is not None:
+        return [s for s in stimuli["greyscale"] if s.set == pre_exposed_set]
+    return stimuli[phase]
+
+
+def sample_group(rng, phase_lists, count, min_gap, max_run):
+    """Orders (count x trials) into the concatenated phase lists: each phase shuffled
+    on its own, with runs limited within phases and repeats rejected across them."""
+    keys = {}
+    items, categories, drawers = [], [], []
+    width = max([len(s.items) for trials in phase_lists for s in trials] + [1])
+    offset = 0
+    for trials in phase_lists:
+        phase_items = np.full((len(trials), width), -1, dtype=np.int32)
+        for i, s in enumerate(trials):
+            phase_items[i, :len(s.items)] = [keys.setdefault(key, len(keys)) for key in s.items]
+        phase_categories = np.array([CATEGORIES.index(s.category) if s.category else -1 for s in trials], dtype=np.int8)
+        items.append(phase_items)
+        categories.append(phase_categories)
+
+        def draw_phase(n, phase_categories=phase_categories, offset=offset):
+            return phase_orders(rng, n, phase_categories, max_run) + offset
+        drawers.append(draw_phase)
+        offset += len(trials)
+
+    all_items = np.concatenate(items)
+
+    def draw(n):
+        return np.concatenate([draw_phase(n) for draw_phase in drawers], axis=1)
+
+    if not min_gap:
+        return draw(count)
+    return rejection_sample(count, draw, lambda orders: repeat_violations(all_items[orders], min_gap),
+                            f"no image repeated within {min_gap} trials")
+
+
+def generate_sequences(stimuli, participants, phases=PHASES, min_gap=0, max_run=0,
+                       counterbalance="alternate", pre_exposure="alternate", seed=None):
+    """Trial orders for participants 1..participants, as a list of Sequence.
+
+    Participants are assigned in turn to each combination of counterbalance
+    condition (CB1/CB2) and pre-exposed set (A/B), unless one is fixed. A
+    Sequence's trials are (phase, Stimulus) in phase order and its order
+    gives the shuffled trial indices. Within each phase, at most max_run
+    trials in a row show the same category, and no source image is shown
+    again within min_gap trials anywhere in the sequence.
+    """
+    check_phases(phases)
+    counterbalances = COUNTERBALANCES if counterbalance == "alternate" else [counterbalance]
+    sets = {"alternate": SETS, "all": [None]}.get(pre_exposure, [pre_exposure])
+    groups = [(cb, s) for s in sets for cb in counterbalances]
+
+    rng = np.random.default_rng(seed)
+    sequences = [None] * participants
+    for group, (cb, pre_exposed_set) in enumerate(groups):
+        members = list(range(group, participants, len(groups)))
+        if not members:
+            continue
+        phase_lists = [phase_trials(stimuli, phase, cb, pre_exposed_set) for phase in phases]
+        for phase, trials in zip(phases, phase_lists):
+            if not trials:
+                raise ValueError(f"No {phase} stimuli for {cb}"
+                                 + (f", set {pre_exposed_set.upper()}." if pre_exposed_set else "."))
+        trials = [(phase, s) for phase, phase_list in zip(phases, phase_lists) for s in phase_list]
+        orders = sample_group(rng, phase_lists, len(members), min_gap, max_run)
+        for member, order in zip(members, orders):
+            sequences[member] = Sequence(member + 1, cb, pre_exposed_set, trials, order)
+    return sequences
+
+
+def sequence_rows(sequence):
+    """CSV rows (trial, phase, stimulus, pre_exposed) for one participant's sequence."""
+    rows = []
+    for number, index in enumerate(sequence.order, start=1):
+        phase, stimulus = sequence.trials[index]
+        pre_exposed = [key for key in stimulus.items
+                       if sequence.pre_exposed_set is None or item_set(key) == sequence.pre_exposed_set]
+        rows.append((number, phase, stimulus.name, "|".join(pre_exposed)))
+    return rows
+
+
+def write_csv(path, header, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+class TrialSequenceWorker(BatchWorker):
+    """Generates a trial sequence file for each participant from the stimuli in 8_experiment."""
+
+    def __init__(self, experiment_dir, output_dir, participants, pairings_file=None, phases=PHASES,
+                 min_gap=0, max_run=0, counterbalance="alternate", pre_exposure="alternate", seed=None):
+        super().__init__()
+        self.experiment_dir = experiment_dir
+        self.output_dir = output_dir
+        self.participants = participants
+        self.pairings_file = pairings_file
+        self.settings = {
+            "participants": participants, "phases": list(phases), "min_gap": min_gap, "max_run": max_run,
+            "counterbalance": counterbalance, "pre_exposure": pre_exposure,
+            # Recorded so that the same sequences can be generated again
+            "seed": seed if seed is not None else int(np.random.SeedSequence().entropy % 2 ** 63)
+        }
+        self.sequences = []
+
+    def setup(self):
+        stimuli = experiment_stimuli(self.experiment_dir, self.pairings_file)
+        settings = dict(self.settings)
+        del settings["participants"]
+        self.sequences = generate_sequences(stimuli, self.participants, **settings)
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def items(self):
+        return list(range(1, self.participants + 1))
+
+    def item_name(self, participant):
+        return f"Participant {participant}"
+
+    def sequence_path(self, participant):
+        return os.path.join(self.output_dir, f"participant_{participant:0{max(4, len(str(self.participants)))}d}.csv")
+
+    def outputs(self, participant):
+        return [self.sequence_path(participant)]
+
+    def load(self, participant):
+        return sequence_rows(self.sequences[participant - 1])
+
+    def process(self, participant, rows):
+        self.write(participant, write_csv, self.sequence_path(participant),
+                   ["trial", "phase", "stimulus", "pre_exposed"], rows)
+
+    def teardown(self):
+        if self.cancelled:
+            return
+        write_csv(
+            os.path.join(self.output_dir, "participants.csv"),
+            ["participant", "counterbalance", "pre_exposed_set", "file"],
+            [(s.participant, s.counterbalance, (s.pre_exposed_set or "all").upper(),
+              os.path.basename(self.sequence_path(s.participant))) for s in self.sequences]
+        )
+        with open(os.path.join(self.output_dir, "sequences.json"), "w") as f:
+            json.dump(self.settings, f, indent=2)
+
+
+class TrialSequences(QWidget):
+    PHASE_ORDERS = [
+        ("Greyscale → Mooney → superMooney", ["greyscale", "mooney", "super"]),
+        ("Greyscale → superMooney → Mooney", ["greyscale", "super", "mooney"]),
+        ("superMooney → Greyscale → Mooney", ["super", "greyscale", "mooney"]),
+    ]
+
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Trial Sequences")
+
+        cwd = os.getcwd()
+        self.project_dir = cwd if os.path.isdir(os.path.join(cwd, "8_experiment")) else None
+
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+
+        self.info_label = QLabel(
+            "Generate a randomised trial order for every participant from the stimuli in '8_experiment' "
+            "(run Build Experiment first). Sequences are written to '8_experiment/sequences', one CSV per "
+            "participant, with participants.csv listing each participant's counterbalance condition and "
+            "pre-exposed set."
+        )
+        self.info_label.setWordWrap(True)
+
+        self.project_btn = QPushButton("Select Project Folder")
+        self.project_btn.clicked.connect(self.select_project_folder)
+        self.project_label = QLabel(self.project_dir or "No folder selected")
+        self.project_label.setStyleSheet("color: gray;")
+
+        self.participants_spin = QSpinBox()
+        self.participants_spin.setRange(1, 100000)
+        self.participants_spin.setValue(40)
+
+        self.phase_combo = QComboBox()
+        for label, phases in self.PHASE_ORDERS:
+            self.phase_combo.addItem(label, phases)
+
+        self.counterbalance_combo = QComboBox()
+        self.counterbalance_combo.addItem("Alternate CB1 / CB2", "alternate")
+        for cb in COUNTERBALANCES:
+            self.counterbalance_combo.addItem(f"{cb} only", cb)
+
+        self.pre_exposure_combo = QComboBox()
+        self.pre_exposure_combo.addItem("Alternate set A / B", "alternate")
+        self.pre_exposure_combo.addItem("All greyscale images", "all")
+
+        self.gap_spin = QSpinBox()
+        self.gap_spin.setRange(0, 50)
+        self.gap_spin.setSpecialValueText("Off")
+        self.gap_spin.setToolTip("The same source image is not shown again within this many trials.")
+
+        self.run_spin = QSpinBox()
+        self.run_spin.setRange(0, 50)
+        self.run_spin.setSpecialValueText("Off")
+        self.run_spin.setToolTip("At most this many manufactured (or natural) images in a row within a phase.")
+
+        self.seed_input = QLineEdit()
+        self.seed_input.setPlaceholderText("Random")
+
+        form = QFormLayout()
+        form.addRow("Participants:", self.participants_spin)
+        form.addRow("Phase order:", self.phase_combo)
+        form.addRow("Counterbalance:", self.counterbalance_combo)
+        form.addRow("Pre-exposure:", self.pre_exposure_combo)
+        form.addRow("No repeats within (trials):", self.gap_spin)
+        form.addRow("Max. same category in a row:", self.run_spin)
+        form.addRow("Seed:", self.seed_input)
+
+        self.run_btn = QPushButton("Generate Sequences")
+        self.run_btn.clicked.connect(self.generate)
+
+        self.progress_panel = ProgressPanel()
+
+        self.done_btn = QPushButton("Done")
+        self.done_btn.clicked.connect(self.close)
+
+        layout.addWidget(self.info_label)
+
+        project_layout = QHBoxLayout()
+        project_layout.addWidget(self.project_btn)
+        project_layout.addWidget(self.project_label)
+        layout.addLayout(project_layout)
+
+        layout.addLayout(form)
+        layout.addWidget(self.run_btn)
+        layout.addWidget(self.progress_panel)
+        layout.addWidget(self.done_btn)
+
+        self.setLayout(layout)
+        self.resize(600, 420)
+
+    def select_project_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Project Folder")
+        if folder:
+            self.project_dir = folder
+            self.project_label.setText(folder)
+
+    def generate(self):
+        if not self.project_dir:
+            QMessageBox.warning(self, "Warning", "Please select the project folder.")
+            return
+        seed = self.seed_input.text().strip()
+        if seed and not seed.isdigit():
+            QMessageBox.warning(self, "Warning", "The seed must be a whole number, or empty for a random seed.")
+            return
+
+        self.run_btn.setEnabled(False)
+        experiment_dir = os.path.join(self.project_dir, "8_experiment")
+        self.worker = TrialSequenceWorker(
+            experiment_dir, os.path.join(experiment_dir, "sequences"), self.participants_spin.value(),
+            pairings_file=os.path.join(self.project_dir, "4_super_pairings", "pairs.csv"),
+            phases=self.phase_combo.currentData(),
+            min_gap=self.gap_spin.value(),
+            max_run=self.run_spin.value(),
+            counterbalance=self.counterbalance_combo.currentData(),
+            pre_exposure=self.pre_exposure_combo.currentData(),
+            seed=int(seed) if seed else None
+        )
+        self.progress_panel.attach(self.worker)
+        self.worker.finished.connect(self.generate_finished)
+        self.worker.start()
+
+    def generate_finished(self):
+        self.run_btn.setEnabled(True)
+        report_outcome(self, self.worker,
+                       f"Generated sequences for {self.worker.participants} participants "
+                       f"(seed {self.worker.settings['seed']}).\nSaved to {self.worker.output_dir}")
+
+    def closeEvent(self, event):
+        self.progress_panel.stop()
+        super().closeEvent(event)
+
+
+if __name__ == "__main__":
+    app = QApplication(sys.argv)
+    window = TrialSequences()
+    window.show()
+    sys.exit(app.exec_())
@@ -0,0 +1,359 @@
+import os
+import sys
+import time
+import random
+import cv2
+from PIL import Image
+from PyQt5.QtWidgets import (
+    QApplication, QWidget, QLabel, QPushButton, QFileDialog, QVBoxLayout,
+    QHBoxLayout, QSpinBox, QListWidget, QCheckBox, QMessageBox
+)
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from project_index import IMAGE_EXTENSIONS
+from init import load_cropped, load_grey_cropped, save_grey
+from dedupe import EXCLUDED_FILE, read_excluded
+from mooney import render_mooney, describe_params, replay_jobs
+
+try:
+    # Optional: on Linux, inotify reports changes without polling the folders at all
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+
+def snapshot(folder):
+    """{filename: (mtime, size)} for the image files in folder, from one os.scandir pass."""
+    entries = {}
+    with os.scandir(folder) as it:
+        for entry in it:
+            if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file():
+                st = entry.stat()
+                entries[entry.name] = (st.st_mtime, st.st_size)
+    return entries
+
+
+class SnapshotWatcher:
+    """Detects new or changed files by diffing successive (mtime, size) snapshots.
+
+    A file is only reported once it has looked the same in two polls in a row,
+    so images that are still being copied in are not picked up half-written.
+    """
+
+    def __init__(self, folders):
+        self.folders = folders
+        self.last = {folder: snapshot(folder) for folder in folders}
+        self.unsettled = {}
+
+    def changes(self, timeout):
+        time.sleep(timeout)
+        changed = []
+        for folder in self.folders:
+            current = snapshot(folder)
+            previous = self.last[folder]
+            for name, state in current.items():
+                key = (folder, name)
+                if previous.get(name) != state:
+                    self.unsettled[key] = state
+                elif self.unsettled.get(key) == state:
+                    del self.unsettled[key]
+                    changed.append(key)
+            self.last[folder] = current
+        return changed
+
+
+class InotifyWatcher:
+    """Reports files as soon as they have been closed after writing or moved into a folder."""
+
+    def __init__(self, folders):
+        self.inotify = INotify()
+        self.folders = {}
+        for folder in folders:
+            wd = self.inotify.add_watch(folder, flags.CLOSE_WRITE | flags.MOVED_TO)
+            self.folders[wd] = folder
+
+    def changes(self, timeout):
+        changed = []
+        for event in self.inotify.read(timeout=int(timeout * 1000)):
+            if event.name.lower().endswith(IMAGE_EXTENSIONS):
+                key = (self.folders[event.wd], event.name)
+                if key not in changed:
+                    changed.append(key)
+        return changed
+
+    def close(self):
+        self.inotify.close()
+
+
+class WatchWorker(QThread):
+    """Pushes new or changed source images through crop, greyscale and (optionally) Mooney replay."""
+
+    log = pyqtSignal(str)
+    finished = pyqtSignal()
+
+    poll_interval = 2.0
+
+    def __init__(self, manufactured_dir, natural_dir, base, size=500, param_csv=None):
+        super().__init__()
+        self.sources = {manufactured_dir: 'man', natural_dir: 'nat'}
+        self.source_dir = os.path.join(base, "1_source_images")
+        self.grey_dir = os.path.join(base, "2_grey")
+        self.mooney_dir = os.path.join(base, "3_mooney")
+        self.excluded_csv = os.path.join(base, EXCLUDED_FILE)
+        self.excluded = set()
+        self.size = size
+        self.param_csv = param_csv
+        self.params = {}
+        self.params_mtime = None
+        self.counts = {}
+        self.grey_only = False
+        self.stopped = False
+        self.failure = None
+
+    def stop(self):
+        self.stopped = True
+
+    def run(self):
+        watcher = None
+        try:
+            for folder in [self.source_dir, self.grey_dir, self.mooney_dir]:
+                os.makedirs(folder, exist_ok=True)
+            self.counts = self.count_groups()
+            self.excluded = read_excluded(self.excluded_csv)
+            # Init's "Greyscale crops only" leaves 1_source_images empty; keep such projects that way
+            self.grey_only = not os.listdir(self.source_dir) and bool(os.listdir(self.grey_dir))
+
+            watcher = InotifyWatcher(list(self.sources)) if INotify else SnapshotWatcher(list(self.sources))
+            self.log.emit(f"Watching with {'inotify' if INotify else 'snapshot polling'}.")
+
+            # Catch up on anything added or edited while nobody was watching
+            for folder, kind in self.sources.items():
+                for name in sorted(snapshot(folder)):
+                    if not self.is_excluded(folder, name) and self.is_stale(folder, kind, name):
+                        self.ingest(folder, kind, name)
+
+            while not self.stopped:
+                for folder, name in watcher.changes(self.poll_interval):
+                    if self.stopped:
+                        break
+                    if self.is_excluded(folder, name):
+                        self.log.emit(f"{name}: left out by Init as a near-duplicate ({EXCLUDED_FILE})")
+                    elif os.path.isfile(os.path.join(folder, name)):
+                        self.ingest(folder, self.sources[folder], name)
+            self.log.emit("Stopped watching.")
+        except Exception as e:
+            # e.g. a source folder that was unmounted or deleted while watching
+            self.failure = str(e) or e.__class__.__name__
+            self.log.emit(f"Stopped watching: {self.failure}")
+        finally:
+            if INotify and watcher is not None:
+                watcher.close()
+        self.finished.emit()
+
+    def count_groups(self):
+        """{(kind, group): number of crops in 1_source_images or 2_grey}, read once; ingest keeps it up to date."""
+        counts = {(kind, group): 0 for kind in self.sources.values() for group in ('a', 'b')}
+        crops = {os.path.splitext(existing)[0] for folder in (self.source_dir, self.grey_dir)
+                 for existing in os.listdir(folder)}
+        for existing in crops:
+            for kind, group in counts:
+                if existing.startswith(f"{group}_{kind}_"):
+                    counts[kind, group] += 1
+        return counts
+
+    def is_excluded(self, folder, name):
+        return (os.path.abspath(folder), name) in self.excluded
+
+    def clean_name(self, name):
+        return name[2:] if name.startswith(('a_', 'b_')) else name
+
+    def existing_dest(self, kind, name):
+        clean = self.clean_name(name)
+        for group in ('a', 'b'):
+            dest = os.path.join(self.source_dir, f"{group}_{kind}_{clean}")
+            if os.path.exists(dest):
+                return dest
+        # Greyscale-only projects have their crops in 2_grey alone
+        for group in ('a', 'b'):
+            dest = os.path.join(self.grey_dir, f"{group}_{kind}_{os.path.splitext(clean)[0]}.jpg")
+            if os.path.exists(dest):
+                return dest
+        return None
+
+    def new_dest(self, kind, name):
+        # New images go to whichever group of this kind is smaller, keeping A and B balanced
+        counts = {group: self.counts[kind, group] for group in ('a', 'b')}
+        if counts['a'] == counts['b']:
+            group = random.choice(['a', 'b'])
+        else:
+            group = min(counts, key=counts.get)
+        if self.grey_only:
+            return os.path.join(self.grey_dir, f"{group}_{kind}_{os.path.splitext(self.clean_name(name))[0]}.jpg")
+        return os.path.join(self.source_dir, f"{group}_{kind}_{self.clean_name(name)}")
+
+    def is_stale(self, folder, kind, name):
+        dest = self.existing_dest(kind, name)
+        return dest is None or os.path.getmtime(os.path.join(folder, name)) > os.path.getmtime(dest)
+
+    def load_params(self):
+        if not self.param_csv or not os.path.exists(self.param_csv):
+            return {}
+        mtime = os.path.getmtime(self.param_csv)
+        if mtime != self.params_mtime:
+            self.params = {job[0]: job[1:] for job in replay_jobs(self.param_csv)}
+            self.params_mtime = mtime
+        return self.params
+
+    def ingest(self, folder, kind, name):
+        try:
+            dest = self.existing_dest(kind, name)
+            new = dest is None
+            if new:
+                dest = self.new_dest(kind, name)
+
+            dest_name = os.path.basename(dest)
+            grey_name = os.path.splitext(dest_name)[0] + '.jpg'
+            if os.path.dirname(dest) == self.grey_dir:
+                # As InitWorker crops in greyscale-only mode
+                save_grey(load_grey_cropped(os.path.join(folder, name), self.size), dest)
+                message = f"{name} → {grey_name}"
+            else:
+                load_cropped(os.path.join(folder, name), self.size).save(dest)
+                # Same conversion as GreyscaleWorker, from the cropped file that was just written
+                grey = cv2.cvtColor(cv2.imread(dest), cv2.COLOR_BGR2GRAY)
+                cv2.imwrite(os.path.join(self.grey_dir, grey_name), grey)
+                message = f"{name} → {dest_name}, {grey_name}"
+            if new:
+                self.counts[kind, dest_name[0]] += 1
+
+            params = self.load_params()
+            if grey_name in params:
+                grey = cv2.imread(os.path.join(self.grey_dir, grey_name), cv2.IMREAD_GRAYSCALE)
+                Image.fromarray(render_mooney(grey, *params[grey_name])).save(os.path.join(self.mooney_dir, grey_name))
+                message += f", Mooney ({describe_params(*params[grey_name])})"
+
+            self.log.emit(message)
+        except Exception as e:
+            self.log.emit(f"{name}: {e}")
+
+
+class WatchFolders(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Watch Source Folders")
+
+        self.manufactured_dir = None
+        self.natural_dir = None
+        self.output_base_dir = None
+        self.param_csv = None
+        self.worker = None
+
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+
+        self.info_label = QLabel(
+            "Watch the Manufactured and Natural folders and process only new or changed images: "
+            "they are cropped into '1_source_images' (keeping groups A and B balanced) and converted "
+            "into '2_grey'. Near-duplicates that Init left out stay out. If a parameter file is selected, images that already have Mooney "
+            "parameters are also re-rendered into '3_mooney'."
+        )
+        self.info_label.setWordWrap(True)
+        layout.addWidget(self.info_label)
+
+        self.path_labels = {}
+        for key, text in [("manufactured_dir", "Select Manufactured Folder"),
+                          ("natural_dir", "Select Natural Folder"),
+                          ("output_base_dir", "Select Project Folder")]:
+            btn = QPushButton(text)
+            btn.clicked.connect(lambda _, key=key, text=text: self.select_folder(key, text))
+            label = QLabel("No folder selected")
+            label.setStyleSheet("color: gray;")
+            self.path_labels[key] = label
+            row = QHBoxLayout()
+            row.addWidget(btn)
+            row.addWidget(label)
+            layout.addLayout(row)
+
+        self.param_check = QCheckBox("Re-render Mooney images from a parameter file")
+        self.param_check.toggled.connect(self.select_param_file)
+        layout.addWidget(self.param_check)
+
+        size_layout = QHBoxLayout()
+        size_layout.addWidget(QLabel("Square crop size (px):"))
+        self.size_spin = QSpinBox()
+        self.size_spin.setRange(10, 2000)
+        self.size_spin.setSingleStep(10)
+        self.size_spin.setValue(500)
+        size_layout.addWidget(self.size_spin)
+        layout.addLayout(size_layout)
+
+        self.start_btn = QPushButton("Start Watching")
+        self.start_btn.clicked.connect(self.toggle_watching)
+        layout.addWidget(self.start_btn)
+
+        self.log_list = QListWidget()
+        layout.addWidget(self.log_list)
+
+        self.setLayout(layout)
+        self.resize(650, 450)
+
+    def select_folder(self, key, title):
+        folder = QFileDialog.getExistingDirectory(self, title)
+        if folder:
+            setattr(self, key, folder)
+            self.path_labels[key].setText(folder)
+
+    def select_param_file(self, checked):
+        if not checked:
+            self.param_csv = None
+            return
+        file_path, _ = QFileDialog.getOpenFileName(self, "Select Parameter File", "", "CSV Files (*.csv)")
+        if file_path:
+            self.param_csv = file_path
+            self.param_check.setText(f"Re-render Mooney images from {os.path.basename(file_path)}")
+        else:
+            self.param_check.setChecked(False)
+
+    def toggle_watching(self):
+        if self.worker is not None and self.worker.isRunning():
+            self.start_btn.setEnabled(False)
+            self.worker.stop()
+            return
+
+        if not all([self.manufactured_dir, self.natural_dir, self.output_base_dir]):
+            QMessageBox.warning(self, "Warning", "Please select the Manufactured, Natural and Project folders.")
+            return
+
+        self.worker = WatchWorker(
+            self.manufactured_dir, self.natural_dir, self.output_base_dir,
+            self.size_spin.value(), self.param_csv
+        )
+        self.worker.log.connect(self.add_log)
+        self.worker.finished.connect(self.watching_stopped)
+        self.worker.start()
+        self.start_btn.setText("Stop Watching")
+
+    def add_log(self, message):
+        self.log_list.addItem(f"{time.strftime('%H:%M:%S')}  {message}")
+        self.log_list.scrollToBottom()
+
+    def watching_stopped(self):
+        self.start_btn.setText("Start Watching")
+        self.start_btn.setEnabled(True)
+        if self.worker.failure:
+            QMessageBox.critical(self, "Watching Stopped", self.worker.failure)
+
+    def closeEvent(self, event):
+        if self.worker is not None and self.worker.isRunning():
+            self.worker.stop()
+            self.worker.wait()
+        super().closeEvent(event)
+
+
+if __name__ == "__main__":
+    app = QApplication(sys.argv)
+    window = WatchFolders()
+    window.show()
+    sys.exit(app.exec_())
@@ -0,0 +1,267 @@
+import os
+import time
+from PyQt5.QtWidgets import QWidget, QLabel, QPushButton, QProgressBar, QHBoxLayout, QVBoxLayout, QMessageBox
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from image_io import ImageIO
+from project_index import format_problems, shared_index
+from scheduler import MemoryMonitor, plan_io, default_budget, format_size
+from shard import shard_items
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+class BatchWorker(QThread):
+    """Base class for the batch stages, run off the GUI thread.
+
+    Subclasses implement items(), and optionally load(item) (run ahead on the
+    I/O pool) and process(item, loaded). Output files should be written with
+    self.write(item, fn, *args) so they are encoded behind the processing loop
+    and any failure is reported against the item that caused it.
+
+    Setting shard = (index, count) restricts a run to a deterministic slice of
+    the sorted item list, see shard.py.
+
+    The number of I/O threads and queue depths are planned from memory_budget
+    (bytes, default scheduler.default_budget()) and the largest input image:
+    subclasses give item_path(item) and the bytes_per_pixel one item holds
+    while in flight. The peak RSS during the run is kept in peak_rss.
+    """
+
+    progress = pyqtSignal(int)            # percent complete
+    stats = pyqtSignal(float, float)      # images per second, seconds remaining
+    item_error = pyqtSignal(str, str)     # item, error message
+    failed = pyqtSignal(str)              # the whole run stopped with this error
+    finished = pyqtSignal()
+
+    stats_interval = 0.25
+    bytes_per_pixel = 4
+
+    def __init__(self):
+        super().__init__()
+        self.cancelled = False
+        self.errors = []
+        self.failure = None
+        self.outcomes = {}
+        self.shard = None
+        self.total = 0
+        self.processed = 0
+        self.io = None
+        self.memory_budget = None
+        self.plan = None
+        self.peak_rss = None
+
+    def items(self):
+        raise NotImplementedError
+
+    def load(self, item):
+        return None
+
+    def process(self, item, loaded):
+        raise NotImplementedError
+
+    def setup(self):
+        pass
+
+    def teardown(self):
+        pass
+
+    def abort(self):
+        """Called instead of (or after a failed) teardown when the run stops with an error."""
+        pass
+
+    def item_name(self, item):
+        return str(item)
+
+    def outputs(self, item):
+        """Paths of the files written for item, used to verify merged shard runs."""
+        return []
+
+    def item_path(self, item):
+        """Path of the image item is loaded from, used to estimate its memory use."""
+        return None
+
+    def item_bytes(self, items):
+        """Memory one item holds while in flight, estimated from the largest image header."""
+        folders = {}
+        for item in items:
+            path = self.item_path(item)
+            if path:
+                folders.setdefault(os.path.dirname(path), set()).add(os.path.basename(path))
+        pixels = 0
+        for folder, names in folders.items():
+            for name, info in shared_index.scan(folder).items():
+                if name in names and info.width:
+                    pixels = max(pixels, info.width * info.height)
+        return pixels * self.bytes_per_pixel or None
+
+    def cancel(self):
+        self.cancelled = True
+        self.requestInterruption()
+
+    def report_error(self, item, error):
+        message = str(error) or error.__class__.__name__
+        self.outcomes[self.item_name(item)] = message
+        self.errors.append(f"{self.item_name(item)}: {message}")
+        self.item_error.emit(self.item_name(item), message)
+
+    def write(self, item, fn, *args, **kwargs):
+        def guarded():
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                self.report_error(item, e)
+        # Keyed by identity, so all of an item's outputs count once against the write-behind budget
+        return self.io.write_item(id(item), guarded)
+
+    def make_io(self, items):
+        self.plan = plan_io(self.memory_budget or default_budget(), self.item_bytes(items))
+        return ImageIO(self.plan.workers, self.plan.read_ahead, self.plan.write_behind)
+
+    def memory_report(self):
+        if self.plan is None:
+            return ""
+        text = (f"{self.plan.workers} threads, read-ahead {self.plan.read_ahead}, "
+                f"write-behind {self.plan.write_behind} "
+                f"(budget {format_size(self.plan.budget)}, ~{format_size(self.plan.item_bytes)} per item)")
+        if self.peak_rss:
+            text += f" — peak RSS {format_size(self.peak_rss)}"
+        return text
+
+    def run(self):
+        monitor = MemoryMonitor().start()
+        try:
+            self.setup()
+            items = list(self.items())
+            if self.shard:
+                items = shard_items(items, *self.shard)
+            self.total = len(items)
+            self.processed = 0
+            start = last_stats = time.perf_counter()
+            last_percent = -1
+
+            with self.make_io(items) as io:
+                self.io = io
+                for item, future in io.read(items, self.load):
+                    if self.cancelled:
+                        break
+                    try:
+                        self.process(item, future.result())
+                        self.outcomes.setdefault(self.item_name(item), "")
+                    except Exception as e:
+                        self.report_error(item, e)
+                    self.processed += 1
+
+                    now = time.perf_counter()
+                    if now - last_stats >= self.stats_interval or self.processed == self.total:
+                        last_stats = now
+                        rate = self.processed / max(now - start, 1e-9)
+                        self.stats.emit(rate, (self.total - self.processed) / rate)
+                    percent = int(self.processed / self.total * 100)
+                    if percent != last_percent:
+                        last_percent = percent
+                        self.progress.emit(percent)
+
+                self.teardown()
+        except Exception as e:
+            self.failure = str(e)
+            self.abort()
+            self.failed.emit(self.failure)
+        finally:
+            self.io = None
+            self.peak_rss = monitor.stop()
+        self.finished.emit()
+
+
+def report_outcome(parent, worker, done_text):
+    """Show how a finished worker's run ended. Returns True if every item succeeded."""
+    if worker.failure:
+        QMessageBox.critical(parent, "Error", worker.failure)
+    elif worker.cancelled:
+        QMessageBox.information(parent, "Cancelled", f"Cancelled after {worker.processed} of {worker.total} items.")
+    elif worker.errors:
+        QMessageBox.warning(
+            parent, "Done with errors",
+            f"{len(worker.errors)} item(s) failed:\n" + format_problems(worker.errors)
+        )
+    else:
+        QMessageBox.information(parent, "Done", done_text)
+        return True
+    return False
+
+
+class ProgressPanel(QWidget):
+    """Progress bar with live throughput, ETA, error count and a Cancel button."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.worker = None
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+
+        self.stats_label = QLabel("")
+        self.stats_label.setStyleSheet("color: gray;")
+
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel)
+
+        row = QHBoxLayout()
+        row.addWidget(self.progress_bar)
+        row.addWidget(self.cancel_btn)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(row)
+        layout.addWidget(self.stats_label)
+        self.setLayout(layout)
+
+    def attach(self, worker):
+        self.worker = worker
+        self.error_count = 0
+        self.progress_bar.setValue(0)
+        self.stats_label.setText("Starting...")
+        self.cancel_btn.setEnabled(True)
+        worker.progress.connect(self.progress_bar.setValue)
+        worker.stats.connect(self.update_stats)
+        worker.item_error.connect(self.count_error)
+        worker.finished.connect(self.detach)
+
+    def update_stats(self, rate, eta):
+        text = f"{rate:.1f} images/s — ETA {format_duration(eta)}"
+        if self.error_count:
+            text += f" — {self.error_count} error(s)"
+        self.stats_label.setText(text)
+
+    def count_error(self, item, message):
+        self.error_count += 1
+
+    def cancel(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.stats_label.setText("Cancelling...")
+            self.cancel_btn.setEnabled(False)
+
+    def stop(self):
+        """Cancel a running worker and wait for it, e.g. when its window is closed."""
+        if self.worker is not None and self.worker.isRunning():
+            self.worker.cancel()
+            self.worker.wait()
+
+    def detach(self):
+        self.cancel_btn.setEnabled(False)
+        if self.worker is not None and self.worker.memory_report():
+            self.stats_label.setText(self.worker.memory_report())
+        self.worker = None
+
+    def is_running(self):
+        return self.worker is not None and self.worker.isRunning()
@@ -0,0 +1,220 @@
+import os
+import cv2
+import numpy as np
+from PyQt5.QtWidgets import QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout
+from PyQt5.QtCore import Qt, QRectF, QPointF
+from PyQt5.QtGui import QPainter, QPixmap, QImage, QColor
+
+from mooney import blur_radius, blur_image, render_mooney
+from cache import LRUCache
+
+
+TILE = 256
+
+
+def blur_tile(img, sigma, row, col, tile=TILE, engine="exact"):
+    """Blur of one tile of img, identical to the same pixels of blur_image(img, sigma, engine).
+
+    Only the tile plus a margin of the blur radius is blurred; where the
+    margin runs off the image, the image edge is the crop edge, so the border
+    handling matches a full-image blur as well.
+    """
+    h, w = img.shape
+    y0, x0 = row * tile, col * tile
+    y1, x1 = min(h, y0 + tile), min(w, x0 + tile)
+    margin = blur_radius(sigma, engine)
+    top, left = max(0, y0 - margin), max(0, x0 - margin)
+    region = np.ascontiguousarray(img[top:min(h, y1 + margin), left:min(w, x1 + margin)])
+    return blur_image(region, sigma, engine)[y0 - top:y1 - top, x0 - left:x1 - left]
+
+
+def adaptive_tile(img, sigma, block_size, offset, row, col, tile=TILE, engine="exact"):
+    """Adaptive-threshold render of one tile, identical to the same pixels of the full render.
+
+    The margin covers the blur kernel plus the block, so every local mean the
+    tile needs is taken over correctly blurred pixels.
+    """
+    h, w = img.shape
+    y0, x0 = row * tile, col * tile
+    y1, x1 = min(h, y0 + tile), min(w, x0 + tile)
+    margin = block_size // 2 + blur_radius(sigma, engine)
+    top, left = max(0, y0 - margin), max(0, x0 - margin)
+    region = np.ascontiguousarray(img[top:min(h, y1 + margin), left:min(w, x1 + margin)])
+    thresh = render_mooney(region, sigma, 0, "adaptive", block_size, offset, engine)
+    # Contiguous, so tile_image can hand the buffer to QImage
+    return np.ascontiguousarray(thresh[y0 - top:y1 - top, x0 - left:x1 - left])
+
+
+def tile_image(thresh):
+    """QImage of a thresholded tile, as TileCanvas draws it. thresh must be C-contiguous."""
+    height, width = thresh.shape
+    return QImage(thresh.data, width, height, width, QImage.Format_Grayscale8)
+
+
+class TileCanvas(QWidget):
+    """Full-resolution Mooney render that is zoomed and panned with the mouse.
+
+    Only the tiles in view are blurred and thresholded. Blurred tiles are cached
+    per sigma and thresholded tiles per (sigma, threshold), so panning back or
+    moving the threshold slider only does the work that is actually new.
+    """
+
+    min_zoom = 0.125
+    max_zoom = 16.0
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.img = None
+        self.name = None
+        self.sigma = 2.0
+        self.engine = "exact"
+        self.threshold = 127
+        self.adaptive = None  # (block_size, offset) in adaptive mode
+        self.zoom = 1.0
+        self.offset = QPointF(0, 0)  # image pixel shown at the top-left corner
+        self.drag_start = None
+        self.blurs = LRUCache(256 * 1024 * 1024)
+        self.tiles = LRUCache(128 * 1024 * 1024)
+        self.rendered = 0
+
+        self.setMinimumSize(400, 400)
+
+    def set_image(self, name, img):
+        if name != self.name:
+            self.name = name
+            self.img = img
+            self.zoom = 1.0
+            self.offset = QPointF(0, 0)
+        self.update()
+
+    def set_params(self, sigma, threshold, mode="global", block_size=0, offset=0, blur="exact"):
+        self.sigma = sigma
+        self.engine = blur
+        self.threshold = threshold
+        self.adaptive = (block_size, offset) if mode == "adaptive" else None
+        self.update()
+
+    def tile_pixmap(self, row, col):
+        key = (self.name, self.sigma, self.engine, self.threshold, self.adaptive, row, col)
+        pixmap = self.tiles.get(key)
+        if pixmap is None:
+            if self.adaptive is not None:
+                thresh = adaptive_tile(self.img, self.sigma, *self.adaptive, row, col, engine=self.engine)
+            else:
+                blur_key = (self.name, self.sigma, self.engine, row, col)
+                blurred = self.blurs.get(blur_key)
+                if blurred is None:
+                    # A copy, so the cache does not keep the whole margin region alive
+                    blurred = blur_tile(self.img, self.sigma, row, col, engine=self.engine).copy()
+                    self.blurs.put(blur_key, blurred, blurred.nbytes)
+                _, thresh = cv2.threshold(blurred, self.threshold, 255, cv2.THRESH_BINARY)
+            pixmap = QPixmap.fromImage(tile_image(thresh))
+            self.tiles.put(key, pixmap, thresh.nbytes)
+            self.rendered += 1
+        return pixmap
+
+    def clamp_offset(self):
+        # Keep the image in view; an image smaller than the window is centred
+        def clamp(value, size, view):
+            if size <= view:
+                return (size - view) / 2
+            return min(max(value, 0), size - view)
+
+        h, w = self.img.shape
+        self.offset = QPointF(clamp(self.offset.x(), w, self.width() / self.zoom),
+                              clamp(self.offset.y(), h, self.height() / self.zoom))
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(128, 128, 128))
+        if self.img is None:
+            return
+
+        self.clamp_offset()
+        h, w = self.img.shape
+        left, top = self.offset.x(), self.offset.y()
+        right, bottom = left + self.width() / self.zoom, top + self.height() / self.zoom
+
+        first_row, first_col = max(0, int(top // TILE)), max(0, int(left // TILE))
+        last_row, last_col = min((h - 1) // TILE, int(bottom // TILE)), min((w - 1) // TILE, int(right // TILE))
+
+        # Nearest-neighbour when zoomed in, so individual pixels stay crisp
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, self.zoom < 1)
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                pixmap = self.tile_pixmap(row, col)
+                target = QRectF((col * TILE - left) * self.zoom, (row * TILE - top) * self.zoom,
+                                pixmap.width() * self.zoom, pixmap.height() * self.zoom)
+                painter.drawPixmap(target, pixmap, QRectF(pixmap.rect()))
+
+    def set_zoom(self, zoom, anchor=None):
+        """Zoom about anchor (widget coordinates), keeping the image pixel under it in place."""
+        zoom = min(self.max_zoom, max(self.min_zoom, zoom))
+        if anchor is None:
+            anchor = QPointF(self.width() / 2, self.height() / 2)
+        image_point = self.offset + anchor / self.zoom
+        self.zoom = zoom
+        self.offset = image_point - anchor / self.zoom
+        self.update()
+
+    def fit(self):
+        if self.img is None:
+            return
+        h, w = self.img.shape
+        self.zoom = min(self.width() / w, self.height() / h)
+        self.offset = QPointF(0, 0)
+        self.update()
+
+    def wheelEvent(self, event):
+        steps = event.angleDelta().y() / 120
+        self.set_zoom(self.zoom * 1.25 ** steps, QPointF(event.pos()))
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.drag_start = (QPointF(event.pos()), self.offset)
+            self.setCursor(Qt.ClosedHandCursor)
+
+    def mouseMoveEvent(self, event):
+        if self.drag_start is not None:
+            start, offset = self.drag_start
+            self.offset = offset - (QPointF(event.pos()) - start) / self.zoom
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        self.drag_start = None
+        self.unsetCursor()
+
+
+class ZoomView(QWidget):
+    """Zoom/pan window for MooneyApp, following its current image and slider values."""
+
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Mooney Zoom")
+
+        self.canvas = TileCanvas()
+
+        self.info_label = QLabel("Scroll to zoom, drag to pan.")
+        self.info_label.setStyleSheet("color: gray;")
+
+        self.actual_btn = QPushButton("1:1")
+        self.actual_btn.clicked.connect(lambda: self.canvas.set_zoom(1.0))
+        self.fit_btn = QPushButton("Fit")
+        self.fit_btn.clicked.connect(self.canvas.fit)
+
+        controls = QHBoxLayout()
+        controls.addWidget(self.info_label)
+        controls.addStretch()
+        controls.addWidget(self.actual_btn)
+        controls.addWidget(self.fit_btn)
+
+        layout = QVBoxLayout()
+        layout.addLayout(controls)
+        layout.addWidget(self.canvas, 1)
+        self.setLayout(layout)
+        self.resize(900, 900)
+
+    def show_render(self, name, img, sigma, threshold, mode="global", block_size=0, offset=0, blur="exact"):
+        self.setWindowTitle(f"Mooney Zoom — {os.path.basename(name)}")
+        self.canvas.set_params(sigma, threshold, mode, block_size, offset, blur)
+        self.canvas.set_image(name, img)